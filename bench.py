@@ -0,0 +1,173 @@
+"""Benchmarks the engine over a fixed matrix of the bundled designs. Every run happens in its
+own process (the engine keeps state at class level, and peak RSS is per process) and records
+wall time, process time, solver time, CFG build time, peak RSS, paths explored and paths pruned.
+
+Usage:
+    python3 -m bench --output results.json
+    python3 -m bench --compare baseline.json --output results.json
+"""
+import sys
+import os
+import io
+import json
+import time
+import resource
+import subprocess
+from contextlib import redirect_stdout
+from optparse import OptionParser
+from typing import Dict, List, Optional
+
+# (name, files, top module, num_cycles)
+MATRIX = [
+    ("updowncounter-1", ["designs/test-designs/updowncounter.v"], "updowncounter", 1),
+    ("updowncounter-3", ["designs/test-designs/updowncounter.v"], "updowncounter", 3),
+    ("sanity_test-3", ["designs/test-designs/test.v"], "sanity_test", 3),
+    ("test_3-3", ["designs/test-designs/test_3.v"], "demo", 3),
+    ("demo2-3", ["designs/test-designs/demo2.v"], "demo", 3),
+    ("RHI011-1", ["designs/TrustHub/RHI011/simple_spi.v", "designs/TrustHub/RHI011/fifo4.v"], "simple_spi", 1),
+    ("aes_256-1", ["designs/aes/aes_256.v", "designs/aes/round.v", "designs/aes/table.v"], "aes_256", 1),
+    ("picorv32-1", ["designs/picorv/picorv32.v"], "picorv32", 1),
+    ("or1200_cpu-1", ["designs/or1200/or1200_cpu.v"], "or1200_cpu", 1),
+]
+
+INCLUDE = ["designs/or1200/", "darkriscv/", "designs"]
+
+# metrics compared against the baseline, lower is better for all of them
+COMPARED = ("wall_time", "process_time", "solver_time", "cfg_time", "peak_rss_kb")
+
+# runs faster than this are too noisy to flag
+MIN_TIME = 0.5
+
+
+def run_one(name: str) -> dict:
+    """Run a single matrix entry in this process and measure it."""
+    from pyverilog.vparser.parser import parse
+    from engine.execution_engine import ExecutionEngine
+
+    _, files, top, num_cycles = next(entry for entry in MATRIX if entry[0] == name)
+    ast, directives = parse(files, preprocess_include=INCLUDE, preprocess_define=[])
+    modules = ast.children()[0].definitions
+    top_level_module = next(module for module in modules if module.name == top)
+
+    engine = ExecutionEngine()
+    wall_start = time.perf_counter()
+    process_start = time.process_time()
+    # the engine is chatty, only the numbers matter here
+    with redirect_stdout(io.StringIO()):
+        engine.execute(top_level_module, modules, None, directives, num_cycles)
+    wall_time = time.perf_counter() - wall_start
+    process_time = time.process_time() - process_start
+
+    stats = getattr(engine, "stats", {})
+    return {
+        "status": "ok",
+        "wall_time": wall_time,
+        "process_time": process_time,
+        "solver_time": stats.get("solver_time", 0),
+        "cfg_time": stats.get("cfg_time", 0),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "paths_explored": stats.get("paths_explored", 0),
+        "paths_pruned": stats.get("paths_pruned", 0),
+        "violations": len(getattr(engine, "violations", [])),
+    }
+
+
+def run_matrix(names: List[str], timeout: Optional[int]) -> Dict[str, dict]:
+    """Run each matrix entry in a fresh interpreter and collect the results."""
+    results = {}
+    for name in names:
+        print(f"{name} ...", end=" ", flush=True)
+        try:
+            proc = subprocess.run([sys.executable, "-m", "bench", "--run", name], capture_output=True,
+                                  text=True, timeout=timeout)
+            if proc.returncode == 0:
+                results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+            else:
+                error = proc.stderr.strip().splitlines()
+                results[name] = {"status": "error", "error": error[-1] if error else f"exit code {proc.returncode}"}
+        except subprocess.TimeoutExpired:
+            results[name] = {"status": "timeout"}
+        result = results[name]
+        if result["status"] == "ok":
+            print(f"{result['wall_time']:.2f}s wall, {result['solver_time']:.2f}s solver, "
+                  f"{result['cfg_time']:.3f}s CFG, "
+                  f"{result['paths_explored']} paths ({result['paths_pruned']} pruned)")
+        else:
+            print(result["status"])
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Return a description of every metric that got worse than the baseline by more than tolerance."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if old["status"] == "ok" and result["status"] != "ok":
+            regressions.append(f"{name}: {result['status']} (was ok)")
+            continue
+        if result["status"] != "ok" or old["status"] != "ok":
+            continue
+        for metric in COMPARED:
+            # baselines from before a metric was recorded don't have it
+            if not metric in old:
+                continue
+            before, after = old[metric], result[metric]
+            if metric.endswith("_time") and max(before, after) < MIN_TIME:
+                continue
+            if after > before * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before:.2f} -> {after:.2f}")
+        if result["paths_explored"] != old["paths_explored"] or result["violations"] != old["violations"]:
+            regressions.append(f"{name}: explored {old['paths_explored']} paths with {old['violations']} violations, "
+                               f"now {result['paths_explored']} with {result['violations']}")
+    return regressions
+
+
+def main():
+    """Entrypoint of the benchmark."""
+    optparser = OptionParser()
+    optparser.add_option("-o", "--output", dest="output", default=None,
+                         help="Write the results as JSON to this file")
+    optparser.add_option("-c", "--compare", dest="baseline", default=None,
+                         help="Baseline JSON to compare against, exits non-zero on regressions")
+    optparser.add_option("--tolerance", dest="tolerance", type='float', default=0.2,
+                         help="Allowed relative slowdown before a metric counts as a regression, Default=0.2")
+    optparser.add_option("--timeout", dest="timeout", type='int', default=1800,
+                         help="Seconds before a single run is given up on, Default=1800")
+    optparser.add_option("--only", dest="only", action="append", default=[],
+                         help="Only run this matrix entry (can be repeated)")
+    optparser.add_option("--run", dest="run", default=None, help="Internal: run one entry and print its JSON")
+    (options, args) = optparser.parse_args()
+
+    if options.run is not None:
+        print(json.dumps(run_one(options.run)))
+        return
+
+    names = [entry[0] for entry in MATRIX]
+    if options.only:
+        unknown = [name for name in options.only if not name in names]
+        if unknown:
+            optparser.error(f"unknown matrix entries {unknown}, choose from {names}")
+        names = options.only
+
+    results = run_matrix(names, options.timeout)
+    if options.output is not None:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if options.baseline is not None:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, options.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
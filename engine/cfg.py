@@ -1,104 +1,99 @@
 """Extracting the CFG from the AST."""
-from math import comb
-from operator import indexOf
-import z3
-from z3 import Solver, Int, BitVec, Context, BitVecSort, ExprRef, BitVecRef, If, BitVecVal, And
-from pyverilog.vparser.parser import parse
-from pyverilog.vparser.ast import Description, ModuleDef, Node, IfStatement, SingleStatement, And, Constant, Rvalue, Plus, Input, Output
-from pyverilog.vparser.ast import WhileStatement, ForStatement, CaseStatement, Block, SystemCall, Land, InstanceList, IntConst, Partselect, Ioport
-from pyverilog.vparser.ast import Value, Reg, Initial, Eq, Identifier, Initial,  NonblockingSubstitution, Decl, Always, Assign, NotEql, Case, Pointer
-from pyverilog.vparser.ast import Concat, BlockingSubstitution, Parameter, StringConst, Wire, PortArg, Instance
+from pyverilog.vparser.ast import Node, IfStatement, SingleStatement, ForStatement, CaseStatement, Block, InstanceList
+from pyverilog.vparser.ast import Initial, Decl, Always, Assign
 from .execution_manager import ExecutionManager
 from .symbolic_state import SymbolicState
-from copy import deepcopy
+from .path_oracle import PathOracle
+from .coi import ConeOfInfluence
+from .merge import BranchMerger
 import os
-from optparse import OptionParser
 from typing import Optional
-import random, string
 import time
-import gc
-from itertools import product, permutations, combinations
+from itertools import combinations
 import logging
-from helpers.utils import to_binary
-from strategies.dfs import DepthFirst
 import sys
-import networkx as nx
-import matplotlib.pyplot as plt
+import hashlib
+import pickle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from helpers.ast_cache import PICKLE_RECURSION_LIMIT
+from array import array
 
 
 class CFG:
-    """CFG of Verilog RTL."""
-    # basic blocks. A list made up of slices of all_nodes determined by partition_points.
-    basic_block_list = []
+    """CFG of Verilog RTL. All of its state is per instance, so separate CFG objects can be
+    built independently (and concurrently)."""
 
-    # for partitioning
-    curr_idx = 0
+    def __init__(self):
+        self.reset()
+        # name corresponding to the module. there could be multiple always blocks (or CFGS) per module
+        self.module_name = ""
 
-    # add all nodes in the always block
-    all_nodes = []
+        # Decl nodes outside the always block to be executed once up front for all paths
+        self.decls = []
 
-    # partition indices
-    partition_points = set()
-    partition_points.add(0)
+        # Combinational logic nodes outside the always block to be visited twice for all paths
+        self.comb = []
 
-    # the edgelist will be a list of tuples of indices of the ast nodes blocks
-    edgelist = []
+        # the nodes in the AST that correspond to initial blocks
+        self.initial_blocks = []
 
-    # edges between basic blocks, determined by the above edgelist
-    cfg_edges = []
-
-    # indices of basic blocks that need to connect to dummy exit node
-    leaves = set()
-
-    #paths... list of paths with start and end being the dummy nodes
-    paths = []
-
-    # name corresponding to the module. there could be multiple always blocks (or CFGS) per module
-    module_name = ""
-
-    # Decl nodes outside the always block to be executed once up front for all paths
-    decls = []
-
-    # Combinational logic nodes outside the always block to be visited twice for all paths
-    comb = []
-
-    # the nodes in the AST that correspond to always blocks
-    always_blocks = []
-
-    # the nodes in the AST that correspond to initial blocks
-    initial_blocks = []
-
-    # branch-point set
-    # for each basic statement, there may be some indpendent branching points
-    ind_branch_points = {1: set()}
-
-    # stack of flags for if we are looking at a block statement
-    block_smt = [False]
-
-    # how many nested block statements we've seen so far
-    block_stmt_depth = 0
-
-    #submodules defined
-    submodules = []
-
-    # basic blocks that don't have out edges
-    dangling = set()
+        #submodules defined
+        self.submodules = []
 
     def reset(self):
         """Return to defaults."""
+        # basic blocks. A list made up of slices of all_nodes determined by partition_points.
         self.basic_block_list = []
+
+        # for partitioning
         self.curr_idx = 0
+
+        # add all nodes in the always block
         self.all_nodes = []
+
+        # partition indices
         self.partition_points = set()
         self.partition_points.add(0)
+
+        # the edgelist will be a list of tuples of indices of the ast nodes blocks
         self.edgelist = []
+
+        # edges between basic blocks, determined by the above edgelist
         self.cfg_edges = []
+
+        # indices of basic blocks that need to connect to dummy exit node
         self.leaves = set()
+
+        #paths... list of paths with start and end being the dummy nodes
         self.paths = []
+
+        # successors of each basic block (and the dummy start -1 and end -2), in insertion order
+        self.successors = {}
+
+        # the array backed form, built at the end of build_cfg
+        self.compact = None
+
+        # the nodes in the AST that correspond to always blocks
         self.always_blocks = []
+
+        # branch-point set
+        # for each basic statement, there may be some indpendent branching points
         self.ind_branch_points = {1: set()}
+
+        # stack of flags for if we are looking at a block statement
         self.block_smt = [False]
+
+        # how many nested block statements we've seen so far
         self.block_stmt_depth = 0
+
+        # index of the basic block each node in all_nodes ended up in, filled in by partition
+        self.block_of_node = []
+
+        # (start, stop) of each basic block in all_nodes, filled in by partition
+        self.block_bounds = []
+
+        # basic blocks that don't have out edges
         self.dangling = set()
 
     def compute_direction(self, path):
@@ -147,8 +142,6 @@ class CFG:
                     elif isinstance(item, Assign):
                         self.comb.append(item)
                     elif isinstance(item, InstanceList):
-                        print("FOUND SUBModule!")
-                        print(item.module)
                         self.submodules.append(item)
                     ...
         elif ast != None:
@@ -173,8 +166,7 @@ class CFG:
                 elif isinstance(ast, Assign):
                     self.comb.append(ast)
                 elif isinstance(ast, InstanceList):
-                    print("FOUND SUBModule!")
-                ...
+                    self.submodules.append(ast)
 
 
     def get_always(self, m: ExecutionManager, s: SymbolicState, ast):
@@ -205,8 +197,6 @@ class CFG:
                     elif isinstance(item, Assign):
                         self.comb.append(item)
                     elif isinstance(item, InstanceList):
-                        print("FOUND SUBModule!")
-                        print(item.module)
                         self.submodules.append(item)
                     ...
         elif ast != None:
@@ -231,8 +221,7 @@ class CFG:
                 elif isinstance(ast, Assign):
                     self.comb.append(ast)
                 elif isinstance(ast, InstanceList):
-                    print("FOUND SUBModule!")
-                ...
+                    self.submodules.append(ast)
 
     def basic_blocks(self, m:ExecutionManager, s: SymbolicState, ast):
         """We want to get a list of AST nodes partitioned into basic blocks.
@@ -251,7 +240,7 @@ class CFG:
                     self.partition_points.add(self.curr_idx)
                     parent_idx = self.curr_idx
                     self.basic_blocks(m, s, item.true_statement)
-                    snapshot_before_else = deepcopy(self.all_nodes)
+                    nodes_before_else = len(self.all_nodes)
                     edge_1 = (parent_idx, self.curr_idx)
                     self.partition_points.add(self.curr_idx)
                     self.basic_blocks(m, s, item.false_statement)
@@ -259,7 +248,7 @@ class CFG:
                     # if there are no other nodes added after this 
                     # AST traversal, then we know that we don't have the 
                     # else to worry about, shouldn't add the edge
-                    if len(self.all_nodes) > len(snapshot_before_else):
+                    if len(self.all_nodes) > nodes_before_else:
                         edge_2 = (parent_idx, self.curr_idx)
                         self.edgelist.append(edge_2)
                         self.partition_points.add(self.curr_idx)
@@ -276,7 +265,6 @@ class CFG:
                     self.curr_idx += 1
                     self.basic_blocks(m, s, item.statement) 
                 elif isinstance(item, Block):
-                    print("found block stmt")
                     self.basic_blocks(m, s, item.items)
                 elif isinstance(item, Always):
                     self.all_nodes.append(item)
@@ -317,7 +305,6 @@ class CFG:
             elif isinstance(ast, Block):
                 self.block_stmt_depth += 1
                 self.block_smt.append(True)
-                print("found other block statement")
                 self.basic_blocks(m, s, ast.statements)
                 if self.block_stmt_depth in self.ind_branch_points:
                     self.resolve_independent_branch_pts(self.block_stmt_depth)
@@ -342,26 +329,25 @@ class CFG:
     def partition(self):
         """Slices up the list of all nodes into the actual basic blocks"""
         self.partition_points.add(len(self.all_nodes)-1)
-        partition_list = list(self.partition_points)
+        partition_list = sorted(self.partition_points)
+        self.block_of_node = [None] * len(self.all_nodes)
         for i in range(len(partition_list)-1):
             if i > 0: 
-                basic_block = self.all_nodes[partition_list[i]+1:partition_list[i+1]+1]
-                self.basic_block_list.append(basic_block)
+                start = partition_list[i]+1
             else:
-                basic_block = self.all_nodes[partition_list[i]:partition_list[i+1]+1]
-                self.basic_block_list.append(basic_block)
+                start = partition_list[i]
+            stop = partition_list[i+1]+1
+            basic_block = self.all_nodes[start:stop]
+            self.block_bounds.append(slice(start, stop).indices(len(self.all_nodes))[:2])
+            for node_idx in range(start, min(stop, len(self.all_nodes))):
+                self.block_of_node[node_idx] = len(self.basic_block_list)
+            self.basic_block_list.append(basic_block)
 
     def find_basic_block(self, node_idx) -> int:
         """Given a node index, find the index of the basic block that we're in."""
-        if node_idx < len(self.all_nodes):
-            node = self.all_nodes[node_idx]
-        else:
-            node = self.all_nodes[len(self.all_nodes)-1]
-        found_block = None
-        for block in self.basic_block_list:
-            if node in block:
-                found_block = indexOf(self.basic_block_list, block)
-                return found_block
+        if node_idx >= len(self.all_nodes):
+            node_idx = len(self.all_nodes)-1
+        return self.block_of_node[node_idx]
 
     def make_paths(self):
         """Map the edge between AST nodes to a path between basic blocks."""
@@ -386,51 +372,351 @@ class CFG:
         ends = set(edges[1] for edges in self.cfg_edges)
         self.leaves = ends - starts
 
-    def display_cfg(self, graph):
+    def display_cfg(self):
         """Display CFG."""
-        subax1 = plt.subplot(121)
-        nx.draw(graph, with_labels=True, font_weight='bold')
-        plt.show()
+        self.compact.display_cfg()
+
+    def add_edge(self, start: int, end: int):
+        """Add an edge between basic blocks, keeping the first insertion order like a digraph."""
+        self.successors.setdefault(start, {})[end] = None
+        self.successors.setdefault(end, {})
 
     def build_cfg(self, m: ExecutionManager, s: SymbolicState):
-        """Build networkx digraph."""
+        """Build the successor lists of the basic blocks and the compact CFG."""
         self.cfg_edges = []
         self.make_paths()
 
-        G = nx.DiGraph()
-        for block in self.basic_block_list:
-            # converts the list into a tuple. Needs to be hashable type
-            G.add_node(indexOf(self.basic_block_list, block), data=tuple(block))
-        
-        G.add_node(-1, data="Dummy Start")
-        G.add_node(-2, data="Dummy End")
+        self.successors = {block_idx: {} for block_idx in range(len(self.basic_block_list))}
+        # dummy start and end
+        self.successors[-1] = {}
+        self.successors[-2] = {}
 
         for edge in self.cfg_edges:
             start = edge[0]
             end = edge[1]
-            G.add_edge(start, end)
+            self.add_edge(start, end)
         
         # edgecase lol
         if self.edgelist == []:
-            G.add_edge(0, -2)
+            self.add_edge(0, -2)
 
         # link up dummy start
-        G.add_edge(-1, 0)
+        self.add_edge(-1, 0)
         self.find_leaves()
         
         # link of dummy exit
         for leaf in self.leaves:
-            G.add_edge(leaf, -2)
+            self.add_edge(leaf, -2)
 
         self.find_dangling()
         # also need to link up the dangling nodes that had self loops
         for dangling in self.dangling:
-            G.add_edge(dangling, -2)
+            self.add_edge(dangling, -2)
+
+        self.compact = CompactCFG.from_cfg(self)
+        # paths are counted up front and unranked on demand instead of listed
+        self.paths = self.compact.paths
+
+def node_digest(node, digest) -> None:
+    """Feed a structural description of an AST (sub)tree into a hashlib digest."""
+    if isinstance(node, Node):
+        digest.update(type(node).__name__.encode())
+        for attr in node.attr_names:
+            digest.update(repr(getattr(node, attr)).encode())
+        children = node.children()
+        digest.update(str(len(children)).encode())
+        for child in children:
+            node_digest(child, digest)
+    elif isinstance(node, (list, tuple)):
+        digest.update(f"[{len(node)}".encode())
+        for item in node:
+            node_digest(item, digest)
+    else:
+        digest.update(repr(node).encode())
+
+
+class CompactCFG:
+    """Array backed CFG of one always/initial block. The statements of all its basic blocks are
+    one shared table and every block is a (start, stop) slice of it, the successors are stored
+    CSR style (an offset per block into one array of edge targets), and the branch direction of
+    every edge is computed once. The dummy start (-1) and end (-2) come after the real blocks."""
+    __slots__ = ("statements", "block_bounds", "succ_offsets", "succ_targets", "edge_directions", "paths")
+
+    def __init__(self, statements, block_bounds, succ_offsets, succ_targets):
+        self.statements = tuple(statements)
+        # start, stop of every basic block, flattened
+        self.block_bounds = array("i", block_bounds)
+        self.succ_offsets = array("i", succ_offsets)
+        self.succ_targets = array("i", succ_targets)
+        # 1 when the edge falls through to the next block (the true branch), 0 otherwise
+        self.edge_directions = array("b")
+        for slot in range(len(self.succ_offsets) - 1):
+            node = self.node_at(slot)
+            for edge in range(self.succ_offsets[slot], self.succ_offsets[slot + 1]):
+                self.edge_directions.append(1 if node + 1 == self.succ_targets[edge] else 0)
+        self.paths = PathOracle(self.succ_offsets, self.succ_targets, self.num_blocks)
+
+    @classmethod
+    def from_cfg(cls, cfg: CFG) -> "CompactCFG":
+        """Pack the basic blocks and successor lists of a built CFG."""
+        num_blocks = max([len(cfg.block_bounds)] + [node + 1 for node in cfg.successors])
+        block_bounds = []
+        for block_idx in range(num_blocks):
+            if block_idx < len(cfg.block_bounds):
+                block_bounds += cfg.block_bounds[block_idx]
+            else:
+                block_bounds += (0, 0)
+        succ_offsets = [0]
+        succ_targets = []
+        for slot in range(num_blocks + 2):
+            node = slot if slot < num_blocks else num_blocks - 1 - slot
+            # self loops never show up on a path
+            succ_targets += [succ for succ in cfg.successors.get(node, ()) if succ != node]
+            succ_offsets.append(len(succ_targets))
+        return cls(cfg.all_nodes, block_bounds, succ_offsets, succ_targets)
+
+    @property
+    def num_blocks(self) -> int:
+        return len(self.block_bounds) // 2
+
+    def node_at(self, slot: int) -> int:
+        """Block index of a successor offsets slot, the inverse of PathOracle.slot."""
+        return slot if slot < self.num_blocks else self.num_blocks - 1 - slot
+
+    def basic_block(self, block_idx: int) -> tuple:
+        """Statements of a basic block."""
+        return self.statements[self.block_bounds[2 * block_idx]:self.block_bounds[2 * block_idx + 1]]
+
+    def direction(self, start: int, end: int) -> int:
+        """Branch direction of the edge from start to end."""
+        slot = self.paths.slot(start)
+        for edge in range(self.succ_offsets[slot], self.succ_offsets[slot + 1]):
+            if self.succ_targets[edge] == end:
+                return self.edge_directions[edge]
+        raise KeyError(f"no edge from {start} to {end}")
+
+    def compute_direction(self, path):
+        """Given a path, figure out the direction"""
+        return [self.direction(path[i], path[i + 1]) for i in range(1, len(path)-1)]
+
+    def __reduce__(self):
+        # directions and path counts are cheap to redo, only ship the arrays
+        return (CompactCFG, (self.statements, self.block_bounds, self.succ_offsets, self.succ_targets))
 
+    def display_cfg(self):
+        """Display CFG. networkx and matplotlib are only needed for this."""
+        import networkx as nx
+        import matplotlib.pyplot as plt
+        G = nx.DiGraph()
+        for block_idx in range(self.num_blocks):
+            G.add_node(block_idx, data=self.basic_block(block_idx))
+        G.add_node(-1, data="Dummy Start")
+        G.add_node(-2, data="Dummy End")
+        for slot in range(self.num_blocks + 2):
+            for succ in self.paths.successors(self.node_at(slot)):
+                G.add_edge(self.node_at(slot), succ)
+        subax1 = plt.subplot(121)
+        nx.draw(G, with_labels=True, font_weight='bold')
+        plt.show()
 
-        #self.display_cfg(G)
 
-        #traversed = nx.edge_dfs(G, source=-1)
-        self.paths = list(nx.all_simple_paths(G, source=-1, target=-2))
-        #print(list(traversed))
-        #print(list(self.paths))
\ No newline at end of file
+class PathDescriptor:
+    """One path through a CFG compiled for the execute loop: for every basic block on it, the
+    statements to visit and the branch direction taken out of it, plus the CFG it belongs to."""
+    __slots__ = ("cfg_id", "path", "blocks")
+
+    def __init__(self, cfg_id: int, path: tuple, blocks: tuple):
+        # position of the CFG among the CFGs of its module
+        self.cfg_id = cfg_id
+        self.path = path
+        # (step number, basic block index, statements, direction) per basic block
+        self.blocks = blocks
+
+
+# compiled path descriptors kept per CFG before the table is dropped
+DESCRIPTOR_CACHE_SIZE = 4096
+
+
+class FrozenCFG:
+    """The CFG of one always/initial block together with the module it belongs to. It is
+    immutable, so the CFGs of a module definition are built once and shared by all of its instances."""
+    __slots__ = ("module_name", "cfg_id", "graph", "decls", "comb", "descriptors")
+
+    def __init__(self, module_name: str, cfg_id: int, graph: CompactCFG, decls, comb):
+        object.__setattr__(self, "module_name", module_name)
+        object.__setattr__(self, "cfg_id", cfg_id)
+        object.__setattr__(self, "graph", graph)
+        # the decls and comb of the whole module, the same for each of its CFGs
+        object.__setattr__(self, "decls", tuple(decls))
+        object.__setattr__(self, "comb", tuple(comb))
+        # path index to PathDescriptor, filled in as paths are explored
+        object.__setattr__(self, "descriptors", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenCFG is immutable")
+
+    def __reduce__(self):
+        return (FrozenCFG, (self.module_name, self.cfg_id, self.graph, self.decls, self.comb))
+
+    @property
+    def paths(self) -> PathOracle:
+        return self.graph.paths
+
+    def basic_block(self, block_idx: int) -> tuple:
+        return self.graph.basic_block(block_idx)
+
+    def descriptor(self, path_idx: int) -> PathDescriptor:
+        """The compiled form of a path, built once per path index."""
+        descriptor = self.descriptors.get(path_idx)
+        if descriptor is not None:
+            return descriptor
+        path = self.graph.paths[path_idx]
+        directions = self.graph.compute_direction(path)
+        blocks = []
+        for basic_block_idx in path:
+            if basic_block_idx < 0:
+                # dummy node
+                continue
+            blocks.append((len(blocks) + 1, basic_block_idx, self.graph.basic_block(basic_block_idx), directions[len(blocks)]))
+        if len(self.descriptors) >= DESCRIPTOR_CACHE_SIZE:
+            self.descriptors.clear()
+        descriptor = self.descriptors[path_idx] = PathDescriptor(self.cfg_id, path, tuple(blocks))
+        return descriptor
+
+
+def build_block(block) -> CompactCFG:
+    """Build the CFG of a single always/initial block.
+    Module level (and independent of the engine state) so it can run in a process pool."""
+    cfg = CFG()
+    cfg.basic_blocks(None, None, block)
+    cfg.partition()
+    cfg.build_cfg(None, None)
+    return cfg.compact
+
+
+def module_blocks(items, initials: bool) -> tuple:
+    """The always (followed by the initial) blocks in a module's items, with its decls and comb."""
+    cfg = CFG()
+    cfg.get_always(None, None, items)
+    blocks = list(cfg.always_blocks)
+    if initials:
+        # a separate CFG so the decls and comb aren't collected twice
+        initial = CFG()
+        initial.get_initial(None, None, items)
+        blocks += initial.initial_blocks
+    return blocks, cfg.decls, cfg.comb
+
+
+# part of every on-disk cache key, bump it when what build_block returns changes
+CFG_CACHE_FORMAT = b"3"
+
+
+class CFGCache:
+    """CFGs already built in this run, by module definition and by always/initial block, and
+    optionally on disk by the structure of each block so later runs can skip building them."""
+
+    def __init__(self, cache_dir: Optional[str] = None, coi: Optional[ConeOfInfluence] = None,
+                 merger: Optional[BranchMerger] = None):
+        self.cache_dir = cache_dir
+        # when set, CFGs are built from the blocks sliced to the cone of influence
+        self.coi = coi
+        # when set, the branches it picks are merged instead of forked
+        self.merger = merger
+        # both keyed by id of the AST node (list), which is kept alive alongside the result
+        self.modules = {}
+        self.blocks = {}
+        # seconds spent building CFGs that weren't cached
+        self.build_time = 0
+
+    def module_cfgs(self, items, module_name: str, initials: bool) -> list:
+        """The CFGs of the always blocks in items (followed by those of the initial blocks)."""
+        key = (id(items), initials)
+        if key in self.modules:
+            return self.modules[key][1]
+        blocks, decls, comb = self.module_blocks(items, module_name, initials)
+        cfgs = []
+        for cfg_id, block in enumerate(blocks):
+            cfgs.append(FrozenCFG(module_name, cfg_id, self.block_cfg(block), decls, comb))
+        self.modules[key] = (items, cfgs)
+        return cfgs
+
+    def module_blocks(self, items, module_name: str, initials: bool) -> tuple:
+        """module_blocks, sliced to the cone of influence if there is one and with branches merged."""
+        blocks, decls, comb = module_blocks(items, initials)
+        if self.coi is not None:
+            blocks = self.coi.slice_blocks(module_name, blocks)
+            comb = self.coi.slice_comb(module_name, comb)
+        if self.merger is not None:
+            blocks = self.merger.merge_blocks(module_name, blocks)
+        return blocks, decls, comb
+
+    def prebuild(self, modules, jobs: int) -> None:
+        """Build the CFGs of every block in the given module definitions up front, in a process pool."""
+        blocks = {}
+        for module in modules:
+            for block in self.module_blocks(module.items, module.name, True)[0]:
+                if not id(block) in self.blocks and self.load(block) is None:
+                    blocks[id(block)] = block
+        if len(blocks) < 2 or jobs < 2:
+            return
+        start = time.perf_counter()
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(min(jobs, len(blocks)), mp_context=ctx) as pool:
+            for block, built in zip(blocks.values(), pool.map(build_block, blocks.values())):
+                self.blocks[id(block)] = (block, built)
+                self.save(block, built)
+        self.build_time += time.perf_counter() - start
+
+    def block_cfg(self, block) -> CompactCFG:
+        """CFG of a single always/initial block, built at most once."""
+        if id(block) in self.blocks:
+            return self.blocks[id(block)][1]
+        built = self.load(block)
+        if built is None:
+            start = time.perf_counter()
+            built = build_block(block)
+            self.build_time += time.perf_counter() - start
+            self.save(block, built)
+        self.blocks[id(block)] = (block, built)
+        return built
+
+    def cache_path(self, block) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256()
+        digest.update(CFG_CACHE_FORMAT)
+        node_digest(block, digest)
+        return os.path.join(self.cache_dir, digest.hexdigest() + ".pickle")
+
+    def load(self, block) -> Optional[CompactCFG]:
+        """CFG of a block from the on-disk cache, None if not there."""
+        path = self.cache_path(block)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                built = pickle.load(f)
+        except Exception as e:
+            logging.debug(f"ignoring unreadable CFG cache {path}: {e}")
+            return None
+        self.blocks[id(block)] = (block, built)
+        return built
+
+    def save(self, block, built: CompactCFG) -> None:
+        path = self.cache_path(block)
+        if path is None:
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, PICKLE_RECURSION_LIMIT))
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(built, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.debug(f"could not write CFG cache {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            sys.setrecursionlimit(limit)
@@ -0,0 +1,278 @@
+"""Static cone of influence slicing. A signal-level def-use graph is built over every module
+definition (always blocks, continuous assigns and instance port connections, with the
+conditions a write is nested under counting as uses), and the cone of the assertions is
+everything they transitively depend on. Writes to signals outside the cone, the branches left
+with nothing to do, whole always blocks and child instances outside the cone are sliced away
+before the CFGs are built, so they no longer multiply the number of paths. Registers outside
+the cone keep the unconstrained symbol they are declared with, i.e. they become free inputs,
+and nothing left in the design reads them."""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from pyverilog.vparser.ast import Node, ModuleDef, Identifier, IfStatement, CaseStatement, ForStatement, WhileStatement
+from pyverilog.vparser.ast import Block, Always, Initial, Assign, NonblockingSubstitution, BlockingSubstitution, SingleStatement
+from pyverilog.vparser.ast import SystemCall, Decl, Input, Output, Inout, Ioport, Port, InstanceList, Partselect, Pointer, Concat
+
+# a signal qualified by the module definition it is declared in
+Signal = Tuple[str, str]
+
+
+def identifiers(node) -> Set[str]:
+    """Names of all identifiers used in an expression."""
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Identifier):
+            names.add(node.name)
+        elif isinstance(node, Node):
+            stack.extend(node.children())
+    return names
+
+
+def lvalue_targets(var) -> Tuple[Set[str], Set[str]]:
+    """The signals written by an lvalue, and the ones used to pick the bits written (indices)."""
+    if isinstance(var, (Partselect, Pointer)):
+        targets, uses = lvalue_targets(var.var)
+        for index in var.children()[1:]:
+            uses = uses | identifiers(index)
+        return targets, uses
+    if isinstance(var, Concat):
+        targets, uses = set(), set()
+        for item in var.list:
+            item_targets, item_uses = lvalue_targets(item)
+            targets |= item_targets
+            uses |= item_uses
+        return targets, uses
+    if isinstance(var, Identifier):
+        return {var.name}, set()
+    return identifiers(var), set()
+
+
+def has_system_call(node) -> bool:
+    """Whether a statement contains a system call, which the engine treats as an assertion failing."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, SystemCall):
+            return True
+        if isinstance(node, Node):
+            stack.extend(node.children())
+    return False
+
+
+class ConeOfInfluence:
+    """Def-use graph of a design and the cone of influence of its assertions."""
+
+    def __init__(self, modules: Iterable[ModuleDef]):
+        self.modules: Dict[str, ModuleDef] = {module.name: module for module in modules}
+        # signal -> signals it depends on
+        self.uses: Dict[Signal, Set[Signal]] = {}
+        # the conditions and arguments of assertions (system calls)
+        self.roots: Set[Signal] = set()
+        # the signals branch conditions (if, case, loops) read
+        self.branch_roots: Set[Signal] = set()
+        # port name -> direction, and the port names in declaration order, per module
+        self.port_dirs: Dict[str, Dict[str, str]] = {}
+        self.port_order: Dict[str, List[str]] = {}
+        # id of an always/initial block -> (original block, sliced block or None)
+        self.sliced = {}
+        # stands in for the always blocks of a module in the cone that were all sliced away,
+        # so its decls and comb still run
+        self.noop = Block([])
+
+        for name, module in self.modules.items():
+            self.collect_ports(name, module)
+        for name, module in self.modules.items():
+            self.collect(name, module.items, set())
+        self.cone: Set[Signal] = self.transitive(self.roots)
+        self.modules_in_cone: Set[str] = set(module for module, _ in self.cone)
+        # everything a branch condition or an assertion transitively reads
+        self.observed: Set[Signal] = self.cone | self.transitive(self.branch_roots)
+
+    def depend(self, module: str, targets: Iterable[str], uses: Iterable[str]) -> None:
+        uses = [(module, name) for name in uses]
+        for target in targets:
+            self.uses.setdefault((module, target), set()).update(uses)
+
+    def collect_ports(self, name: str, module: ModuleDef) -> None:
+        """Port directions, from the port list and from the declarations in the body."""
+        dirs = {}
+        order = []
+        if module.portlist is not None:
+            for port in module.portlist.ports:
+                if isinstance(port, Ioport):
+                    order.append(port.first.name)
+                    dirs[port.first.name] = type(port.first).__name__
+                elif isinstance(port, Port):
+                    order.append(port.name)
+        stack = list(module.items)
+        while stack:
+            item = stack.pop()
+            if isinstance(item, Decl):
+                for decl in item.list:
+                    if isinstance(decl, (Input, Output, Inout)):
+                        dirs[decl.name] = type(decl).__name__
+        self.port_dirs[name] = dirs
+        self.port_order[name] = order
+
+    def branch(self, module: str, cond) -> Set[str]:
+        """The signals a branch condition reads, which are recorded as branch roots."""
+        names = identifiers(cond)
+        self.branch_roots.update((module, name) for name in names)
+        return names
+
+    def collect(self, module: str, node, conds: Set[str]) -> None:
+        """Add the def-use edges of a statement (or list of them) nested under the given conditions."""
+        if isinstance(node, (list, tuple)):
+            for item in node:
+                self.collect(module, item, conds)
+        elif isinstance(node, (NonblockingSubstitution, BlockingSubstitution, Assign)):
+            targets, index_uses = lvalue_targets(node.left.var)
+            self.depend(module, targets, identifiers(node.right) | index_uses | conds)
+        elif isinstance(node, IfStatement):
+            inner = conds | self.branch(module, node.cond)
+            self.collect(module, node.true_statement, inner)
+            self.collect(module, node.false_statement, inner)
+        elif isinstance(node, CaseStatement):
+            inner = conds | self.branch(module, node.comp)
+            for case in node.caselist:
+                self.collect(module, case.statement, inner | self.branch(module, case.cond))
+        elif isinstance(node, ForStatement):
+            inner = conds | self.branch(module, node.cond)
+            self.collect(module, node.pre, conds)
+            self.collect(module, node.post, inner)
+            self.collect(module, node.statement, inner)
+        elif isinstance(node, WhileStatement):
+            self.collect(module, node.statement, conds | self.branch(module, node.cond))
+        elif isinstance(node, Block):
+            self.collect(module, node.statements, conds)
+        elif isinstance(node, (Always, Initial)):
+            self.collect(module, node.statement, conds)
+        elif isinstance(node, Decl):
+            self.collect(module, [item for item in node.list if isinstance(item, Assign)], conds)
+        elif isinstance(node, InstanceList):
+            for instance in node.instances:
+                self.collect_instance(module, instance)
+        elif isinstance(node, SystemCall):
+            self.roots.update((module, name) for name in conds | identifiers(node))
+        elif isinstance(node, Node):
+            for child in node.children():
+                self.collect(module, child, conds)
+
+    def collect_instance(self, module: str, instance) -> None:
+        """Connect the ports of a child instance to the signals they are bound to in the parent."""
+        child = instance.module
+        if not child in self.modules:
+            return
+        order = self.port_order.get(child, [])
+        for i, port in enumerate(instance.portlist):
+            portname = port.portname if port.portname is not None else (order[i] if i < len(order) else None)
+            if portname is None or port.argname is None:
+                continue
+            direction = self.port_dirs[child].get(portname)
+            parent_signals = identifiers(port.argname)
+            if direction != "Output":
+                # the child reads what the parent drives
+                self.uses.setdefault((child, portname), set()).update((module, name) for name in parent_signals)
+            if direction != "Input":
+                # and the parent reads what the child drives
+                for name in parent_signals:
+                    self.uses.setdefault((module, name), set()).add((child, portname))
+
+    def transitive(self, roots: Set[Signal]) -> Set[Signal]:
+        cone = set(roots)
+        pending = list(roots)
+        while pending:
+            for used in self.uses.get(pending.pop(), ()):
+                if not used in cone:
+                    cone.add(used)
+                    pending.append(used)
+        return cone
+
+    @property
+    def enabled(self) -> bool:
+        """Without assertions everything would be sliced away, so there's nothing to do."""
+        return bool(self.roots)
+
+    def module_in_cone(self, module: str) -> bool:
+        return not self.enabled or module in self.modules_in_cone
+
+    def slice_blocks(self, module: str, blocks: list) -> list:
+        """The always/initial blocks of a module with everything outside the cone removed.
+        Blocks left empty are dropped, a block is sliced into the same node every time."""
+        if not self.enabled:
+            return blocks
+        if not self.module_in_cone(module):
+            return []
+        sliced = []
+        for block in blocks:
+            if not id(block) in self.sliced:
+                self.sliced[id(block)] = (block, self.slice_stmt(module, block))
+            if self.sliced[id(block)][1] is not None:
+                sliced.append(self.sliced[id(block)][1])
+        return sliced or [self.noop]
+
+    def slice_comb(self, module: str, comb: list) -> list:
+        """The continuous assigns of a module that write into the cone."""
+        if not self.enabled:
+            return comb
+        return [assign for assign in comb if self.writes_cone(module, assign)]
+
+    def kept_blocks(self) -> list:
+        """The sliced always/initial blocks that are left."""
+        return [sliced for _, sliced in self.sliced.values() if sliced is not None]
+
+    def slice_stmt(self, module: str, stmt):
+        """A copy of the statement without the writes outside the cone, or None if nothing is left.
+        Unchanged subtrees are shared with the original AST."""
+        if stmt is None:
+            return None
+        if isinstance(stmt, (NonblockingSubstitution, BlockingSubstitution)):
+            targets, _ = lvalue_targets(stmt.left.var)
+            return stmt if any((module, target) in self.cone for target in targets) else None
+        if isinstance(stmt, IfStatement):
+            true_statement = self.slice_stmt(module, stmt.true_statement)
+            false_statement = self.slice_stmt(module, stmt.false_statement)
+            if true_statement is None and false_statement is None:
+                return None
+            if true_statement is stmt.true_statement and false_statement is stmt.false_statement:
+                return stmt
+            if true_statement is None:
+                # the branch still has to be there for the other direction to be taken
+                true_statement = stmt.true_statement
+            return IfStatement(stmt.cond, true_statement, false_statement, stmt.lineno)
+        if isinstance(stmt, Block):
+            statements = [self.slice_stmt(module, item) for item in stmt.statements]
+            statements = [item for item in statements if item is not None]
+            if not statements:
+                return None
+            if len(statements) == len(stmt.statements) and all(new is old for new, old in zip(statements, stmt.statements)):
+                return stmt
+            return Block(statements, stmt.scope, stmt.lineno)
+        if isinstance(stmt, (Always, Initial)):
+            statement = self.slice_stmt(module, stmt.statement)
+            if statement is None:
+                return None
+            if statement is stmt.statement:
+                return stmt
+            if isinstance(stmt, Always):
+                return Always(stmt.sens_list, statement, stmt.lineno)
+            return Initial(statement, stmt.lineno)
+        if isinstance(stmt, (CaseStatement, ForStatement, WhileStatement)):
+            # kept or dropped as a whole
+            return stmt if has_system_call(stmt) or self.writes_cone(module, stmt) else None
+        # anything else (system calls, delays, events) is kept as is
+        return stmt
+
+    def writes_cone(self, module: str, stmt) -> bool:
+        """Whether a statement writes any signal in the cone."""
+        stack = [stmt]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (NonblockingSubstitution, BlockingSubstitution, Assign)):
+                targets, _ = lvalue_targets(node.left.var)
+                if any((module, target) in self.cone for target in targets):
+                    return True
+            elif isinstance(node, Node):
+                stack.extend(node.children())
+        return False
@@ -7,11 +7,21 @@ from pyverilog.vparser.ast import Value, Reg, Initial, Eq, Identifier, Initial,
 from pyverilog.vparser.ast import Concat, BlockingSubstitution, Parameter, StringConst, Wire, PortArg, Instance
 from .execution_manager import ExecutionManager
 from .symbolic_state import SymbolicState
-from .cfg import CFG
+from .cfg import CFG, CFGCache
+from .coi import ConeOfInfluence
+from .merge import BranchMerger
+from .state_cache import StateCache
+from .module_summary import SummaryCache, StepSnapshot, StepEffect, ModuleSummary, Templates, known_symbols
+from .query_cache import QueryCache, QUERY_CACHE_SIZE
+from .model_cache import ModelCache
+from .path_scheduler import PathScheduler
+from .path_oracle import path_count
+from .path_trie import PathTrie
+from .expr import ModuleStore
 import re
 import os
 from optparse import OptionParser
-from typing import Optional
+from typing import NamedTuple, Optional
 import random, string
 import time
 import gc
@@ -20,15 +30,101 @@ import logging
 from helpers.utils import to_binary
 from strategies.dfs import DepthFirst
 import sys
+import multiprocessing
 from copy import deepcopy
 
 CONDITIONALS = (IfStatement, ForStatement, WhileStatement, CaseStatement)
 
+# engine attributes a worker process explores its range with, copied from the parent's engine
+WORKER_SETTINGS = ("debug", "cfg_cache", "coi", "merge", "subsume", "subsume_solver", "summary_cache_size",
+                   "query_cache", "query_cache_size", "model_cache_size", "assumptions", "solver_timeout",
+                   "unknown_policy", "deadline_at")
+
+
+class ExploreTask(NamedTuple):
+    """A range of path indices for a worker process to explore."""
+    ast: ModuleDef
+    modules: list
+    num_cycles: int
+    start: int
+    stop: int
+    # values of WORKER_SETTINGS
+    settings: dict
+
+
+def init_worker(first_violation, debug: bool) -> None:
+    """Process pool initializer, shares the index of the first violation found with the worker."""
+    global worker_first_violation
+    worker_first_violation = first_violation
+    if not debug:
+        sys.stdout = open(os.devnull, "w")
+
+
+def explore_range(task: ExploreTask) -> dict:
+    """Explore one range of path indices in a worker process and report what was found."""
+    result = {"violations": [], "stats": {}}
+    if task.start >= worker_first_violation.value:
+        return result
+    engine = ExecutionEngine()
+    for name, value in task.settings.items():
+        setattr(engine, name, value)
+    engine.start_path = task.start
+    engine.stop_path = task.stop
+    engine.first_violation = worker_first_violation
+    start_time = time.process_time()
+    engine.execute(task.ast, task.modules, None, None, task.num_cycles)
+    result["violations"] = engine.violations
+    result["stats"] = dict(engine.stats)
+    result["stats"]["elapsed"] = time.process_time() - start_time
+    return result
+
+
+worker_first_violation = None
+
+
 class ExecutionEngine:
     module_depth: int = 0
     search_strategy = DepthFirst()
     debug: bool = False
     done: bool = False
+    # path index range to explore, so a long run can be resumed from a checkpoint
+    start_path: int = 0
+    stop_path: Optional[int] = None
+    # index of the path currently being explored
+    path_index: int = 0
+    # number of worker processes used to explore the path space
+    jobs: int = 1
+    # index of the first path a worker found a violation on, shared by the workers (a
+    # multiprocessing Value), so none explores the paths after it
+    first_violation = None
+    # directory caching built CFGs between runs, None to always build them
+    cfg_cache: Optional[str] = None
+    # slice away everything outside the cone of influence of the assertions
+    coi: bool = False
+    # merge the states of short branches instead of forking the path
+    merge: bool = False
+    # skip the continuations of states already explored at a cycle boundary
+    subsume: bool = False
+    # also use the solver to find an earlier state with a weaker path condition
+    subsume_solver: bool = False
+    # number of CFG path summaries of child instances kept, 0 to always execute them
+    summary_cache_size: int = 0
+    # sqlite file caching feasibility queries between runs, setting it turns the query cache on
+    query_cache: Optional[str] = None
+    # number of feasibility queries cached in memory, 0 to not cache them (unless there's a file)
+    query_cache_size: int = 0
+    # number of satisfying models kept to answer feasibility checks, 0 to not keep any
+    model_cache_size: int = 0
+    # check branches with selector assumptions in one incremental solver instead of push/pop
+    assumptions: bool = False
+    # timeout of each solver check in milliseconds, 0 for none
+    solver_timeout: int = 0
+    # what a check that times out is taken as, one of path_solver.UNKNOWN_POLICIES
+    unknown_policy: str = "sat"
+    # wall clock seconds the exploration may take, None for no limit
+    deadline: Optional[float] = None
+    # the time.time() at which exploration stops, set from the deadline when execution starts
+    deadline_at: Optional[float] = None
 
     def check_pc_SAT(self, s: Solver, constraint: ExprRef) -> bool:
         """Check if pc is satisfiable before taking path."""
@@ -50,7 +146,10 @@ class ExecutionEngine:
         return False
 
     def solve_pc(self, s: Solver) -> bool:
-        """Solve path condition."""
+        """Solve path condition. Always asks the solver itself, callers read the model after."""
+        if hasattr(s, "limit"):
+            # the per-query timeout and deadline of a PathSolver
+            s.limit(s)
         result = str(s.check())
         if str(result) == "sat":
             model = s.model()
@@ -284,6 +383,9 @@ class ExecutionEngine:
 
     def assertions_always_intersect(self, m: ExecutionManager):
         """Get the always blocks that have the signals relevant to the assertions."""
+        if m.coi is not None and m.coi.enabled:
+            m.blocks_of_interest = [block for block in m.coi.kept_blocks() if isinstance(block, Always)]
+            return
         signals_of_interest = self.map_assertions_signals(m)
         blocks_of_interest = []
         for block in m.always_writes:
@@ -416,7 +518,7 @@ class ExecutionEngine:
                     manager.child_path_codes[instance_name] = to_binary(0)
                     manager.child_num_paths[instance_name] = sub_manager.num_paths
                     manager.config[instance_name] = to_binary(0)
-                    state.store[instance_name] = {}
+                    state.store[instance_name] = ModuleStore()
                     manager.dependencies[instance_name] = {}
                     manager.intermodule_dependencies[instance_name] = {}
                     manager.cond_assigns[instance_name] = {}
@@ -425,7 +527,7 @@ class ExecutionEngine:
                 manager.child_path_codes[module.name] = to_binary(0)
                 manager.child_num_paths[module.name] = sub_manager.num_paths
                 manager.config[module.name] = to_binary(0)
-                state.store[module.name] = {}
+                state.store[module.name] = ModuleStore()
                 manager.dependencies[module.name] = {}
                 instance_name = module.name
                 manager.intermodule_dependencies[instance_name] = {}
@@ -512,7 +614,7 @@ class ExecutionEngine:
                 manager.abandon = False
                 manager.reg_writes.clear()
                 for name in manager.names_list:
-                    state.store[name] = {}
+                    state.store[name] = ModuleStore()
 
             #manager.path_code = to_binary(0)
             #print(f" finishing {ast.name}")
@@ -526,11 +628,181 @@ class ExecutionEngine:
                 for j in range(len(paths[i])):
                     manager.config[manager.names_list[j]] = paths[i][j]
 
+    def report_violation(self, manager: ExecutionManager, state: SymbolicState) -> Optional[dict]:
+        """Solve for and print a counterexample to the violated assertion.
+        Returns None if the path condition turns out to be UNSAT."""
+        print("Assertion violation")
+        #manager.assertion_violation = False
+        counterexample = {}
+        symbols_to_values = {}
+        solver_start = time.process_time()
+        if self.solve_pc(state.pc):
+            solver_end = time.process_time()
+            manager.solver_time += solver_end - solver_start
+            solved_model = state.pc.model()
+            decls =  solved_model.decls()
+            for item in decls:
+                symbols_to_values[item.name()] = solved_model[item]
+
+            # plug in phase
+            for module in state.store:
+                for signal in state.store[module]:
+                    for symbol in symbols_to_values:
+                        if state.store[module][signal] == symbol:
+                            counterexample[signal] = symbols_to_values[symbol]
+
+            print(counterexample)
+            # z3 values don't survive pickling across worker processes
+            return {signal: str(value) for signal, value in counterexample.items()}
+        else:
+            print("UNSAT")
+            return None
+
+    def execute_parallel(self, ast: ModuleDef, modules, num_cycles: int, scheduler: PathScheduler) -> None:
+        """Split the path space into prefix aligned ranges and explore them in a process pool.
+        Workers are spawned fresh so each has its own z3 context, SymbolicState and ExecutionManager."""
+        ctx = multiprocessing.get_context("spawn")
+        start_path = self.start_path
+        stop_path = scheduler.total if self.stop_path is None else min(self.stop_path, scheduler.total)
+        first_violation = ctx.Value("q", stop_path)
+        settings = {name: getattr(self, name) for name in WORKER_SETTINGS}
+        tasks = []
+        for start, stop in scheduler.partition(self.jobs * 4):
+            start, stop = max(start, start_path), min(stop, stop_path)
+            if start < stop:
+                tasks.append(ExploreTask(ast, modules, num_cycles, start, stop, settings))
+
+        self.stats = {}
+        # the pool's class level bookkeeping is per process, so every range gets a fresh worker
+        with ctx.Pool(self.jobs, initializer=init_worker, initargs=(first_violation, self.debug), maxtasksperchild=1) as pool:
+            for result in pool.imap_unordered(explore_range, tasks):
+                for key, value in result["stats"].items():
+                    self.stats[key] = self.stats.get(key, 0) + value
+                self.violations += result["violations"]
+
+        # like a serial run, report the violation on the first path only; workers on later
+        # ranges may have found one before the earlier ranges got to theirs
+        if self.violations:
+            self.violations = [min(self.violations, key=lambda violation: violation[0])]
+        for path_index, counterexample in self.violations:
+            print(f"Assertion violation on path {path_index}")
+            print(counterexample if counterexample is not None else "UNSAT")
+        print(f"Paths explored {self.stats.get('paths_explored', 0)}")
+        if self.subsume:
+            print(f"Subsumption hits {self.stats.get('subsumption_hits', 0)}, misses {self.stats.get('subsumption_misses', 0)}, "
+                  f"{self.stats.get('paths_subsumed', 0)} paths skipped")
+        if "paths_unexplored" in self.stats:
+            print(f"{self.stats['paths_unexplored']} paths left unexplored")
+        print(f"Solver time {self.stats.get('solver_time', 0)}")
+        print(f"Worker time {self.stats.get('elapsed', 0)}")
+
+    def iterate_paths(self, scheduler: PathScheduler, pc, trie: PathTrie):
+        """The (index, digits) pairs of the range to explore, then those of the ranges deferred
+        because a check timed out, again with a longer timeout if there is time left."""
+        yield from scheduler.iterate_digits(self.start_path, self.stop_path)
+        if not self.deferred or self.out_of_time():
+            return
+        deferred, self.deferred = self.deferred, []
+        print(f"Retrying {len(deferred)} deferred path ranges")
+        pc.retry_deferred()
+        # the trie still holds the states where the checks timed out
+        trie.forget()
+        for start, stop in deferred:
+            yield from scheduler.iterate_digits(start, stop)
+
+    def out_of_time(self) -> bool:
+        return self.deadline_at is not None and time.time() >= self.deadline_at
+
+    def step_prefix(self, scheduler: PathScheduler, key) -> int:
+        """Number of scheduler digits deciding a step of path_steps, i.e. those up to and including its CFG."""
+        prefix = scheduler.prefix_length(key[0], key[1])
+        if key[2] == "comb":
+            return prefix
+        return prefix - scheduler.cfg_counts[key[0]] + key[2] + 1
+
+    def path_steps(self, manager: ExecutionManager, scheduler: PathScheduler, digits, cfgs_by_module) -> list:
+        """Flatten a multi-module, multi-cycle path (given by its scheduler digits) into its
+        sequence of steps. Each step is one basic block (or the end of cycle comb replay) and is
+        keyed by its position in the prefix trie: (module, cycle, cfg, basic block, direction)."""
+        steps = []
+        pos = 0
+        for modules_seen, module_name in enumerate(scheduler.module_names):
+            curr_module = manager.names_list[modules_seen]
+            module_cfgs = cfgs_by_module[module_name]
+            for cycle in range(scheduler.num_cycles):
+                for cfg in module_cfgs:
+                    descriptor = cfg.descriptor(digits[pos])
+                    pos += 1
+                    for k, basic_block_idx, basic_block, direction in descriptor.blocks:
+                        key = (module_name, cycle, descriptor.cfg_id, k, basic_block_idx, direction)
+                        steps.append((key, (curr_module, cycle, basic_block, direction)))
+                # only do once, and the last CFG 
+                if module_cfgs:
+                    comb = module_cfgs[-1].comb
+                    steps.append(((module_name, cycle, "comb"), (curr_module, cycle, comb, None)))
+        return steps
+
+    def summary_unit(self, steps: list, pos: int, instance_of: dict) -> int:
+        """Number of steps from pos on making up one CFG path of a child instance in one cycle,
+        0 if the step at pos doesn't start one."""
+        key = steps[pos][0]
+        if not key[0] in instance_of or key[2] == "comb" or key[3] != 1:
+            return 0
+        end = pos + 1
+        while end < len(steps) and steps[end][0][:3] == key[:3]:
+            end += 1
+        return end - pos
+
+    def run_summarized(self, manager: ExecutionManager, state: SymbolicState, unit: list, modules_dict: dict,
+                       trie: PathTrie, summaries: SummaryCache, module_name: str):
+        """Run the steps of one CFG path of a child instance, from a summary if one was recorded
+        for the state it starts in, and record one otherwise. Every step is checkpointed as
+        usual. Returns the key of the last step run."""
+        instance = unit[0][1][0]
+        manager.curr_module = instance
+        manager.cycle = unit[0][1][1]
+        position = (unit[0][0][1], unit[0][0][2], tuple(key[4:] for key, _ in unit))
+        summary_key, renaming = summaries.key(module_name, position, manager, state, instance)
+        summary = summaries.get(summary_key)
+        if summary is not None:
+            fresh = summary.fresh_symbols()
+            for (key, _), effect in zip(unit, summary.steps):
+                state.pc.decision = key
+                applied = effect.apply(manager, state, instance, renaming.symbols, fresh, self.search_strategy.take_branch)
+                trie.checkpoint(manager, state, key)
+                if not applied:
+                    break
+            return key
+
+        templates = Templates(renaming, known_symbols(state))
+        effects = []
+        for key, (_, cycle, stmts, direction) in unit:
+            state.pc.decision = key
+            before = StepSnapshot(manager, state)
+            state.pc.taken = []
+            for stmt in stmts:
+                self.search_strategy.visit_stmt(manager, state, stmt, modules_dict, direction)
+            if effects is not None:
+                effect = StepEffect.record(before, manager, state, instance, state.pc.taken, templates)
+                effects = None if effect is None else effects + [effect]
+            state.pc.taken = None
+            trie.checkpoint(manager, state, key)
+            if manager.ignore and not manager.assertion_violation:
+                # infeasible, and learned as a conflict if it can be
+                return key
+        if effects is None or templates.unsound:
+            summaries.unsummarized += 1
+        else:
+            summaries.put(summary_key, ModuleSummary(tuple(effects), len(templates.fresh)))
+        return key
+
     #@profile     
     def execute(self, ast: ModuleDef, modules, manager: Optional[ExecutionManager], directives, num_cycles: int) -> None:
         """Drives symbolic execution."""
         gc.collect()
         print(f"Executing for {num_cycles} clock cycles")
+        if self.deadline is not None and self.deadline_at is None:
+            self.deadline_at = time.time() + self.deadline
         self.module_depth += 1
         state: SymbolicState = SymbolicState()
         if manager is None:
@@ -540,9 +812,21 @@ class ExecutionEngine:
             # a dictionary keyed by module name, that gives the list of cfgs
             cfgs_by_module = {}
             cfg_count_by_module = {}
+            # the module definition of each child instance
+            instance_of = {}
+            cone = ConeOfInfluence(modules) if self.coi else None
+            if cone is not None and cone.enabled:
+                print(f"Cone of influence: {len(cone.cone)} signals in {len(cone.modules_in_cone)} modules")
+            manager.coi = cone
+            merger = None
+            if self.merge:
+                # merged values can't reach conditions or assertions, which the def-use graph tells
+                merger = BranchMerger((cone or ConeOfInfluence(modules)).observed)
+            cfgs = CFGCache(self.cfg_cache, cone, merger)
+            if self.jobs > 1:
+                cfgs.prebuild(list(modules) + [ast], self.jobs)
             for module in modules:
                 modules_dict[module.name] = module
-                always_blocks_by_module = {module.name: []}
                 manager.seen_mod[module.name] = {}
                 cfgs_by_module[module.name] = []
                 sub_manager = ExecutionManager()
@@ -556,79 +840,28 @@ class ExecutionEngine:
                     for i in range(num_instances):
                         instance_name = f"{module.name}_{i}"
                         manager.names_list.append(instance_name)
-                        cfgs_by_module[instance_name] = []
-                        # build X CFGx for the particular module 
-                        cfg = CFG()
-                        cfg2 = CFG()
-                        cfg.reset()
-                        cfg.get_always(manager, state, module.items)
-                        cfg2.get_initial(manager, state, module.items)
-                        cfg_count = len(cfg.always_blocks)
-                        initial_count = len(cfg2.initial_blocks)
-                        print("hi")
-                        print(initial_count)
-                        for k in range(cfg_count):
-                            cfg.basic_blocks(manager, state, cfg.always_blocks[k])
-                            cfg.partition()
-                            # print(cfg.all_nodes)
-                            # print(cfg.partition_points)
-                            # print(len(cfg.basic_block_list))
-                            # print(cfg.edgelist)
-                            cfg.build_cfg(manager, state)
-                            cfg.module_name = ast.name
-
-                            cfgs_by_module[instance_name].append(deepcopy(cfg))
-                            cfg.reset()
-                            #print(cfg.paths)
-
-
-                        state.store[instance_name] = {}
+                        instance_of[instance_name] = module.name
+                        # every instance shares the CFGs built for the module definition
+                        cfgs_by_module[instance_name] = cfgs.module_cfgs(module.items, module.name, False)
+                        cfg_count = len(cfgs_by_module[instance_name])
+
+                        state.store[instance_name] = ModuleStore()
                         manager.dependencies[instance_name] = {}
                         manager.intermodule_dependencies[instance_name] = {}
                         manager.cond_assigns[instance_name] = {}
                 else: 
                     manager.names_list.append(module.name)
-                    # build X CFGx for the particular module 
-                    cfg = CFG()
-                    # also need some CFGs for the initial blocks
-                    initials = CFG()
-                    cfg.all_nodes = []
-                    #cfg.partition_points = []
-                    cfg.get_always(manager, state, ast.items)
-                    initials.get_initial(manager, state, ast.items)
-
-                    cfg_count = len(cfg.always_blocks) + len(initials.initial_blocks)
-                    always_blocks_by_module[module.name] = deepcopy(cfg.always_blocks) + deepcopy(initials.initial_blocks)
-                    num_standard_always = len(cfg.always_blocks)
-                    for k in range(cfg_count):
-                        if k >= num_standard_always:
-                            initials.basic_block_list = []
-                            initials.partition_points.clear()
-                            initials.partition_points.add(0)
-                            initials.basic_blocks(manager, state, initials.initial_blocks[0])
-                            initials.partition()
-                            initials.build_cfg(manager,state)
-
-                            initials.module_name = ast.name
-                            cfgs_by_module[module.name].append(deepcopy(initials))
-                            initials.reset()
-                        else: 
-                            cfg.basic_blocks(manager, state, always_blocks_by_module[module.name][k])
-                            cfg.partition()
-                            # print(cfg.partition_points)
-                            # print(len(cfg.basic_block_list))
-                            # print(cfg.edgelist)
-                            cfg.build_cfg(manager, state)
-                            #print(cfg.cfg_edges)
-                            cfg.module_name = ast.name
-                            cfgs_by_module[module.name].append(deepcopy(cfg))
-                            cfg.reset()
-                            #print(cfg.paths)
-
-                    state.store[module.name] = {}
+                    # CFGs for the always blocks, followed by the ones for the initial blocks
+                    cfgs_by_module[module.name] = cfgs.module_cfgs(ast.items, ast.name, True)
+                    cfg_count = len(cfgs_by_module[module.name])
+
+                    state.store[module.name] = ModuleStore()
                     manager.dependencies[module.name] = {}
                     manager.intermodule_dependencies[module.name] = {}
                     manager.cond_assigns[module.name] = {}
+            manager.cfg_time = cfgs.build_time
+            if merger is not None:
+                print(f"Merged {merger.num_merged} branches")
             total_paths = 1
             for x in manager.child_num_paths.values():
                 total_paths *= x
@@ -669,78 +902,137 @@ class ExecutionEngine:
         curr_cfg = 0
         for module_name in cfgs_by_module:
             for cfg in cfgs_by_module[module_name]:
-                print(cfg.initial_blocks)
                 mapped_paths[module_name][curr_cfg] = cfg.paths
                 curr_cfg += 1
             curr_cfg = 0
 
-        print(mapped_paths)
+        # the paths themselves are unranked on demand, only their counts are known up front
+        for module_name in cfgs_by_module:
+            print(f"Paths per CFG of {module_name}: {[path_count(paths) for paths in mapped_paths[module_name].values()]}")
 
         stride_length = cfg_count
-        single_paths_by_module = {}
-        total_paths_by_module = {}
-        for module_name in cfgs_by_module:
-            single_paths_by_module[module_name] = list(product(*mapped_paths[module_name].values()))
-            total_paths_by_module[module_name] = list(tuple(product(single_paths_by_module[module_name], repeat=int(num_cycles))))
-        print(f"tp {total_paths_by_module}")
-        keys, values = zip(*total_paths_by_module.items())
-        total_paths = [dict(zip(keys, path)) for path in product(*values)]
-        #print(total_paths)
-        
-        #single_paths = list(product(*mapped_paths[manager.curr_module].values()))
-        #total_paths = list(tuple(product(single_paths, repeat=int(num_cycles))))
+        # paths are handed out one at a time instead of taking the product up front
+        scheduler = PathScheduler({name: mapped_paths[name] for name in cfgs_by_module}, num_cycles)
+        print(f"Total paths {scheduler.total}")
+        self.violations = []
+        if self.jobs > 1:
+            self.execute_parallel(ast, modules, num_cycles, scheduler)
+            self.module_depth -= 1
+            return
 
         # for each combinatoin of multicycle paths
+        trie = PathTrie()
+        states = StateCache(self.subsume_solver) if self.subsume else None
+        summaries = SummaryCache(self.summary_cache_size) if self.summary_cache_size > 0 else None
+        if self.query_cache_size > 0 or self.query_cache is not None:
+            state.pc.queries = QueryCache(self.query_cache_size or QUERY_CACHE_SIZE, self.query_cache)
+        if self.model_cache_size > 0:
+            state.pc.models = ModelCache(self.model_cache_size)
+        if self.assumptions:
+            state.pc.use_assumptions()
+        state.pc.timeout = self.solver_timeout
+        state.pc.deadline = self.deadline_at
+        state.pc.unknown_policy = self.unknown_policy
+        self.deferred = []
+        deadline_reached = False
+        stop_path = scheduler.total if self.stop_path is None else min(self.stop_path, scheduler.total)
+        for i, digits in self.iterate_paths(scheduler, state.pc, trie):
+            if self.out_of_time():
+                deadline_reached = True
+                break
+            if self.first_violation is not None and i >= self.first_violation.value:
+                # a worker found a violation on an earlier path
+                break
+            self.path_index = i
+            state.pc.deferred = False
+            steps = self.path_steps(manager, scheduler, digits, cfgs_by_module)
+            depth = trie.restore(manager, state, [key for key, _ in steps])
+            if depth < 0:
+                manager.prev_store = state.store
+                manager.init_state(state, manager.prev_store, ast)
+                # initalize inputs with symbols for all submodules too
+                for module_name in manager.names_list:
+                    manager.curr_module = module_name
+                    # actually want to terminate this part after the decl and comb part
+                    self.search_strategy.visit_module(manager, state, ast, modules_dict)
+                    
+                # decls and comb are per module, the same for each of its CFGs
+                module_cfgs = cfgs_by_module[manager.curr_module]
+                if module_cfgs:
+                    for node in module_cfgs[0].decls:
+                        self.search_strategy.visit_stmt(manager, state, node, modules_dict, None)
+                    for node in module_cfgs[0].comb:
+                        self.search_strategy.visit_stmt(manager, state, node, modules_dict, None) 
+       
+                manager.curr_module = manager.names_list[0]
+                # makes assumption top level module is first in line
+                # ! no longer path code as in bit string, but indices
+                # the state after initialization is the root of the prefix trie
+                trie.checkpoint(manager, state, None)
+                depth = 0
+
+            if depth == 0:
+                self.check_state(manager, state)
+
+            # number of leading digits of the paths skipped along with this one, as their prefix is infeasible
+            skip_prefix = None
+            if depth > 0 and manager.ignore and not manager.assertion_violation:
+                skip_prefix = self.step_prefix(scheduler, steps[depth - 1][0])
+
+            # only the suffix that differs from the previous path is executed
+            subsumed = False
+            remaining = steps[depth:] if skip_prefix is None else []
+            pos = 0
+            while pos < len(remaining):
+                key, (module_name, cycle, stmts, direction) = remaining[pos]
+                unit = self.summary_unit(remaining, pos, instance_of) if summaries is not None else 0
+                if unit:
+                    key = self.run_summarized(manager, state, remaining[pos:pos + unit], modules_dict, trie, summaries,
+                                              instance_of[key[0]])
+                    pos += unit
+                else:
+                    manager.curr_module = module_name
+                    manager.cycle = cycle
+                    # branch literals are tagged with the decision they come from
+                    state.pc.decision = key
+                    for stmt in stmts:
+                        self.search_strategy.visit_stmt(manager, state, stmt, modules_dict, direction)
+                    trie.checkpoint(manager, state, key)
+                    pos += 1
+                if manager.ignore and not manager.assertion_violation:
+                    # the path is infeasible from here on, and so is every path sharing this prefix
+                    skip_prefix = self.step_prefix(scheduler, key)
+                    break
+                if states is not None and key[2] == "comb" and key != steps[-1][0] and not manager.ignore:
+                    prefix = scheduler.prefix_length(key[0], key[1])
+                    # all continuations of this state get explored only if this is the first path of the subtree
+                    remember = not any(digits[prefix:])
+                    if states.subsumed(key, state.store, state.pc, remember):
+                        end = scheduler.subtree_end(digits, prefix)
+                        scheduler.resume_at = end
+                        manager.paths_subsumed += min(end, stop_path) - i
+                        subsumed = True
+                        break
+            if subsumed:
+                continue
+            if skip_prefix is not None:
+                end = scheduler.subtree_end(digits, skip_prefix)
+                scheduler.resume_at = end
+                # none of them gets visited, but they count as explored and pruned like before
+                skipped = min(end, stop_path) - i
+                if state.pc.deferred:
+                    # a check timed out, the paths get explored again after the others
+                    self.deferred.append((i, min(end, stop_path)))
+                else:
+                    manager.paths_explored += skipped
+                    manager.paths_pruned += skipped
+                    manager.prefixes_pruned += 1
+                manager.curr_level = 0
+                for module_name in manager.instances_seen:
+                    manager.instances_seen[module_name] = 0
+                    manager.instances_loc[module_name] = ""
+                continue
 
-        for i in range(len(total_paths)):
-            manager.prev_store = state.store
-            manager.init_state(state, manager.prev_store, ast)
-            # initalize inputs with symbols for all submodules too
-            for module_name in manager.names_list:
-                manager.curr_module = module_name
-                # actually want to terminate this part after the decl and comb part
-                self.search_strategy.visit_module(manager, state, ast, modules_dict)
-                
-            for cfg_idx in range(cfg_count):
-                for node in cfgs_by_module[manager.curr_module][cfg_idx].decls:
-                    self.search_strategy.visit_stmt(manager, state, node, modules_dict, None)
-                for node in cfgs_by_module[manager.curr_module][cfg_idx].comb:
-                    self.search_strategy.visit_stmt(manager, state, node, modules_dict, None) 
-   
-            manager.curr_module = manager.names_list[0]
-            # makes assumption top level module is first in line
-            # ! no longer path code as in bit string, but indices
-
-            
-            self.check_state(manager, state)
-
-            curr_path = total_paths[i]
-
-            modules_seen = 0
-            for module_name in curr_path:
-                manager.curr_module = manager.names_list[modules_seen]
-                manager.cycle = 0
-                for complete_single_cycle_path in curr_path[module_name]:
-                    for cfg_path in complete_single_cycle_path:
-                        directions = cfgs_by_module[module_name][complete_single_cycle_path.index(cfg_path)].compute_direction(cfg_path)
-                        k: int = 0
-                        for basic_block_idx in cfg_path:
-                            if basic_block_idx < 0: 
-                                # dummy node
-                                continue
-                            else:
-                                direction = directions[k]
-                                k += 1
-                                basic_block = cfgs_by_module[module_name][complete_single_cycle_path.index(cfg_path)].basic_block_list[basic_block_idx]
-                                for stmt in basic_block:
-                                    # print(f"updating curr mod {manager.curr_module}")
-                                    #self.check_state(manager, state)
-                                    self.search_strategy.visit_stmt(manager, state, stmt, modules_dict, direction)
-                                            # only do once, and the last CFG 
-                    for node in cfgs_by_module[module_name][cfg_count-1].comb:
-                        self.search_strategy.visit_stmt(manager, state, node, modules_dict, None)  
-                    manager.cycle += 1
-                modules_seen += 1
             manager.cycle = 0
             self.done = True
             self.check_state(manager, state)
@@ -752,44 +1044,60 @@ class ExecutionEngine:
                 manager.instances_loc[module_name] = ""
             if self.debug:
                 print("------------------------")
+            if state.pc.deferred:
+                self.deferred.append((i, i + 1))
+                continue
+            manager.paths_explored += 1
+            if manager.abandon:
+                manager.paths_pruned += 1
             if (manager.assertion_violation):
-                print("Assertion violation")
-                #manager.assertion_violation = False
-                counterexample = {}
-                symbols_to_values = {}
-                solver_start = time.process_time()
-                if self.solve_pc(state.pc):
-                    solver_end = time.process_time()
-                    manager.solver_time += solver_end - solver_start
-                    solved_model = state.pc.model()
-                    decls =  solved_model.decls()
-                    for item in decls:
-                        symbols_to_values[item.name()] = solved_model[item]
-
-                    # plug in phase
-                    for module in state.store:
-                        for signal in state.store[module]:
-                            for symbol in symbols_to_values:
-                                if state.store[module][signal] == symbol:
-                                    counterexample[signal] = symbols_to_values[symbol]
-
-                    print(counterexample)
-                else:
-                    print("UNSAT")
-                return
-            
-            state.pc.reset()
+                self.violations.append((i, self.report_violation(manager, state)))
+                if self.first_violation is not None:
+                    with self.first_violation.get_lock():
+                        self.first_violation.value = min(self.first_violation.value, i)
+                break
 
             for module in manager.dependencies:
                 module = {}
-                
-            
-            manager.ignore = False
-            manager.abandon = False
-            manager.reg_writes.clear()
-            for name in manager.names_list:
-                state.store[name] = {}
 
+        self.stats = {"paths_explored": manager.paths_explored, "paths_pruned": manager.paths_pruned,
+                      "solver_time": manager.solver_time, "cfg_time": manager.cfg_time,
+                      "steps_reused": trie.reused, "steps_executed": trie.executed,
+                      "branch_literal_hits": state.pc.hits, "conflicts_learned": len(state.pc.cube_literals),
+                      "conflict_hits": state.pc.conflict_hits, "sliced_checks": state.pc.sliced_checks,
+                      "prefixes_pruned": manager.prefixes_pruned, "solver_unknowns": state.pc.unknowns}
+        if deadline_reached or self.deferred:
+            # whatever is left of the range, along with deferred paths that weren't retried
+            start_path = min(self.start_path, stop_path)
+            unexplored = stop_path - start_path - manager.paths_explored - manager.paths_subsumed
+            self.stats["paths_unexplored"] = unexplored
+            if deadline_reached:
+                print(f"Deadline reached, {unexplored} paths left unexplored")
+            else:
+                print(f"{unexplored} deferred paths left unexplored")
+        if state.pc.unknowns:
+            print(f"{state.pc.unknowns} solver checks timed out")
+        queries = state.pc.queries
+        if queries is not None:
+            queries.close()
+            self.stats.update({"query_hits": queries.hits, "query_misses": queries.misses,
+                               "query_time_saved": queries.time_saved})
+            print(f"Query cache: {queries.hits} hits, {queries.misses} misses ({queries.hit_rate:.0%} hit rate), "
+                  f"{queries.time_saved:.3f}s solver time saved")
+        models = state.pc.models
+        if models is not None:
+            self.stats.update({"model_sat_hits": models.sat_hits, "model_unsat_hits": models.unsat_hits,
+                               "model_misses": models.misses})
+            print(f"Model cache: {models.sat_hits} sat hits, {models.unsat_hits} unsat hits, {models.misses} misses "
+                  f"({models.hit_rate:.0%} hit rate)")
+        if summaries is not None and summaries.hits + summaries.misses:
+            self.stats.update({"summary_hits": summaries.hits, "summary_misses": summaries.misses,
+                               "summary_evictions": summaries.evictions, "paths_unsummarized": summaries.unsummarized})
+            print(f"Module summaries: {summaries.hits} hits, {summaries.misses} misses ({summaries.hit_rate:.0%} hit rate)")
+        if states is not None:
+            self.stats.update({"paths_subsumed": manager.paths_subsumed, "subsumption_hits": states.hits,
+                               "subsumption_misses": states.misses})
+            print(f"Subsumption hits {states.hits}, misses {states.misses}, {manager.paths_subsumed} paths skipped")
         self.module_depth -= 1
 
 
@@ -49,6 +49,8 @@ class ExecutionManager:
     opt_3: bool = False
     assertions = []
     blocks_of_interest = []
+    # the ConeOfInfluence of the assertions, when slicing is on
+    coi = None
     init_run_flag: bool = False
     ignore = False
     inital_state = {}
@@ -67,6 +69,13 @@ class ExecutionManager:
     instances_seen = {}
     instances_loc = {}
     solver_time = 0
+    cfg_time = 0
+    paths_explored: int = 0
+    paths_pruned: int = 0
+    # paths skipped because their state at a cycle boundary was already explored
+    paths_subsumed: int = 0
+    # infeasible path prefixes whose whole subtree of paths was skipped
+    prefixes_pruned: int = 0
 
     def merge_states(self, state: SymbolicState, store, flag, module_name=""):
         """Merges two states. The flag is for when we are just merging a particular module"""
@@ -0,0 +1,216 @@
+"""Hash-consed symbolic expressions for the symbolic store. Every expression written to the
+store is interned, so structurally identical expressions (the same text) are one shared
+object across paths, cycles and store snapshots. Each node is typed (const, symbol, select,
+ite or op) and knows its operator and children, which are interned nodes as well, so a
+subterm common to several expressions is one object and anything derived from it (the
+symbols it mentions, its z3 term) is computed once and shared. Expressions stay str
+subclasses so the existing rvalue parsing keeps working on them; the text is what they mean,
+the structure is how they decompose."""
+
+import re
+import weakref
+from typing import Optional
+from z3 import BitVec, Int2BV, IntVal
+
+# symbols are generated by init_symbol, see helpers/utils.py
+SYMBOL_RE = re.compile(r"\b[A-Za-z0-9]{16}\b")
+SELECT_RE = re.compile(r"^([A-Za-z0-9_.]+)\[(.*)\]$")
+
+
+class Expr(str):
+    """An interned symbolic expression node. Don't construct directly, use intern_expr."""
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # z3 terms cached on the node are tied to this process, only ship the text
+        return (intern_expr, (str(self),))
+
+    @property
+    def kind(self) -> str:
+        """One of const, symbol, select, ite or op."""
+        try:
+            return self._kind
+        except AttributeError:
+            pass
+        if self.isdigit():
+            kind = "const"
+        elif self.startswith("If("):
+            kind = "ite"
+        elif SELECT_RE.match(self):
+            kind = "select"
+        elif " " not in self.strip():
+            kind = "symbol"
+        else:
+            kind = "op"
+        self._kind = kind
+        return kind
+
+    @property
+    def op(self):
+        """The operator of an op node ("If" for ite, "[]" for select), None for leaves."""
+        self.children
+        return self._op
+
+    @property
+    def children(self) -> tuple:
+        """The interned operands of the node, empty for leaves and for text that doesn't decompose."""
+        try:
+            return self._children
+        except AttributeError:
+            pass
+        self._op, children = decompose(self)
+        self._children = tuple(intern_expr(child) for child in children)
+        return self._children
+
+    @property
+    def base(self) -> "Expr":
+        """The expression a bit/part select is taken from, or the node itself."""
+        try:
+            return self._base
+        except AttributeError:
+            pass
+        self._base = self.children[0] if self.kind == "select" and self.children else self
+        return self._base
+
+    @property
+    def symbols(self) -> frozenset:
+        """The free symbols this expression depends on."""
+        try:
+            return self._symbols
+        except AttributeError:
+            pass
+        if self.children:
+            # shared subterms have theirs already
+            self._symbols = frozenset().union(*(child.symbols for child in self.children))
+        else:
+            self._symbols = frozenset(SYMBOL_RE.findall(self))
+        return self._symbols
+
+    def bitvec(self, width: int):
+        """The z3 bitvector named by this expression, built once per width."""
+        try:
+            terms = self._bitvecs
+        except AttributeError:
+            terms = self._bitvecs = {}
+        term = terms.get(width)
+        if term is None:
+            term = terms[width] = BitVec(str(self), width)
+        return term
+
+
+def split_top(text: str, sep=None) -> Optional[list]:
+    """Split text on sep (whitespace by default) outside of brackets, None if they don't balance."""
+    parts = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(text):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif depth == 0 and (char == sep or (sep is None and char.isspace())):
+            parts.append(text[start:i])
+            start = i + 1
+    if depth != 0:
+        return None
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()] if sep is None else [part.strip() for part in parts]
+
+
+def decompose(expr: Expr) -> tuple:
+    """(operator, operand texts) of an expression, as built by rvalue_parser: If(c, t, e),
+    base[index], (op a b ...) and a op b [op c ...] (taken as left associative) or op a."""
+    text = expr.strip()
+    kind = expr.kind
+    if kind == "ite":
+        args = split_top(text[3:-1], ",") if text.endswith(")") else None
+        return ("If", args) if args is not None and len(args) == 3 else ("If", ())
+    if kind == "select":
+        match = SELECT_RE.match(text)
+        return "[]", (match.group(1), match.group(2).strip())
+    if kind != "op":
+        return None, ()
+    tokens = split_top(text)
+    if tokens is None:
+        return None, ()
+    if len(tokens) == 1 and text.startswith("(") and text.endswith(")"):
+        tokens = split_top(text[1:-1])
+        if tokens is None or len(tokens) < 2:
+            return None, ()
+        return tokens[0], tuple(tokens[1:])
+    if len(tokens) == 2:
+        return tokens[0], (tokens[1],)
+    if len(tokens) >= 3 and len(tokens) % 2 == 1:
+        return tokens[-2], (" ".join(tokens[:-2]), tokens[-1])
+    return None, ()
+
+
+# weak so expressions no path references anymore can be collected
+_exprs = weakref.WeakValueDictionary()
+
+
+def intern_expr(value):
+    """Return the shared node for a string expression. Anything else (ints, concat dicts,
+    pyverilog nodes) is passed through untouched."""
+    if type(value) is Expr:
+        return value
+    if not isinstance(value, str):
+        return value
+    expr = _exprs.get(value)
+    if expr is None:
+        expr = Expr(value)
+        _exprs[value] = expr
+    return expr
+
+
+# z3 terms for names that aren't interned and for constants, keyed by (name or value, width).
+# z3's default context is per process, so these are per context as well.
+_symbol_terms = {}
+_const_terms = {}
+
+
+def to_bitvec(value, width: int):
+    """z3 bitvector named by a store value, built once per (name, width)."""
+    if type(value) is Expr:
+        return value.bitvec(width)
+    if not isinstance(value, str):
+        return BitVec(value, width)
+    key = (value, width)
+    term = _symbol_terms.get(key)
+    if term is None:
+        term = _symbol_terms[key] = BitVec(value, width)
+    return term
+
+
+def bv_const(value, width: int):
+    """z3 bitvector constant, built once per (value, width)."""
+    key = (value, width)
+    term = _const_terms.get(key)
+    if term is None:
+        term = _const_terms[key] = Int2BV(IntVal(value), width)
+    return term
+
+
+class ModuleStore(dict):
+    """The symbolic store of a single module, mapping signal names to interned expressions."""
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, intern_expr(value))
+
+    def setdefault(self, key, value=None):
+        return super().setdefault(key, intern_expr(value))
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def copy(self) -> "ModuleStore":
+        # values are already interned, no need to go through __setitem__
+        return ModuleStore(dict.items(self))
@@ -0,0 +1,141 @@
+"""Veritesting style state merging. A branch whose arms are short straight-line code (only
+assignments to plain signals, no further branching and no assertions) doesn't need to fork the
+path: both arms are executed on copies of the store and, at the join point, every signal the
+arms disagree on gets the ite expression If(cond, a, b). The path condition of the merged path
+is the disjunction of the two arms' ones, which for straight-line arms is just the path
+condition before the branch. Such branches are rewritten into a MergedIfStatement before the
+CFGs are built, so the CFG has one path through them instead of two.
+
+The evaluator works on strings and has no notion of an ite, so a merged value must never reach
+a branch condition or an assertion: only branches whose arms write signals nothing observed
+depends on (see ConeOfInfluence.observed) are merged."""
+
+from typing import Optional, Set, Tuple
+from pyverilog.vparser.ast import Node, IfStatement, Block, Always, Initial, Identifier
+from pyverilog.vparser.ast import NonblockingSubstitution, BlockingSubstitution, Concat
+
+# arms with more AST nodes than this (together) are forked, the ite expressions they would
+# leave in the store get too big for merging to pay off
+MERGE_MAX_NODES = 48
+
+
+class MergedIfStatement(Node):
+    """An if statement whose arms are executed together and merged, see DepthFirst.visit_merged_if.
+    The arms are flattened into tuples of assignments."""
+    attr_names = ()
+
+    def __init__(self, cond, true_statements: tuple, false_statements: tuple, lineno=0):
+        self.lineno = lineno
+        self.cond = cond
+        self.true_statements = true_statements
+        self.false_statements = false_statements
+
+    def children(self):
+        return (self.cond,) + self.true_statements + self.false_statements
+
+
+def node_count(node) -> int:
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Node):
+            count += 1
+            stack.extend(node.children())
+    return count
+
+
+class BranchMerger:
+    """Decides which branches are cheaper to merge than to fork, and rewrites them."""
+
+    def __init__(self, observed: Set[Tuple[str, str]] = frozenset(), max_nodes: int = MERGE_MAX_NODES):
+        # (module, signal) pairs read, directly or not, by branch conditions and assertions
+        self.observed = observed
+        self.max_nodes = max_nodes
+        # id of an always/initial block -> (original block, rewritten block)
+        self.merged = {}
+        # number of branches rewritten
+        self.num_merged = 0
+
+    def merge_blocks(self, module: str, blocks: list) -> list:
+        """The always/initial blocks of a module with every mergeable branch rewritten, a block is
+        rewritten into the same node every time."""
+        merged = []
+        for block in blocks:
+            if not id(block) in self.merged:
+                self.merged[id(block)] = (block, self.merge_stmt(module, block))
+            merged.append(self.merged[id(block)][1])
+        return merged
+
+    def straight_line(self, stmt) -> Optional[tuple]:
+        """The assignments of a branch arm in order, None if the arm isn't straight-line code."""
+        if stmt is None:
+            return ()
+        if isinstance(stmt, (NonblockingSubstitution, BlockingSubstitution)):
+            # concats and selects are stored in ways that don't merge
+            if not isinstance(stmt.left.var, Identifier) or isinstance(stmt.right.var, Concat):
+                return None
+            return (stmt,)
+        if isinstance(stmt, MergedIfStatement):
+            return (stmt,)
+        if isinstance(stmt, Block):
+            statements = ()
+            for item in stmt.statements:
+                item_statements = self.straight_line(item)
+                if item_statements is None:
+                    return None
+                statements += item_statements
+            return statements
+        return None
+
+    def targets(self, statements: tuple) -> Set[str]:
+        """The signals written by the assignments of an arm, including those of merged branches in it."""
+        names = set()
+        for stmt in statements:
+            if isinstance(stmt, MergedIfStatement):
+                names |= self.targets(stmt.true_statements) | self.targets(stmt.false_statements)
+            else:
+                names.add(stmt.left.var.name)
+        return names
+
+    def mergeable(self, module: str, stmt: IfStatement) -> Optional[MergedIfStatement]:
+        """The merged form of a branch if merging it is sound and worth it, else None."""
+        true_statements = self.straight_line(stmt.true_statement)
+        false_statements = self.straight_line(stmt.false_statement)
+        if true_statements is None or false_statements is None:
+            return None
+        if not true_statements and not false_statements:
+            return None
+        if any((module, name) in self.observed for name in self.targets(true_statements + false_statements)):
+            return None
+        if node_count(stmt.true_statement) + node_count(stmt.false_statement) > self.max_nodes:
+            return None
+        return MergedIfStatement(stmt.cond, true_statements, false_statements, stmt.lineno)
+
+    def merge_stmt(self, module: str, stmt):
+        """A copy of the statement with its mergeable branches rewritten, innermost first.
+        Unchanged subtrees are shared with the original AST."""
+        if isinstance(stmt, IfStatement):
+            true_statement = self.merge_stmt(module, stmt.true_statement)
+            false_statement = self.merge_stmt(module, stmt.false_statement)
+            if not (true_statement is stmt.true_statement and false_statement is stmt.false_statement):
+                stmt = IfStatement(stmt.cond, true_statement, false_statement, stmt.lineno)
+            merged = self.mergeable(module, stmt)
+            if merged is None:
+                return stmt
+            self.num_merged += 1
+            return merged
+        if isinstance(stmt, Block):
+            statements = [self.merge_stmt(module, item) for item in stmt.statements]
+            if all(new is old for new, old in zip(statements, stmt.statements)):
+                return stmt
+            return Block(statements, stmt.scope, stmt.lineno)
+        if isinstance(stmt, (Always, Initial)):
+            statement = self.merge_stmt(module, stmt.statement)
+            if statement is stmt.statement:
+                return stmt
+            if isinstance(stmt, Always):
+                return Always(stmt.sens_list, statement, stmt.lineno)
+            return Initial(statement, stmt.lineno)
+        # case/for/while are forked like before
+        return stmt
@@ -0,0 +1,58 @@
+"""Cache of counterexamples (models) for feasibility queries. A path that extends a satisfiable
+prefix with one more branch literal is often satisfied by a model z3 already returned for a
+sibling or an earlier path. Before calling the solver, the path condition is evaluated under
+the recently seen models, and any that makes every assertion true answers sat. Likewise a
+path condition that contains a set of assertions already found unsat together is unsat.
+Assertions are compared by z3 ast id, which is the same for the same term while it's alive.
+The cache is opt-in, see --model-cache-size."""
+
+from collections import deque
+from typing import Optional
+from z3 import is_true
+
+MODEL_CACHE_SIZE = 32
+
+# number of unsat assertion sets kept
+UNSAT_CACHE_SIZE = 1024
+
+
+class ModelCache:
+    """Recent satisfying models and unsat assertion sets, most recent last."""
+
+    def __init__(self, size: int = MODEL_CACHE_SIZE, unsat_size: int = UNSAT_CACHE_SIZE):
+        self.models: deque = deque(maxlen=size)
+        # (ast ids, assertions), the assertions keep the ids from being reused
+        self.unsat_sets: deque = deque(maxlen=unsat_size)
+        self.sat_hits: int = 0
+        self.unsat_hits: int = 0
+        self.misses: int = 0
+
+    def lookup(self, assertions) -> Optional[bool]:
+        """True if a cached model satisfies the assertions, False if they contain a known unsat
+        set, None if the solver has to be asked."""
+        ids = frozenset(assertion.get_id() for assertion in assertions)
+        for unsat_ids, _ in self.unsat_sets:
+            if unsat_ids <= ids:
+                self.unsat_hits += 1
+                return False
+        for model in reversed(self.models):
+            if all(is_true(model.eval(assertion, model_completion=True)) for assertion in assertions):
+                if not model is self.models[-1]:
+                    self.models.remove(model)
+                    self.models.append(model)
+                self.sat_hits += 1
+                return True
+        self.misses += 1
+        return None
+
+    def remember_model(self, model) -> None:
+        self.models.append(model)
+
+    def remember_unsat(self, assertions) -> None:
+        assertions = tuple(assertions)
+        self.unsat_sets.append((frozenset(assertion.get_id() for assertion in assertions), assertions))
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.sat_hits + self.unsat_hits + self.misses
+        return (self.sat_hits + self.unsat_hits) / lookups if lookups else 0.0
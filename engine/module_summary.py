@@ -0,0 +1,350 @@
+"""Summaries of the CFG paths of child module instances. Every instance of a module runs the CFG
+paths of the module definition through the path scheduler, and does so again for every parent
+path that differs before it, although what a CFG path does in a cycle only depends on the state
+it starts in. The first time a CFG path of an instance is executed from a given state, the effect
+of each of its steps is recorded with every symbol renamed to a placeholder (alpha renaming):
+the writes to the instance's store, the bookkeeping written on the manager, and the branch
+literals added to the path condition. A later run of the same CFG path in the same cycle, by any
+instance of the module, from a state that is the same up to renaming applies the summary step by
+step: its own symbols are substituted back in, fresh symbols are made wherever the path made up
+new ones, and the branch literals are taken like DepthFirst.take_branch does, so they are still
+checked against the path condition of the caller. Summaries are kept in a bounded LRU cache."""
+
+import re
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from z3 import Const, ExprRef, is_const, substitute, Z3_OP_UNINTERPRETED
+from helpers.utils import init_symbol
+from .expr import Expr
+from .path_trie import PATH_DICTS, copy_dict, copy_store
+
+# a whole symbol as made by init_symbol, not part of a longer name
+SYMBOL_TOKEN_RE = re.compile(r"\b[A-Za-z0-9]{16}\b")
+PLACEHOLDER_RE = re.compile(r"%([if])(\d+)%")
+
+SUMMARY_CACHE_SIZE = 1024
+
+# stands in for the name of the instance in the keys of the manager's per module dicts
+SELF = "%self%"
+
+# manager dicts a CFG path may write into, with how many levels are keyed by name; writes to the
+# other PATH_DICTS (instance bookkeeping) aren't summarized
+SUMMARY_DICTS = {"updates": 1, "dependencies": 2, "cond_assigns": 2}
+# the per module ones, whose first level is the module (instance) name
+MODULE_DICTS = ("dependencies", "intermodule_dependencies", "cond_assigns")
+
+# manager fields a step may change, set to what they were at the end of the step
+STEP_FIELDS = ("curr_level", "ignore", "abandon", "assertion_violation")
+
+
+class AlphaRenaming:
+    """Renames the symbols in expressions to input placeholders, in order of first appearance."""
+
+    def __init__(self):
+        self.placeholders: Dict[str, str] = {}
+        self.symbols: List[str] = []
+
+    def rename(self, value):
+        if isinstance(value, dict):
+            # concats, only used in cache keys
+            return tuple((key, self.rename(item)) for key, item in value.items())
+        if not isinstance(value, str):
+            return value
+        return SYMBOL_TOKEN_RE.sub(self.placeholder, value)
+
+    def canonical(self, value):
+        """A hashable form of a value with its symbols renamed, for cache keys. Dicts are sorted by
+        key, and AST nodes (which live as long as the run) stand for themselves by identity."""
+        if isinstance(value, str):
+            return SYMBOL_TOKEN_RE.sub(self.placeholder, value)
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, dict):
+            items = [(self.canonical(key), item) for key, item in sorted(value.items(), key=lambda item: str(item[0]))]
+            return ("dict",) + tuple((key, self.canonical(item)) for key, item in items)
+        if isinstance(value, (list, tuple)):
+            return (type(value).__name__,) + tuple(self.canonical(item) for item in value)
+        if isinstance(value, (set, frozenset)):
+            return frozenset(self.canonical(item) for item in value)
+        return ("node", id(value))
+
+    def placeholder(self, match) -> str:
+        symbol = match.group(0)
+        name = self.placeholders.get(symbol)
+        if name is None:
+            name = self.placeholders[symbol] = f"%i{len(self.symbols)}%"
+            self.symbols.append(symbol)
+        return name
+
+
+def relabel(value: dict, instance: str) -> dict:
+    """A per module dict with the instance's entry under SELF, so equal states of different
+    instances give equal keys."""
+    return {SELF if key == instance else key: item for key, item in value.items()}
+
+
+def constants(term: ExprRef) -> list:
+    """The uninterpreted constants in a z3 term."""
+    found = {}
+    seen = set()
+    stack = [term]
+    while stack:
+        node = stack.pop()
+        if node.get_id() in seen:
+            continue
+        seen.add(node.get_id())
+        if is_const(node) and node.decl().kind() == Z3_OP_UNINTERPRETED:
+            found[node.get_id()] = node
+        else:
+            stack.extend(node.children())
+    return list(found.values())
+
+
+def changes(before: dict, after: dict, levels: int, path: tuple = ()) -> Optional[list]:
+    """(keys, value) of the entries of nested dicts that were added or changed, None if any were removed."""
+    if any(not key in after for key in before):
+        return None
+    found = []
+    for key, value in after.items():
+        if key in before:
+            old = before[key]
+            if old is value or (type(old) == type(value) and old == value):
+                continue
+            if levels > 1 and isinstance(old, dict) and isinstance(value, dict):
+                inner = changes(old, value, levels - 1, path + (key,))
+                if inner is None:
+                    return None
+                found += inner
+                continue
+        found.append((path + (key,), value))
+    return found
+
+
+class Templates:
+    """Abstracts values over the renaming of the inputs of a CFG path. Symbols that aren't inputs
+    were made up by the path and become fresh placeholders, unless they were already around
+    before the path ran, in which case the path read something the key doesn't hold."""
+
+    def __init__(self, renaming: AlphaRenaming, known: set):
+        self.renaming = renaming
+        self.known = known
+        self.fresh: Dict[str, str] = {}
+        self.unsound = False
+
+    def placeholder(self, symbol: str) -> Optional[str]:
+        name = self.renaming.placeholders.get(symbol)
+        if name is None:
+            name = self.fresh.get(symbol)
+            if name is None:
+                if symbol in self.known:
+                    self.unsound = True
+                name = self.fresh[symbol] = f"%f{len(self.fresh)}%"
+        return name
+
+    def template(self, value):
+        if isinstance(value, str):
+            return SYMBOL_TOKEN_RE.sub(lambda match: self.placeholder(match.group(0)), value)
+        if isinstance(value, dict):
+            return {self.template(key): self.template(item) for key, item in value.items()}
+        if isinstance(value, tuple):
+            return tuple(self.template(item) for item in value)
+        if isinstance(value, list):
+            return [self.template(item) for item in value]
+        return value
+
+    def literal(self, literal: ExprRef) -> tuple:
+        """A branch literal with the placeholder of each of its symbols."""
+        symbols = []
+        for const in constants(literal):
+            name = const.decl().name()
+            if SYMBOL_TOKEN_RE.fullmatch(name):
+                symbols.append((const, self.placeholder(name)))
+        return literal, tuple(symbols)
+
+
+def instantiate(template, symbols: List[str], fresh: List[str]):
+    """Substitute the symbols of the current inputs, and the fresh ones, back into a template."""
+    if isinstance(template, str):
+        if not "%" in template:
+            return template
+        return PLACEHOLDER_RE.sub(lambda match: (symbols if match.group(1) == "i" else fresh)[int(match.group(2))], template)
+    if isinstance(template, dict):
+        return {instantiate(key, symbols, fresh): instantiate(item, symbols, fresh) for key, item in template.items()}
+    if isinstance(template, tuple):
+        return tuple(instantiate(item, symbols, fresh) for item in template)
+    if isinstance(template, list):
+        return [instantiate(item, symbols, fresh) for item in template]
+    return template
+
+
+class StepSnapshot:
+    """What a step may change, taken before it runs, to find out what it wrote."""
+    __slots__ = ("store", "dicts", "reg_writes", "reg_decls", "constraints")
+
+    def __init__(self, m, s):
+        self.store = copy_store(s.store)
+        self.dicts = {field: copy_dict(getattr(m, field), levels) for field, levels in PATH_DICTS}
+        self.reg_writes = set(m.reg_writes)
+        self.reg_decls = set(m.reg_decls)
+        self.constraints = len(s.pc.constraints)
+
+
+class StepEffect:
+    """The effect of one step of a CFG path, as templates over the input and fresh placeholders."""
+    __slots__ = ("literals", "writes", "dict_writes", "reg_writes", "reg_decls", "fields")
+
+    def __init__(self, literals: tuple, writes: tuple, dict_writes: tuple, reg_writes: frozenset,
+                 reg_decls: frozenset, fields: tuple):
+        self.literals = literals
+        self.writes = writes
+        self.dict_writes = dict_writes
+        self.reg_writes = reg_writes
+        self.reg_decls = reg_decls
+        self.fields = fields
+
+    @classmethod
+    def record(cls, before: StepSnapshot, m, s, instance: str, taken: list, templates: Templates) -> Optional["StepEffect"]:
+        """What the step that ran since the snapshot did, or None if it can't be summarized:
+        it wrote into another module's store or instance bookkeeping, removed entries, or
+        constrained the path other than by taking branches."""
+        for module_name, signals in s.store.items():
+            if module_name != instance and signals != before.store.get(module_name):
+                return None
+        if set(s.store) != set(before.store):
+            return None
+        writes = changes(before.store[instance], s.store[instance], 1)
+        if writes is None:
+            return None
+        dict_writes = []
+        for field, _ in PATH_DICTS:
+            found = changes(before.dicts[field], getattr(m, field), SUMMARY_DICTS.get(field, 1))
+            if found is None:
+                return None
+            if found and not field in SUMMARY_DICTS:
+                return None
+            for keys, value in found:
+                if len(keys) < SUMMARY_DICTS[field]:
+                    # a whole module entry (or more) appeared
+                    return None
+                if field in MODULE_DICTS and keys[0] == instance:
+                    keys = (SELF,) + keys[1:]
+                dict_writes.append((field, keys, templates.template(value)))
+        if not m.reg_writes >= before.reg_writes or not m.reg_decls >= before.reg_decls:
+            return None
+        # every constraint the step added is a branch literal it took
+        literal_ids = set(literal.get_id() for literal in taken)
+        if any(not constraint.get_id() in literal_ids for constraint in s.pc.constraints[before.constraints:]):
+            return None
+        templated = tuple((signal, templates.template(value)) for (signal,), value in writes)
+        literals = tuple(templates.literal(literal) for literal in taken)
+        return cls(literals, templated, tuple(dict_writes), frozenset(m.reg_writes - before.reg_writes),
+                   frozenset(m.reg_decls - before.reg_decls), tuple(getattr(m, field) for field in STEP_FIELDS))
+
+    def apply(self, m, s, instance: str, symbols: List[str], fresh: List[str], take_branch: Callable) -> bool:
+        """Replay the step. False if one of its branch literals makes the path UNSAT, which
+        take_branch marks on the manager."""
+        for literal, placeholders in self.literals:
+            pairs = []
+            for const, placeholder in placeholders:
+                match = PLACEHOLDER_RE.fullmatch(placeholder)
+                name = (symbols if match.group(1) == "i" else fresh)[int(match.group(2))]
+                if name != const.decl().name():
+                    pairs.append((const, Const(name, const.sort())))
+            if pairs:
+                literal = substitute(literal, *pairs)
+            if not take_branch(m, s, literal):
+                return False
+        store = s.store[instance]
+        for signal, template in self.writes:
+            store[signal] = instantiate(template, symbols, fresh)
+        for field, keys, template in self.dict_writes:
+            target = getattr(m, field)
+            for key in keys[:-1]:
+                target = target.setdefault(instance if key == SELF else key, {})
+            target[keys[-1]] = instantiate(template, symbols, fresh)
+        m.reg_writes.update(self.reg_writes)
+        m.reg_decls.update(self.reg_decls)
+        for field, value in zip(STEP_FIELDS, self.fields):
+            setattr(m, field, value)
+        return True
+
+
+class ModuleSummary:
+    """The effects of the steps of one CFG path of a module, and how many fresh symbols it makes."""
+    __slots__ = ("steps", "num_fresh")
+
+    def __init__(self, steps: tuple, num_fresh: int):
+        self.steps = steps
+        self.num_fresh = num_fresh
+
+    def fresh_symbols(self) -> List[str]:
+        return [init_symbol() for _ in range(self.num_fresh)]
+
+
+class SummaryCache:
+    """LRU cache of CFG path summaries, keyed by module, position and alpha renamed starting state."""
+
+    def __init__(self, size: int = SUMMARY_CACHE_SIZE):
+        self.size = size
+        self.summaries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        # CFG paths that ran but couldn't be summarized
+        self.unsummarized: int = 0
+
+    def key(self, module_name: str, position: tuple, m, s, instance: str) -> Tuple[tuple, AlphaRenaming]:
+        """Everything a CFG path of an instance may read, up to renaming of symbols, and the
+        renaming used: the instance's store, the manager's path bookkeeping, and the entries of
+        other stores that an always block reads through the dependencies of their module."""
+        renaming = AlphaRenaming()
+        store = s.store[instance]
+        inputs = tuple((signal, renaming.canonical(store[signal])) for signal in sorted(store, key=str))
+        dicts = []
+        for field, _ in PATH_DICTS:
+            value = getattr(m, field)
+            dicts.append(renaming.canonical(relabel(value, instance) if field in MODULE_DICTS else value))
+        outer = []
+        for module in sorted(m.cond_assigns):
+            if module == instance or not module in s.store:
+                continue
+            names = set(map(str, m.cond_assigns[module])) | set(map(str, m.dependencies.get(module, {}).values()))
+            outer.append((module, tuple((name, renaming.canonical(s.store[module][name]))
+                                        for name in sorted(names) if name in s.store[module])))
+        fields = (m.cycle,) + tuple(getattr(m, field) for field in STEP_FIELDS)
+        return ((module_name, position, inputs, tuple(dicts), tuple(outer), fields,
+                 frozenset(m.reg_writes), frozenset(m.reg_decls)), renaming)
+
+    def get(self, key) -> Optional[ModuleSummary]:
+        summary = self.summaries.get(key)
+        if summary is None:
+            self.misses += 1
+            return None
+        self.summaries.move_to_end(key)
+        self.hits += 1
+        return summary
+
+    def put(self, key, summary: ModuleSummary) -> None:
+        self.summaries[key] = summary
+        self.summaries.move_to_end(key)
+        while len(self.summaries) > self.size:
+            self.summaries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def known_symbols(s) -> set:
+    """The symbols in every store, which a CFG path can't make up."""
+    known = set()
+    for signals in s.store.values():
+        for value in signals.values():
+            if type(value) is Expr:
+                # cached on the node, and on its subterms shared with other values
+                known |= value.symbols
+            else:
+                known.update(SYMBOL_TOKEN_RE.findall(str(value)))
+    return known
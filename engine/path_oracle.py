@@ -0,0 +1,147 @@
+"""Path counting over the CFG of an always/initial block. Rather than listing every path from
+the dummy start to the dummy end up front, the number of paths leaving each basic block is
+counted once by dynamic programming over the DAG, which is enough to hand out the i-th path
+(unranking) or walk the paths lazily in the same order nx.all_simple_paths would list them."""
+
+from typing import Iterator, List, Sequence, Tuple
+
+# dummy start and end blocks added by CFG.build_cfg
+START = -1
+END = -2
+
+
+class PathOracle:
+    """Read only sequence of the start to end paths of a CFG, in DFS order over the successors.
+    The successors are given CSR style, see CompactCFG in cfg.py."""
+
+    def __init__(self, succ_offsets: Sequence[int], succ_targets: Sequence[int], num_blocks: int):
+        self.succ_offsets = succ_offsets
+        self.succ_targets = succ_targets
+        self.num_blocks: int = num_blocks
+        # number of paths to the end from each slot reachable from the start
+        self.counts: List[int] = [0] * (num_blocks + 2)
+        # only set when the CFG has a cycle, then the paths are listed explicitly
+        self.cyclic_paths = None
+
+        order = self.postorder()
+        if order is None:
+            self.cyclic_paths = tuple(self.simple_paths())
+            self.num_paths: int = len(self.cyclic_paths)
+            return
+        for node in order:
+            if node == END:
+                # the end finishes a path, nothing after it counts
+                self.counts[self.slot(node)] = 1
+            else:
+                self.counts[self.slot(node)] = sum(self.counts[self.slot(succ)] for succ in self.successors(node))
+        self.num_paths: int = self.counts[self.slot(START)]
+
+    def slot(self, node: int) -> int:
+        """Position of a block in the successor offsets, the dummy start and end go last."""
+        return node if node >= 0 else self.num_blocks - 1 - node
+
+    def successors(self, node: int) -> Sequence[int]:
+        slot = self.slot(node)
+        return self.succ_targets[self.succ_offsets[slot]:self.succ_offsets[slot + 1]]
+
+    def postorder(self) -> List[int]:
+        """Blocks reachable from the start, each after all of its successors. None if there's a cycle."""
+        order = []
+        # 1 while on the DFS stack, 2 once finished
+        state = {START: 1}
+        stack = [(START, iter(self.successors(START)))]
+        while stack:
+            node, succs = stack[-1]
+            for succ in succs:
+                seen = state.get(succ)
+                if seen == 1:
+                    return None
+                if seen is None:
+                    state[succ] = 1
+                    stack.append((succ, iter(self.successors(succ))))
+                    break
+            else:
+                stack.pop()
+                state[node] = 2
+                order.append(node)
+        return order
+
+    def simple_paths(self) -> Iterator[Tuple[int, ...]]:
+        """All simple paths from start to end in DFS order, for the rare CFG that isn't a DAG."""
+        path = [START]
+        on_path = {START}
+        stack = [iter(self.successors(START))]
+        while stack:
+            for succ in stack[-1]:
+                if succ in on_path:
+                    continue
+                if succ == END:
+                    yield tuple(path) + (succ,)
+                    continue
+                path.append(succ)
+                on_path.add(succ)
+                stack.append(iter(self.successors(succ)))
+                break
+            else:
+                stack.pop()
+                on_path.discard(path.pop())
+
+    def __len__(self) -> int:
+        return self.num_paths
+
+    def __getitem__(self, index: int) -> Tuple[int, ...]:
+        """Unrank a path index into its sequence of blocks without listing the paths before it."""
+        if index < 0:
+            index += self.num_paths
+        if index < 0 or index >= self.num_paths:
+            raise IndexError(f"path index {index} out of range for {self.num_paths} paths")
+        if self.cyclic_paths is not None:
+            return self.cyclic_paths[index]
+        node = START
+        path = [node]
+        while node != END:
+            for succ in self.successors(node):
+                count = self.counts[self.slot(succ)]
+                if index < count:
+                    node = succ
+                    break
+                index -= count
+            path.append(node)
+        return tuple(path)
+
+    def __iter__(self) -> Iterator[Tuple[int, ...]]:
+        if self.cyclic_paths is not None:
+            yield from self.cyclic_paths
+            return
+        if self.num_paths == 0:
+            return
+        path = [START]
+        stack = [iter(self.successors(START))]
+        while stack:
+            for succ in stack[-1]:
+                if self.counts[self.slot(succ)] == 0:
+                    continue
+                path.append(succ)
+                if succ == END:
+                    yield tuple(path)
+                    path.pop()
+                    continue
+                stack.append(iter(self.successors(succ)))
+                break
+            else:
+                stack.pop()
+                path.pop()
+
+    def __reduce__(self):
+        # the counts are cheap to redo, only ship the graph
+        return (PathOracle, (self.succ_offsets, self.succ_targets, self.num_blocks))
+
+    def __repr__(self) -> str:
+        return f"PathOracle({self.num_paths} paths)"
+
+
+def path_count(paths) -> int:
+    """Number of paths in a PathOracle or any other sequence of paths."""
+    if isinstance(paths, PathOracle):
+        return paths.num_paths
+    return len(paths)
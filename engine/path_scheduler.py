@@ -0,0 +1,129 @@
+"""Lazy enumeration of the multi-module, multi-cycle path space. Instead of materializing
+every combination of CFG paths up front, the scheduler treats a complete path as a number
+in a mixed radix system (one digit per module, cycle and CFG) and hands out one combination
+at a time. Any combination can be addressed directly by its index, so a long run can be
+checkpointed and resumed."""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from .path_oracle import path_count
+
+
+class PathScheduler:
+    """Yields multi-module, multi-cycle path combinations in the same order as
+    itertools.product over modules, cycles and CFGs, using constant memory."""
+
+    def __init__(self, mapped_paths: Dict[str, Dict[int, Sequence]], num_cycles: int):
+        # mapped_paths is keyed by module name and gives the paths of each of its CFGs
+        self.module_names: List[str] = list(mapped_paths)
+        self.num_cycles: int = int(num_cycles)
+        self.cfg_counts: Dict[str, int] = {}
+
+        # one digit per (module, cycle, cfg), most significant first
+        self.digit_paths: List[Sequence] = []
+        for module_name in self.module_names:
+            cfg_paths = list(mapped_paths[module_name].values())
+            self.cfg_counts[module_name] = len(cfg_paths)
+            for _ in range(self.num_cycles):
+                self.digit_paths += cfg_paths
+        self.radices: List[int] = [path_count(paths) for paths in self.digit_paths]
+
+        self.total: int = 1
+        for radix in self.radices:
+            self.total *= radix
+        # set while iterating to jump ahead, e.g. past a subtree of paths known to be redundant
+        self.resume_at: Optional[int] = None
+
+    def __len__(self) -> int:
+        return self.total
+
+    def digits_at(self, index: int) -> List[int]:
+        """Unrank a path index into its per-(module, cycle, cfg) path indices."""
+        if index < 0 or index >= self.total:
+            raise IndexError(f"path index {index} out of range for {self.total} paths")
+        digits = [0] * len(self.radices)
+        for i in range(len(self.radices) - 1, -1, -1):
+            index, digits[i] = divmod(index, self.radices[i])
+        return digits
+
+    def index_of(self, digits: Sequence[int]) -> int:
+        """Rank a list of per-(module, cycle, cfg) path indices back into a path index."""
+        index = 0
+        for digit, radix in zip(digits, self.radices):
+            index = index * radix + digit
+        return index
+
+    def assemble(self, digits: Sequence[int]) -> Dict[str, Tuple[Tuple, ...]]:
+        """Build the {module: (cycle 0 cfg paths, cycle 1 cfg paths, ...)} view of a path."""
+        path = {}
+        pos = 0
+        for module_name in self.module_names:
+            cfg_count = self.cfg_counts[module_name]
+            cycles = []
+            for _ in range(self.num_cycles):
+                cycles.append(tuple(self.digit_paths[pos + k][digits[pos + k]] for k in range(cfg_count)))
+                pos += cfg_count
+            path[module_name] = tuple(cycles)
+        return path
+
+    def path_at(self, index: int) -> Dict[str, Tuple[Tuple, ...]]:
+        """Random access to a single path combination."""
+        return self.assemble(self.digits_at(index))
+
+    def prefix_length(self, module_name: str, cycle: int) -> int:
+        """Number of digits up to and including the given cycle of the given module."""
+        pos = 0
+        for name in self.module_names:
+            if name == module_name:
+                return pos + (cycle + 1) * self.cfg_counts[name]
+            pos += self.num_cycles * self.cfg_counts[name]
+        raise KeyError(module_name)
+
+    def subtree_end(self, digits: Sequence[int], prefix: int) -> int:
+        """Index one past the last path sharing the first `prefix` digits with the given ones."""
+        size = 1
+        for radix in self.radices[prefix:]:
+            size *= radix
+        return (self.index_of(digits[:prefix]) + 1) * size
+
+    def partition(self, parts: int) -> List[Tuple[int, int]]:
+        """Split the index space into at least `parts` contiguous ranges (when there are that
+        many paths), aligned on the leading digits so each range is one subtree of paths
+        sharing a prefix, e.g. the same first cycle CFG path."""
+        if self.total == 0:
+            return []
+        chunks = 1
+        prefix = 0
+        while prefix < len(self.radices) and chunks < parts:
+            chunks *= self.radices[prefix]
+            prefix += 1
+        size = self.total // chunks
+        return [(k * size, (k + 1) * size) for k in range(chunks)]
+
+    def iterate_digits(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+        """Yield (index, digits) pairs for the half open range [start, stop)."""
+        if stop is None or stop > self.total:
+            stop = self.total
+        if start >= stop:
+            return
+        digits = self.digits_at(start)
+        index = start
+        self.resume_at = None
+        while index < stop:
+            yield index, tuple(digits)
+            if self.resume_at is not None:
+                index, self.resume_at = self.resume_at, None
+                if index < stop:
+                    digits = self.digits_at(index)
+                continue
+            index += 1
+            # odometer increment, least significant digit last
+            for i in range(len(digits) - 1, -1, -1):
+                digits[i] += 1
+                if digits[i] < self.radices[i]:
+                    break
+                digits[i] = 0
+
+    def iterate(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Tuple[Tuple, ...]]]]:
+        """Yield (index, path) pairs for the half open range [start, stop)."""
+        for index, digits in self.iterate_digits(start, stop):
+            yield index, self.assemble(digits)
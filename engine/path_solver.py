@@ -0,0 +1,320 @@
+"""The solver holding the path condition. On top of a plain z3 Solver it remembers which
+branch literals are asserted on the current path, so taking the same branch again (e.g. the
+same condition in a later cycle) is known to be feasible without another solver call.
+
+It also learns from infeasible paths: when a branch literal makes the path condition UNSAT,
+the unsat core over the branch literals (each tracked by a named assumption) is recorded as a
+blocked cube of decisions. Any later path that asserts all the literals of a blocked cube is
+known to be UNSAT without calling the solver. The literals are z3 terms over the store
+expressions, so a cube only matches paths whose decisions produced the very same conditions.
+
+Feasibility checks are sliced by constraint independence. The constraints are indexed by
+the symbols they mention, and as the path condition was satisfiable before the new literal,
+only the group of constraints connected to it through shared symbols needs checking.
+
+With assumption solving, checks don't go to this solver, whose push/pop throws away what z3
+learned in the popped scopes. Each constraint is asserted once, guarded by a selector literal,
+in a solver that lives for the whole run, and a check passes the selectors of the constraints
+on the current path as assumptions, so lemmas learned on one path help the next ones.
+
+Checks can be given a timeout, and a deadline that caps it. What an unknown result means is up
+to the unknown policy: "sat" keeps exploring the path, "unsat" abandons it, and "retry"
+abandons it for now and flags it as deferred, so the engine can explore it again later with
+a longer timeout."""
+
+import time
+from typing import Dict, List, Optional
+from z3 import Solver, ExprRef, Bool, Implies, sat, unsat, AstVector, BoolVal, is_const, Z3_OP_UNINTERPRETED
+
+# what an unknown result (timeout) is taken as
+UNKNOWN_POLICIES = ("sat", "unsat", "retry")
+
+# deferred paths are retried with the timeout multiplied by this
+RETRY_TIMEOUT_FACTOR = 10
+
+
+class PathSolver(Solver):
+    """z3 Solver that tracks the branch literals asserted in each backtracking scope."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # z3 ASTs are hash-consed, so the ast id identifies a literal within the context
+        self.literals = {}
+        self.trail = []
+        self.marks = []
+        # number of branch checks answered without calling the solver
+        self.hits: int = 0
+        # the decision (path step) currently being executed, and the one each literal came from
+        self.decision = None
+        self.origins = {}
+        # blocked cubes of literal ids, indexed by each of their literals
+        self.cubes: Dict[int, List[frozenset]] = {}
+        # the literals and decisions of every cube, also keeps the ids from being reused
+        self.cube_literals: List[tuple] = []
+        # number of branches found UNSAT by a blocked cube
+        self.conflict_hits: int = 0
+        # a QueryCache answering repeated feasibility checks, if any
+        self.queries = None
+        # a ModelCache answering feasibility checks from earlier models, if any
+        self.models = None
+        # the solver checking selector assumptions, if assumption solving is on, and the
+        # selector of each constraint in it by ast id (with the constraint, to keep the id)
+        self.incremental: Optional[Solver] = None
+        self.selectors: Dict[int, tuple] = {}
+        # timeout of each check in milliseconds (0 for none), and the time.time() at which
+        # the exploration has to stop, if any
+        self.timeout: int = 0
+        self.deadline: Optional[float] = None
+        self.unknown_policy: str = "sat"
+        # number of checks that came back unknown, and whether one was deferred on this path
+        self.unknowns: int = 0
+        self.deferred: bool = False
+        # the unknown answer of the last check, if it was one
+        self.unknown = None
+        # every constraint asserted on the path, and the ones mentioning each symbol
+        self.constraints: List[ExprRef] = []
+        self.constraint_symbols: List[frozenset] = []
+        self.by_symbol: Dict[str, List[int]] = {}
+        # number of leading constraints known to be satisfiable together
+        self.sat_prefix: int = 0
+        # ast id -> (term, symbols in it), the term keeps the id from being reused
+        self.symbol_cache = {}
+        # number of feasibility checks done on a slice of the path condition
+        self.sliced_checks: int = 0
+        # the branch literals taken while a step is recorded for a summary, None when none is
+        self.taken: Optional[list] = None
+
+    def push(self) -> None:
+        super().push()
+        self.marks.append((len(self.trail), len(self.constraints)))
+
+    def pop(self, num: int = 1) -> None:
+        super().pop(num)
+        if num > 0:
+            mark, constraint_mark = self.marks[-num]
+            del self.marks[-num:]
+            for literal_id in self.trail[mark:]:
+                del self.literals[literal_id]
+                self.origins.pop(literal_id, None)
+            del self.trail[mark:]
+            # constraints are indexed in order, so theirs are the last entries for each symbol
+            while len(self.constraints) > constraint_mark:
+                self.constraints.pop()
+                for symbol in self.constraint_symbols.pop():
+                    indices = self.by_symbol[symbol]
+                    indices.pop()
+                    if not indices:
+                        del self.by_symbol[symbol]
+            self.sat_prefix = min(self.sat_prefix, constraint_mark)
+
+    def use_assumptions(self) -> None:
+        """Check feasibility with selector assumptions in one incremental solver from now on."""
+        self.incremental = Solver()
+        self.incremental.set("core.minimize", True)
+
+    def reset(self) -> None:
+        super().reset()
+        self.literals.clear()
+        self.origins.clear()
+        self.trail.clear()
+        self.marks.clear()
+        self.constraints.clear()
+        self.constraint_symbols.clear()
+        self.by_symbol.clear()
+        self.sat_prefix = 0
+
+    def add(self, *constraints) -> None:
+        super().add(*constraints)
+        for constraint in constraints:
+            for item in (constraint if isinstance(constraint, (list, tuple, AstVector)) else [constraint]):
+                if not isinstance(item, ExprRef):
+                    # python bools, which z3 takes as constants
+                    item = BoolVal(item)
+                symbols = self.symbols(item)
+                for symbol in symbols:
+                    self.by_symbol.setdefault(symbol, []).append(len(self.constraints))
+                self.constraints.append(item)
+                self.constraint_symbols.append(symbols)
+
+    def symbols(self, term: ExprRef) -> frozenset:
+        """Names of the uninterpreted constants in a term."""
+        cached = self.symbol_cache.get(term.get_id())
+        if cached is not None:
+            return cached[1]
+        names = set()
+        seen = set()
+        stack = [term]
+        while stack:
+            node = stack.pop()
+            if node.get_id() in seen:
+                continue
+            seen.add(node.get_id())
+            if is_const(node) and node.decl().kind() == Z3_OP_UNINTERPRETED:
+                names.add(node.decl().name())
+            else:
+                stack.extend(node.children())
+        symbols = frozenset(names)
+        self.symbol_cache[term.get_id()] = (term, symbols)
+        return symbols
+
+    def independent_group(self, index: int) -> List[int]:
+        """Indices of the constraints connected to the given one through shared symbols."""
+        members = {index}
+        pending = list(self.constraint_symbols[index])
+        seen = set(pending)
+        while pending:
+            for other in self.by_symbol.get(pending.pop(), ()):
+                if not other in members:
+                    members.add(other)
+                    for symbol in self.constraint_symbols[other]:
+                        if not symbol in seen:
+                            seen.add(symbol)
+                            pending.append(symbol)
+        return sorted(members)
+
+    def implies(self, literal: ExprRef) -> bool:
+        """True if the literal is already asserted on the current path."""
+        if literal.get_id() in self.literals:
+            self.hits += 1
+            return True
+        return False
+
+    def add_literal(self, literal: ExprRef) -> None:
+        """Assert a branch literal and remember it until its scope is popped."""
+        self.add(literal)
+        literal_id = literal.get_id()
+        if literal_id not in self.literals:
+            # keep the term alive so its id isn't reused
+            self.literals[literal_id] = literal
+            self.trail.append(literal_id)
+            self.origins[literal_id] = self.decision
+
+    def feasible(self) -> bool:
+        """Whether the path condition is satisfiable, asking the model and query caches first if
+        there are any. If only the last constraint is new, only its independent group is checked."""
+        num_constraints = len(self.constraints)
+        assertions = self.constraints
+        sliced = False
+        if num_constraints > 1 and self.sat_prefix == num_constraints - 1:
+            group = self.independent_group(num_constraints - 1)
+            if len(group) < num_constraints:
+                assertions = [self.constraints[index] for index in group]
+                sliced = True
+                self.sliced_checks += 1
+        result = None
+        self.unknown = None
+        if self.models is not None:
+            result = self.models.lookup(assertions)
+        if result is None:
+            if self.incremental is not None:
+                solver = self.incremental
+                assumptions = self.assumptions(assertions)
+                solve = lambda: solver.check(*assumptions)
+            else:
+                solver = self
+                if sliced:
+                    solver = Solver()
+                    solver.add(*assertions)
+                solve = solver.check
+
+            def check():
+                self.limit(solver)
+                answer = solve()
+                if answer != sat and answer != unsat:
+                    self.unknown = answer
+                if self.models is not None:
+                    if answer == sat:
+                        self.models.remember_model(solver.model())
+                    elif answer == unsat:
+                        self.models.remember_unsat(assertions)
+                return answer
+
+            if self.queries is not None:
+                # the key is made from the assertions, which the incremental solver doesn't hold
+                key_solver = solver
+                if self.incremental is not None:
+                    key_solver = self
+                    if sliced:
+                        key_solver = Solver()
+                        key_solver.add(*assertions)
+                result = self.queries.check(key_solver, check)
+            else:
+                result = check() == sat
+            if self.unknown is not None:
+                result = self.unknown_result()
+        if result and self.unknown is None:
+            # an unknown taken as sat isn't a satisfiable prefix to slice against
+            self.sat_prefix = num_constraints
+        return result
+
+    def limit(self, solver: Solver) -> None:
+        """Set the timeout of the next check on a solver, which is at most the time left until the deadline."""
+        timeout = self.timeout
+        if self.deadline is not None:
+            left = max(1, int((self.deadline - time.time()) * 1000))
+            timeout = min(timeout, left) if timeout else left
+        if timeout:
+            solver.set("timeout", timeout)
+
+    def unknown_result(self) -> bool:
+        """What an unknown check is taken as, according to the unknown policy."""
+        self.unknowns += 1
+        if self.unknown_policy == "retry":
+            self.deferred = True
+            return False
+        return self.unknown_policy == "sat"
+
+    def retry_deferred(self) -> None:
+        """Make the checks of deferred paths get a longer timeout, and not be deferred again."""
+        self.timeout *= RETRY_TIMEOUT_FACTOR
+        self.unknown_policy = "unsat"
+
+    def assumptions(self, assertions) -> list:
+        """The selector literals of constraints in the incremental solver, guarding the ones it
+        hasn't seen yet with a new selector."""
+        selectors = []
+        for assertion in assertions:
+            entry = self.selectors.get(assertion.get_id())
+            if entry is None:
+                selector = Bool(f"a{assertion.get_id()}")
+                self.incremental.add(Implies(selector, assertion))
+                entry = self.selectors[assertion.get_id()] = (selector, assertion)
+            selectors.append(entry[0])
+        return selectors
+
+    def blocked(self, literal: ExprRef) -> bool:
+        """True if asserting the literal would complete a blocked cube, i.e. make the path UNSAT."""
+        literal_id = literal.get_id()
+        for cube in self.cubes.get(literal_id, ()):
+            if all(other == literal_id or other in self.literals for other in cube):
+                self.conflict_hits += 1
+                return True
+        return False
+
+    def learn_conflict(self) -> Optional[tuple]:
+        """Extract the unsat core of the current (UNSAT) path condition over its branch literals
+        and block it. Returns the decisions in the cube, or None if the core also needs
+        constraints that aren't branch literals, which can't be matched on other paths."""
+        if self.incremental is not None:
+            tracked = self.incremental
+            assumptions = self.assumptions(self.constraints)
+        else:
+            tracked = Solver()
+            tracked.set("core.minimize", True)
+            assumptions = []
+            for assertion in self.constraints:
+                name = Bool(f"a{assertion.get_id()}")
+                tracked.add(Implies(name, assertion))
+                assumptions.append(name)
+        self.limit(tracked)
+        if tracked.check(*assumptions) != unsat:
+            return None
+        # selectors are named after the ast id of their constraint
+        cube = frozenset(int(str(name)[1:]) for name in tracked.unsat_core())
+        if not cube or not all(literal_id in self.literals for literal_id in cube):
+            return None
+        decisions = tuple(self.origins.get(literal_id) for literal_id in cube)
+        self.cube_literals.append((tuple(self.literals[literal_id] for literal_id in cube), decisions))
+        for literal_id in cube:
+            self.cubes.setdefault(literal_id, []).append(cube)
+        return decisions
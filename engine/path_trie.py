@@ -0,0 +1,99 @@
+"""Prefix sharing between consecutive paths. The scheduler hands out paths in lexicographic
+order over (module, cycle, cfg, basic block), so consecutive paths walk the same prefix trie
+and only differ in a suffix. We keep the chain of trie nodes for the path explored last, each
+holding a solver backtracking point and a snapshot of the symbolic store, and moving to a
+sibling path only pops the diverging suffix instead of re-solving from cycle 0."""
+
+from typing import Hashable, List, Optional, Sequence
+from .execution_manager import ExecutionManager
+from .symbolic_state import SymbolicState
+
+# bookkeeping on the manager that changes while walking a path and needs to be rolled back
+PATH_FIELDS = ("cycle", "curr_module", "curr_level", "ignore", "abandon", "assertion_violation")
+
+# dicts on the manager that walking a path writes into, with how many levels of them are dicts
+PATH_DICTS = (("updates", 1), ("dependencies", 2), ("intermodule_dependencies", 2), ("cond_assigns", 3),
+              ("instances_seen", 1), ("instances_loc", 1))
+
+
+def copy_store(store: dict) -> dict:
+    """Copy the symbolic store deep enough that later writes don't leak into the snapshot.
+    Expressions themselves are immutable and shared, only the (nested) dicts need copying."""
+    res = {}
+    for module_name, signals in store.items():
+        res[module_name] = signals.copy()
+        for signal, value in signals.items():
+            if isinstance(value, dict):
+                res[module_name][signal] = dict(value)
+    return res
+
+
+def copy_dict(value: dict, levels: int) -> dict:
+    """Copy the given number of levels of nested dicts."""
+    if levels == 1:
+        return dict(value)
+    return {key: copy_dict(item, levels - 1) if isinstance(item, dict) else item for key, item in value.items()}
+
+
+class TrieNode:
+    """State after executing the path prefix ending in this node."""
+    __slots__ = ("key", "scopes", "store", "fields", "dicts", "reg_writes")
+
+    def __init__(self, key: Optional[Hashable], scopes: int, store: dict, fields: tuple, dicts: tuple, reg_writes: set):
+        self.key = key
+        self.scopes = scopes
+        self.store = store
+        self.fields = fields
+        self.dicts = dicts
+        self.reg_writes = reg_writes
+
+
+class PathTrie:
+    """The root-to-leaf chain of the trie along the most recently explored path."""
+
+    def __init__(self):
+        self.nodes: List[TrieNode] = []
+        # number of steps skipped/executed thanks to (or despite) prefix sharing
+        self.reused: int = 0
+        self.executed: int = 0
+
+    def checkpoint(self, m: ExecutionManager, s: SymbolicState, key: Optional[Hashable]) -> None:
+        """Record the state after executing a step and open a new solver scope for the next one."""
+        scopes = s.pc.num_scopes()
+        s.pc.push()
+        fields = tuple(getattr(m, field) for field in PATH_FIELDS)
+        dicts = tuple(copy_dict(getattr(m, field), levels) for field, levels in PATH_DICTS)
+        self.nodes.append(TrieNode(key, scopes, copy_store(s.store), fields, dicts, set(m.reg_writes)))
+
+    def forget(self) -> None:
+        """Drop every node but the root, so the next path is executed again from the start."""
+        del self.nodes[1:]
+
+    def restore(self, m: ExecutionManager, s: SymbolicState, keys: Sequence[Hashable]) -> int:
+        """Roll back to the deepest node shared with the given path and return how many
+        of its steps are already executed. Returns -1 if there is no root yet."""
+        if not self.nodes:
+            return -1
+        depth = 0
+        while depth < len(keys) and depth + 1 < len(self.nodes) and self.nodes[depth + 1].key == keys[depth]:
+            depth += 1
+        del self.nodes[depth + 1:]
+        node = self.nodes[depth]
+
+        s.pc.pop(s.pc.num_scopes() - node.scopes)
+        s.pc.push()
+        s.store.clear()
+        s.store.update(copy_store(node.store))
+        for field, value in zip(PATH_FIELDS, node.fields):
+            setattr(m, field, value)
+        # in place, the dicts may be shared with other managers (they're class attributes)
+        for (field, levels), value in zip(PATH_DICTS, node.dicts):
+            current = getattr(m, field)
+            current.clear()
+            current.update(copy_dict(value, levels))
+        m.reg_writes.clear()
+        m.reg_writes.update(node.reg_writes)
+
+        self.reused += depth
+        self.executed += len(keys) - depth
+        return depth
@@ -0,0 +1,125 @@
+"""Cache of feasibility queries. Many paths send the very same constraint set to z3, within a
+run and across reruns of the same design (e.g. with more cycles). A query is canonicalized by
+renaming the uninterpreted constants of its assertions to v0, v1, ... in order of first
+appearance (walking the terms), so the same query over other random symbols (another run)
+gets the same key; the sorts of the constants are part of the key. Results are kept in
+memory in an LRU cache and optionally in an sqlite database shared by runs. The cache is
+opt-in, it is only used with a size or a database."""
+
+import time
+import hashlib
+import sqlite3
+import logging
+from collections import OrderedDict
+from typing import Optional
+from z3 import sat, unsat, is_const, substitute, Const, Z3_OP_UNINTERPRETED
+
+# in memory size used when only a database is given
+QUERY_CACHE_SIZE = 65536
+
+# commit to the database after this many new results
+COMMIT_EVERY = 256
+
+
+class QueryCache:
+    """sat/unsat results of feasibility queries by canonical key, and the solver time they took."""
+
+    def __init__(self, size: int = QUERY_CACHE_SIZE, path: Optional[str] = None):
+        self.size = size
+        self.results: OrderedDict = OrderedDict()
+        self.db = None
+        self.uncommitted = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        # solver time the hits would have taken, as measured when they were solved
+        self.time_saved: float = 0
+        if path is not None:
+            try:
+                self.db = sqlite3.connect(path, timeout=30)
+                self.db.execute("CREATE TABLE IF NOT EXISTS queries (key TEXT PRIMARY KEY, sat INTEGER, seconds REAL)")
+            except sqlite3.Error as e:
+                logging.debug(f"not using query cache {path}: {e}")
+                self.db = None
+
+    def key(self, solver) -> str:
+        assertions = solver.assertions()
+        constants = {}
+        seen = set()
+        for assertion in assertions:
+            stack = [assertion]
+            while stack:
+                term = stack.pop()
+                if term.get_id() in seen:
+                    continue
+                seen.add(term.get_id())
+                if is_const(term) and term.decl().kind() == Z3_OP_UNINTERPRETED:
+                    constants[term.get_id()] = term
+                else:
+                    stack.extend(reversed(term.children()))
+        renaming = [(constant, Const(f"v{i}", constant.sort())) for i, constant in enumerate(constants.values())]
+        lines = [" ".join(constant.sort().sexpr() for constant, _ in renaming)]
+        for assertion in assertions:
+            lines.append((substitute(assertion, *renaming) if renaming else assertion).sexpr())
+        return hashlib.blake2b("\n".join(lines).encode(), digest_size=16).hexdigest()
+
+    def lookup(self, key: str) -> Optional[tuple]:
+        result = self.results.get(key)
+        if result is not None:
+            self.results.move_to_end(key)
+            return result
+        if self.db is not None:
+            row = self.db.execute("SELECT sat, seconds FROM queries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                result = (bool(row[0]), row[1])
+                self.remember(key, result)
+        return result
+
+    def remember(self, key: str, result: tuple) -> None:
+        self.results[key] = result
+        while len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+    def check(self, solver, solve=None) -> bool:
+        """Whether the assertions of the solver are satisfiable, from the cache if possible.
+        On a miss solve() is called if given, else the solver is checked."""
+        key = self.key(solver)
+        result = self.lookup(key)
+        if result is not None:
+            self.hits += 1
+            self.time_saved += result[1]
+            return result[0]
+        self.misses += 1
+        start = time.process_time()
+        answer = solve() if solve is not None else solver.check()
+        seconds = time.process_time() - start
+        if answer != sat and answer != unsat:
+            # unknown isn't worth remembering
+            return False
+        result = (answer == sat, seconds)
+        self.remember(key, result)
+        if self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO queries VALUES (?, ?, ?)", (key, int(result[0]), seconds))
+            self.uncommitted += 1
+            if self.uncommitted >= COMMIT_EVERY:
+                self.commit()
+        return result[0]
+
+    def commit(self) -> None:
+        if self.db is None or not self.uncommitted:
+            return
+        try:
+            self.db.commit()
+        except sqlite3.Error as e:
+            logging.debug(f"could not write query cache: {e}")
+        self.uncommitted = 0
+
+    def close(self) -> None:
+        self.commit()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
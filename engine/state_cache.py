@@ -0,0 +1,81 @@
+"""State subsumption at cycle boundaries. Different paths through cycle k often end in the same
+symbolic state (every reset path, say), and then the continuations in cycle k+1 onwards are
+explored once per such path for nothing. At the end of each cycle of each module the state
+is hashed canonically: the symbolic store of every module plus the path condition, as the set
+of its simplified assertions. If the same store was reached before at the same point with an
+equal or weaker path condition, everything reachable from here was already explored from
+there, so the engine skips the rest of the subtree of paths sharing this prefix."""
+
+import hashlib
+from typing import Dict, List, Tuple
+from z3 import And, Not, simplify, unsat
+
+
+def store_digest(store: dict) -> bytes:
+    """Hash of the symbolic store that doesn't depend on insertion order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for module_name in sorted(store):
+        digest.update(module_name.encode())
+        signals = store[module_name]
+        for signal in sorted(signals, key=str):
+            value = signals[signal]
+            if isinstance(value, dict):
+                value = sorted((str(k), str(v)) for k, v in value.items())
+            digest.update(f"\0{signal}={value}".encode())
+    return digest.digest()
+
+
+class StateCache:
+    """The states seen at cycle boundaries, by position in the path and store digest."""
+
+    def __init__(self, use_solver: bool = False):
+        # also ask the solver whether the current path condition implies an earlier one,
+        # when no earlier one is a subset of it
+        self.use_solver = use_solver
+        # (position, store digest) -> [(path condition as a frozenset of sexprs, its assertions)]
+        self.states: Dict[Tuple, List[Tuple[frozenset, tuple]]] = {}
+        # ast id -> (assertion, its simplified sexpr), the assertion keeps the id from being reused
+        self.simplified = {}
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def path_condition(self, pc) -> Tuple[frozenset, tuple]:
+        """The path condition as a set of simplified assertions, so duplicates and order don't matter."""
+        assertions = tuple(pc.assertions())
+        sexprs = []
+        for assertion in assertions:
+            cached = self.simplified.get(assertion.get_id())
+            if cached is None:
+                cached = self.simplified[assertion.get_id()] = (assertion, simplify(assertion).sexpr())
+            sexprs.append(cached[1])
+        return frozenset(sexprs), assertions
+
+    def subsumed(self, position, store: dict, pc, remember: bool) -> bool:
+        """Whether the state at this position was already explored with an equal or weaker
+        path condition. A miss is remembered if asked to, which the caller should only do
+        when all of the state's continuations are going to be explored."""
+        key = (position, store_digest(store))
+        conds, assertions = self.path_condition(pc)
+        seen = self.states.get(key, ())
+        for old_conds, old_assertions in seen:
+            # fewer assertions is a weaker path condition
+            if old_conds <= conds:
+                self.hits += 1
+                return True
+        if self.use_solver:
+            for old_conds, old_assertions in seen:
+                if self.implies(pc, old_assertions):
+                    self.hits += 1
+                    return True
+        self.misses += 1
+        if remember:
+            self.states.setdefault(key, []).append((conds, assertions))
+        return False
+
+    def implies(self, pc, old_assertions: tuple) -> bool:
+        """Whether the current path condition implies an earlier one, i.e. pc and not old is UNSAT."""
+        pc.push()
+        pc.add(Not(And(*old_assertions)))
+        result = pc.check()
+        pc.pop()
+        return result == unsat
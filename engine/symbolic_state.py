@@ -4,9 +4,10 @@ are some other methods here that may be helpful, too."""
 import z3
 from z3 import Solver, Int, BitVec, BitVecSort
 from pyverilog.vparser.ast import Pointer
+from .path_solver import PathSolver
 
 class SymbolicState:
-    pc = Solver()
+    pc = PathSolver()
     sort = BitVecSort(32)
     clock_cycle: int = 0
     #TODO need to change to be a nested mapping of module names to dictionaries
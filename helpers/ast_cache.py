@@ -0,0 +1,87 @@
+"""On-disk cache of parsed designs. Preprocessing and parsing a large design through PLY
+takes seconds, and repeat runs (e.g. with a different number of cycles) parse the exact
+same sources, so the parsed AST is pickled under a key derived from the contents of every
+source and included file, the include paths and the macro definitions."""
+
+import os
+import re
+import sys
+import pickle
+import hashlib
+import logging
+import pyverilog
+from pyverilog.vparser.parser import parse
+
+INCLUDE_RE = re.compile(rb'`include\s+"([^"]+)"')
+
+# the AST is deeply nested, pickling it recurses once per level
+PICKLE_RECURSION_LIMIT = 100000
+
+
+def find_include(name: str, including_file: str, include_paths) -> str:
+    """Resolve an `include the way the preprocessor does, None if it can't be found."""
+    for directory in [os.path.dirname(including_file)] + list(include_paths):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def cache_key(filelist, include_paths, defines) -> str:
+    """Hash of everything that can change the parsed AST."""
+    key = hashlib.sha256()
+    key.update(pyverilog.__version__.encode())
+    key.update(repr((list(include_paths), list(defines))).encode())
+    seen = set()
+    pending = list(filelist)
+    while pending:
+        path = pending.pop(0)
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(path, "rb") as f:
+            contents = f.read()
+        key.update(path.encode())
+        key.update(hashlib.sha256(contents).digest())
+        for name in INCLUDE_RE.findall(contents):
+            include = find_include(name.decode(), path, include_paths)
+            if include is None:
+                # hash the unresolved name so adding the file later changes the key
+                key.update(name)
+            else:
+                pending.append(include)
+    return key.hexdigest()
+
+
+def cached_parse(filelist, include_paths, defines, cache_dir: str):
+    """Parse the design like pyverilog's parse, reusing the AST of an earlier run if nothing changed.
+    Passing None as the cache directory disables the cache."""
+    if cache_dir is None:
+        return parse(filelist, preprocess_include=include_paths, preprocess_define=defines)
+
+    path = os.path.join(cache_dir, cache_key(filelist, include_paths, defines) + ".pickle")
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, PICKLE_RECURSION_LIMIT))
+    try:
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    return pickle.load(f)
+            except Exception as e:
+                logging.debug(f"ignoring unreadable AST cache {path}: {e}")
+
+        ast, directives = parse(filelist, preprocess_include=include_paths, preprocess_define=defines)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # write to a temporary file first so concurrent runs never see half a pickle
+            with open(tmp_path, "wb") as f:
+                pickle.dump((ast, directives), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.debug(f"could not write AST cache {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return ast, directives
+    finally:
+        sys.setrecursionlimit(limit)
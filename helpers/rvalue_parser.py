@@ -5,7 +5,7 @@ rvalue not handled by this."""
 
 import sys
 from pyverilog.vparser.ast import Rvalue, Eq, Cond, Pointer, UnaryOperator, Operator, IdentifierScope, Identifier, StringConst, Partselect, Repeat
-from pyverilog.vparser.ast import Concat, IntConst
+from pyverilog.vparser.ast import Concat, IntConst, Node
 from engine.execution_manager import ExecutionManager
 from engine.symbolic_state import SymbolicState
 from z3 import If, BitVec, IntVal, Int2BV, BitVecVal
@@ -21,6 +21,19 @@ op_map = {"Plus": "+", "Minus": "-", "Power": "**", "Times": "*", "Divide": "/",
 "Sra": ">>", "LessThan": "<", "GreaterThan": ">", "LessEq": "<=", "GreaterEq": ">=", "Eq": "==", "NotEq": "!=", "Eql": "===", "NotEql": "!==",
 "And": "&", "Xor": "^", "Or": "|", "Land": "&&", "Lor": "||", "Unot": "!", "Ulnot": "!", "Unor": "!", "Uor": "|", "Uand": "&", "Unand": "&"}
 
+# pointer accesses aliased in the store while an rvalue is compiled, see compile_rvalue
+_recorded_aliases = None
+
+def record_alias(alias) -> None:
+    """Remember an alias made during compilation, None marks the rvalue as store dependent."""
+    if _recorded_aliases is not None:
+        _recorded_aliases.append(alias)
+
+def alias_pointer(ptr_access: str, name: str, s: SymbolicState, m: ExecutionManager) -> None:
+    """Make a pointer access resolve to the symbolic value of the signal it indexes."""
+    s.store[m.curr_module][ptr_access] = s.store[m.curr_module][name]
+    record_alias((ptr_access, name))
+
 def conjunction_with_pointers(rvalue, s: SymbolicState, m: ExecutionManager) -> str: 
     """Convert the compound rvalue into proper string representation with pointers taken into account."""
     if isinstance(rvalue, UnaryOperator):
@@ -35,6 +48,7 @@ def conjunction_with_pointers(rvalue, s: SymbolicState, m: ExecutionManager) ->
             times_int = int(rvalue.times.value)
         else:
             times = evaluate(parse_tokens(tokenize(conjunction_with_pointers(rvalue.times, s, m), s, m)), s, m)
+            record_alias(None)
             times_int = int(str_to_int(times, s, m))
         accumulate = "("
         val = conjunction_with_pointers(rvalue.value, s, m) 
@@ -50,13 +64,13 @@ def conjunction_with_pointers(rvalue, s: SymbolicState, m: ExecutionManager) ->
                 ptr_access_f = f"{rvalue.false_value.var}[{inside_brackets}]"
             else:
                 ptr_access_f = f"{rvalue.false_value.var}[{rvalue.false_value.ptr}]"
-            s.store[m.curr_module][ptr_access_f] = s.store[m.curr_module][rvalue.false_value.var.name]
+            alias_pointer(ptr_access_f, rvalue.false_value.var.name, s, m)
             if isinstance(rvalue.true_value.ptr, Operator):
                 inside_brackets = conjunction_with_pointers(rvalue.true_value.ptr, s, m)
                 ptr_access_t = f"{rvalue.true_value.var}[{inside_brackets}]"
             else:
                 ptr_access_t = f"{rvalue.true_value.var}[{rvalue.true_value.ptr}]"
-            s.store[m.curr_module][ptr_access_t] = s.store[m.curr_module][rvalue.true_value.var.name]
+            alias_pointer(ptr_access_t, rvalue.true_value.var.name, s, m)
             return f"(Cond {conjunction_with_pointers(rvalue.cond, s, m)} {ptr_access_t} {ptr_access_f})"
         elif isinstance(rvalue.false_value, Pointer):
             if isinstance(rvalue.false_value.ptr, Operator):
@@ -64,7 +78,7 @@ def conjunction_with_pointers(rvalue, s: SymbolicState, m: ExecutionManager) ->
                 ptr_access = f"{rvalue.false_value.var}[{inside_brackets}]"
             else:
                 ptr_access = f"{rvalue.false_value.var}[{rvalue.false_value.ptr}]"
-            s.store[m.curr_module][ptr_access] = s.store[m.curr_module][rvalue.false_value.var.name]
+            alias_pointer(ptr_access, rvalue.false_value.var.name, s, m)
             return f"(Cond {conjunction_with_pointers(rvalue.cond, s, m)} {rvalue.true_value} {ptr_access})"
         elif isinstance(rvalue.true_value, Pointer):
             if isinstance(rvalue.true_value.ptr, Operator):
@@ -72,7 +86,7 @@ def conjunction_with_pointers(rvalue, s: SymbolicState, m: ExecutionManager) ->
                 ptr_access = f"{rvalue.true_value.var}[{inside_brackets}]"
             else:
                 ptr_access = f"{rvalue.true_value.var}[{rvalue.true_value.ptr}]"
-            s.store[m.curr_module][ptr_access] = s.store[m.curr_module][rvalue.true_value.var.name]
+            alias_pointer(ptr_access, rvalue.true_value.var.name, s, m)
             return f"(Cond {conjunction_with_pointers(rvalue.cond, s, m)} {ptr_access} {conjunction_with_pointers(rvalue.false_value, s, m)})"
         else:
             return f"(Cond {conjunction_with_pointers(rvalue.cond, s, m)} {conjunction_with_pointers(rvalue.true_value, s, m)} {conjunction_with_pointers(rvalue.false_value, s, m)})"
@@ -87,8 +101,8 @@ def conjunction_with_pointers(rvalue, s: SymbolicState, m: ExecutionManager) ->
             if isinstance(rvalue.right.ptr, Operator):
                 expr_in_brackets = conjunction_with_pointers(rvalue.right.ptr, s, m)
                 new_right = f"{rvalue.right.var}[ {expr_in_brackets} ]"
-            s.store[m.curr_module][new_right] = s.store[m.curr_module][rvalue.right.var.name]
-            s.store[m.curr_module][new_left] = s.store[m.curr_module][rvalue.left.var.name]
+            alias_pointer(new_right, rvalue.right.var.name, s, m)
+            alias_pointer(new_left, rvalue.left.var.name, s, m)
             return f"({operator} {new_left} {new_right})"
         elif isinstance(rvalue.left, Pointer):
             new_left = f"{rvalue.left.var}[{rvalue.left.ptr}]"
@@ -97,18 +111,20 @@ def conjunction_with_pointers(rvalue, s: SymbolicState, m: ExecutionManager) ->
             if isinstance(rvalue.left.ptr, Operator):
                 expr_in_brackets = conjunction_with_pointers(rvalue.left.ptr, s, m)
                 new_left_s = f"{rvalue.left.var}[ {evaluate(parse_tokens(tokenize(expr_in_brackets, s, m)), s, m)} ]"
+                # the alias depends on the store, so this rvalue can't be compiled once
+                record_alias(None)
                 new_left = f"{rvalue.left.var}[ {(expr_in_brackets)} ]"
             if not new_left_s is None:
-                s.store[m.curr_module][new_left_s] = s.store[m.curr_module][rvalue.left.var.name]
+                alias_pointer(new_left_s, rvalue.left.var.name, s, m)
             else:
-                s.store[m.curr_module][new_left] = s.store[m.curr_module][rvalue.left.var.name]
+                alias_pointer(new_left, rvalue.left.var.name, s, m)
             return f"({operator} {new_left} {conjunction_with_pointers(rvalue.right, s, m)})"
         elif isinstance(rvalue.right, Pointer):
             new_right = f"{rvalue.right.var}[{rvalue.right.ptr}]"
             if isinstance(rvalue.right.ptr, Operator):
                 expr_in_brackets = conjunction_with_pointers(rvalue.right.ptr, s, m)
                 new_right = f"{rvalue.right.var}[ {expr_in_brackets} ]"
-            s.store[m.curr_module][new_right] = s.store[m.curr_module][rvalue.right.var.name]
+            alias_pointer(new_right, rvalue.right.var.name, s, m)
             return f"({operator} {conjunction_with_pointers(rvalue.left, s, m)} {new_right})"
         elif isinstance(rvalue.right, Partselect) and isinstance(rvalue.left, Partselect):
             new_right = f"{rvalue.right.var.name}[{rvalue.right.msb}:{rvalue.right.lsb}]"
@@ -156,6 +172,29 @@ def tokenize(rvalue, s: SymbolicState, m: ExecutionManager):
     tokens = str_rvalue.split(" ")
     return tokens
 
+def compile_rvalue(rvalue, s: SymbolicState, m: ExecutionManager):
+    """Tokenize and parse an rvalue into its token tree. For AST nodes the tree only depends
+    on the node, so it is built on first use and cached on the node; later calls just replay
+    the pointer aliases the conversion makes in the store of the current module."""
+    global _recorded_aliases
+    if not isinstance(rvalue, Node):
+        return parse_tokens(tokenize(rvalue, s, m))
+    compiled = getattr(rvalue, "compiled_tokens", None)
+    if compiled is not None:
+        tokens, aliases = compiled
+        for ptr_access, name in aliases:
+            s.store[m.curr_module][ptr_access] = s.store[m.curr_module][name]
+        return tokens
+    outer = _recorded_aliases
+    _recorded_aliases = aliases = []
+    try:
+        tokens = parse_tokens(tokenize(rvalue, s, m))
+    finally:
+        _recorded_aliases = outer
+    if not None in aliases:
+        rvalue.compiled_tokens = (tokens, aliases)
+    return tokens
+
 def parse_tokens(tokens):
     if len(tokens) == 1 and tokens[0].isalpha():
         return tokens
@@ -7,9 +7,10 @@ from pyverilog.vparser.ast import Description, ModuleDef, Node, IfStatement, Sin
 from pyverilog.vparser.ast import WhileStatement, ForStatement, CaseStatement, Block, SystemCall, Land, InstanceList, IntConst, Partselect, Ioport
 from pyverilog.vparser.ast import Value, Reg, Initial, Eq, Identifier, Initial,  NonblockingSubstitution, Decl, Always, Assign, NotEql, Case
 from pyverilog.vparser.ast import Concat, BlockingSubstitution, Parameter, StringConst, Wire, PortArg
-from helpers.rvalue_parser import parse_tokens, tokenize
+from helpers.rvalue_parser import parse_tokens, tokenize, compile_rvalue
 from engine.execution_manager import ExecutionManager
 from engine.symbolic_state import SymbolicState
+from engine.expr import to_bitvec, bv_const
 
 BINARY_OPS = ("Plus", "Minus", "Power", "Times", "Divide", "Mod", "Sll", "Srl", "Sla", "Sra", "LessThan",
 "GreaterThan", "LessEq", "GreaterEq", "Eq", "NotEq", "Eql", "NotEql", "And", "Xor",
@@ -39,7 +40,7 @@ def parse_concat_to_Z3(concat, s: SymbolicState, m: ExecutionManager):
 def parse_expr_to_Z3(e: Value, s: SymbolicState, m: ExecutionManager):
     """Takes in a complex Verilog Expression and converts it to 
     a Z3 query."""
-    tokens_list = parse_tokens(tokenize(e, s, m))
+    tokens_list = compile_rvalue(e, s, m)
     new_constraint = evaluate_expr(tokens_list, s, m)
     #print(f"new_constraint{new_constraint}")
     new_constants = []
@@ -77,27 +78,24 @@ def parse_expr_to_Z3(e: Value, s: SymbolicState, m: ExecutionManager):
         if not e.var.scope is None:
             module_name = e.scope.labellist[0].name
         if s.store[module_name][e.var.name].isdigit():
-            int_val = IntVal(int(s.store[module_name][e.name]))
-            return Int2BV(int_val, 32)
+            return bv_const(int(s.store[module_name][e.name]), 32)
         else:
             if not part_sel_expr in s.store[m.curr_module] and "[" in part_sel_expr:
                 parts = part_sel_expr.partition("[")
                 first_part = parts[0]
                 s.store[m.curr_module][part_sel_expr] = s.store[m.curr_module][first_part]
-            return BitVec(s.store[module_name][part_sel_expr], 32)
+            return to_bitvec(s.store[module_name][part_sel_expr], 32)
     elif isinstance(e, Identifier):
         module_name = m.curr_module
         is_reg = e.name in m.reg_decls
         if not e.scope is None:
             module_name = e.scope.labellist[0].name
         if s.store[module_name][e.name].isdigit():
-            int_val = IntVal(int(s.store[module_name][e.name]))
-            return Int2BV(int_val, 32)
+            return bv_const(int(s.store[module_name][e.name]), 32)
         else:
-            return BitVec(s.store[module_name][e.name], 32)
+            return to_bitvec(s.store[module_name][e.name], 32)
     elif isinstance(e, Constant):
-        int_val = IntVal(e.value)
-        return Int2BV(int_val, 32)
+        return bv_const(e.value, 32)
     elif isinstance(e, Eq):
         lhs = parse_expr_to_Z3(e.left, s, m)
         rhs = parse_expr_to_Z3(e.right, s, m)
@@ -156,6 +154,10 @@ def parse_expr_to_Z3(e: Value, s: SymbolicState, m: ExecutionManager):
 
 def solve_pc(s: Solver) -> bool:
     """Solve path condition."""
+    # a PathSolver goes through its caches
+    feasible = getattr(s, "feasible", None)
+    if feasible is not None:
+        return feasible()
     result = str(s.check())
     if str(result) == "sat":
         model = s.model()
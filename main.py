@@ -25,6 +25,8 @@ from engine.symbolic_state import SymbolicState
 from helpers.rvalue_parser import tokenize, parse_tokens, evaluate
 from strategies.dfs import DepthFirst
 from engine.execution_engine import ExecutionEngine
+from engine.path_solver import UNKNOWN_POLICIES
+from helpers.ast_cache import cached_parse
 from pyverilog.dataflow.dataflow_analyzer import VerilogDataflowAnalyzer
 from pyverilog.dataflow.optimizer import VerilogDataflowOptimizer
 from pyverilog.dataflow.graphgen import VerilogGraphGenerator
@@ -32,11 +34,6 @@ import pygraphviz as pgv
 
 gc.collect()
 
-with open('errors.log', 'w'):
-    pass
-logging.basicConfig(filename='errors.log', level=logging.DEBUG)
-logging.debug("Starting over!")
-
 
 INFO = "Verilog Symbolic Execution Engine"
 VERSION = pyverilog.__version__
@@ -81,6 +78,42 @@ def main():
                          default=False, help="Reorder the contineous tree, Default=False")
     optparser.add_option("--delay", action="store_true", dest="delay",
                          default=False, help="Inset Delay Node to walk Regs, Default=False")
+    optparser.add_option("--start-path", dest="start_path", type='int',
+                         default=0, help="Index of the first path to explore (to resume a run), Default=0")
+    optparser.add_option("--stop-path", dest="stop_path", type='int',
+                         default=None, help="Index one past the last path to explore, Default=all paths")
+    optparser.add_option("-j", "--jobs", dest="jobs", type='int',
+                         default=1, help="Number of worker processes exploring paths in parallel, Default=1")
+    optparser.add_option("--ast-cache", dest="ast_cache",
+                         default=".sylvia_cache/ast", help="Directory caching parsed designs between runs, Default=.sylvia_cache/ast")
+    optparser.add_option("--no-ast-cache", action="store_true", dest="no_ast_cache",
+                         default=False, help="Always preprocess and parse the design, Default=False")
+    optparser.add_option("--cfg-cache", dest="cfg_cache",
+                         default=None, help="Directory caching built CFGs between runs, Default=no cache")
+    optparser.add_option("--coi", action="store_true", dest="coi",
+                         default=False, help="Slice away logic outside the cone of influence of the assertions, Default=False")
+    optparser.add_option("--merge", action="store_true", dest="merge",
+                         default=False, help="Merge the states of branches with short straight-line arms instead of forking, Default=False")
+    optparser.add_option("--subsume", action="store_true", dest="subsume",
+                         default=False, help="Skip the continuations of states already explored at the end of a cycle, Default=False")
+    optparser.add_option("--subsume-solver", action="store_true", dest="subsume_solver",
+                         default=False, help="With --subsume, also ask the solver whether an earlier state has a weaker path condition, Default=False")
+    optparser.add_option("--summary-cache-size", dest="summary_cache_size", type='int',
+                         default=0, help="Number of CFG path summaries of child module instances kept (e.g. 1024), 0 to disable them, Default=0")
+    optparser.add_option("--query-cache", dest="query_cache",
+                         default=None, help="sqlite file caching solver queries between runs, Default=memory only")
+    optparser.add_option("--query-cache-size", dest="query_cache_size", type='int',
+                         default=0, help="Number of solver queries cached in memory (65536 with --query-cache), 0 to disable the cache, Default=0")
+    optparser.add_option("--model-cache-size", dest="model_cache_size", type='int',
+                         default=0, help="Number of satisfying models kept to answer solver queries (e.g. 32), 0 to disable the cache, Default=0")
+    optparser.add_option("--assumptions", action="store_true", dest="assumptions",
+                         default=False, help="Check branches with selector assumptions in one incremental solver instead of push/pop, Default=False")
+    optparser.add_option("--solver-timeout", dest="solver_timeout", type='int',
+                         default=0, help="Timeout of each solver check in milliseconds, 0 for none, Default=0")
+    optparser.add_option("--unknown", dest="unknown_policy", type='choice', choices=list(UNKNOWN_POLICIES),
+                         default="sat", help="What a solver check that times out is taken as: sat (keep exploring the path), unsat (abandon it) or retry (explore it again at the end with a longer timeout), Default=sat")
+    optparser.add_option("--deadline", dest="deadline", type='float',
+                         default=None, help="Wall clock seconds after which exploration stops and reports what it found, Default=None")
     (options, args) = optparser.parse_args()
 
 
@@ -93,6 +126,23 @@ def main():
     if options.showdebug:
         engine.debug = True
 
+    engine.start_path = options.start_path
+    engine.stop_path = options.stop_path
+    engine.jobs = options.jobs
+    engine.cfg_cache = options.cfg_cache
+    engine.coi = options.coi
+    engine.merge = options.merge
+    engine.subsume = options.subsume
+    engine.subsume_solver = options.subsume_solver
+    engine.summary_cache_size = options.summary_cache_size
+    engine.query_cache = options.query_cache
+    engine.query_cache_size = options.query_cache_size
+    engine.model_cache_size = options.model_cache_size
+    engine.assumptions = options.assumptions
+    engine.solver_timeout = options.solver_timeout
+    engine.unknown_policy = options.unknown_policy
+    engine.deadline = options.deadline
+
     for f in filelist:
         if not os.path.exists(f):
             raise IOError("file not found: " + f)
@@ -100,11 +150,8 @@ def main():
     if len(filelist) == 0:
         showVersion()
 
-    text = preprocess(filelist, include=options.include, define=options.define)
-    #print(text)
-    ast, directives = parse(filelist,
-                            preprocess_include=options.include,
-                            preprocess_define=options.define)
+    ast_cache = None if options.no_ast_cache else options.ast_cache
+    ast, directives = cached_parse(filelist, options.include, options.define, ast_cache)
 
 
     # analyzer = VerilogDataflowAnalyzer(filelist, options.topmodule,
@@ -143,6 +190,8 @@ def main():
     start = time.process_time()
     try:
         engine.execute(top_level_module, modules, None, directives, num_cycles)
+    except KeyboardInterrupt:
+        print(f"Interrupted at path {engine.path_index}, resume with --start-path {engine.path_index}")
     except Exception as e:
         logging.error(f'caught error: {e}', exc_info=True)
 
@@ -150,6 +199,11 @@ def main():
     print(f"Elapsed time {end - start}")
 
 if __name__ == '__main__':
+    # kept under the guard so --jobs workers, which re-import this file, don't truncate the log
+    with open('errors.log', 'w'):
+        pass
+    logging.basicConfig(filename='errors.log', level=logging.DEBUG)
+    logging.debug("Starting over!")
     main()
 
 
@@ -1,6 +1,6 @@
 """Depth First Traversal of the AST."""
 from .template import Search
-from z3 import Solver, Int, BitVec, Int2BV, IntVal, Concat
+from z3 import Solver, Int, BitVec, Int2BV, IntVal, Concat, BitVecRef
 from engine.execution_manager import ExecutionManager
 from engine.symbolic_state import SymbolicState
 from pyverilog.vparser.ast import Description, ModuleDef, Node, IfStatement, SingleStatement, And, Constant, Rvalue, Plus, Input, Output
@@ -10,8 +10,10 @@ from pyverilog.vparser.ast import Concat, BlockingSubstitution, Parameter, Strin
 from pyverilog.vparser.ast import Repeat 
 from helpers.utils import init_symbol
 from typing import Optional
-from helpers.rvalue_parser import tokenize, parse_tokens, evaluate, resolve_dependency, count_nested_cond, cond_options, str_to_int, str_to_bool, simpl_str_exp, conjunction_with_pointers
+from helpers.rvalue_parser import tokenize, parse_tokens, compile_rvalue, evaluate, resolve_dependency, count_nested_cond, cond_options, str_to_int, str_to_bool, simpl_str_exp, conjunction_with_pointers
 from helpers.rvalue_to_z3 import parse_expr_to_Z3, solve_pc, parse_concat_to_Z3
+from engine.expr import to_bitvec, bv_const
+from engine.merge import MergedIfStatement
 from helpers.utils import to_binary
 from itertools import product, permutations
 import os
@@ -69,7 +71,7 @@ class DepthFirst(Search):
                     cond = str(s.store[module][str(signal)])[3:].split(",")[0][:-1]
                     if str_to_bool(cond, s, m):
                         if isinstance(m.cond_assigns[module][signal][cond], Operator):
-                            parsed_cond = evaluate(parse_tokens(tokenize(m.cond_assigns[module][signal][cond], s, m)), s, m)
+                            parsed_cond = evaluate(compile_rvalue(m.cond_assigns[module][signal][cond], s, m), s, m)
                             int_cond = None
                             if parsed_cond.split(" ")[0].isdigit():
                                 #TODO: get correct width here
@@ -266,8 +268,8 @@ class DepthFirst(Search):
                     m.dependencies[m.curr_module][stmt.left.var.var.name] = stmt.right.var.var.name
                     m.updates[stmt.left.var.var.name] = 0
                 else:
-                    new_msb = evaluate(parse_tokens(tokenize(stmt.right.var.msb, s, m)), s, m)
-                    new_lsb = evaluate(parse_tokens(tokenize(stmt.right.var.lsb, s, m)), s, m)
+                    new_msb = evaluate(compile_rvalue(stmt.right.var.msb, s, m), s, m)
+                    new_lsb = evaluate(compile_rvalue(stmt.right.var.lsb, s, m), s, m)
                     #TODO : cases
                     if not new_msb is None and not new_lsb is None:
                         s.store[m.curr_module][stmt.left.var.name] = f"{s.store[m.curr_module][stmt.right.var.var.name]}[{new_msb}:{new_lsb}]"
@@ -298,7 +300,7 @@ class DepthFirst(Search):
                     for item in stmt.right.var.list:
                         # TODO: concatenation is more nuanced potentially than this...
                         # see line 237 of or1200_except
-                        str_item = evaluate(parse_tokens(tokenize(item, s, m)), s, m)
+                        str_item = evaluate(compile_rvalue(item, s, m), s, m)
                         s.store[m.curr_module][stmt.left.var.name][str_item] = str_item
                         #s.store[m.curr_module][stmt.left.var.name][item.name] = s.store[m.curr_module][item.name]
             elif isinstance(stmt.right.var, Cond):
@@ -308,7 +310,7 @@ class DepthFirst(Search):
                     m.cond_assigns[m.curr_module][f"{stmt.left.var.var}[{stmt.left.var.ptr}]"] = opts
                     # complexity is how many nested conditonals we have on the rhs
                     complexity = count_nested_cond(stmt.right.var.cond, stmt.right.var.true_value, stmt.right.var.false_value, s, m)
-                    new_r_value = evaluate(parse_tokens(tokenize(stmt.right.var, s, m)), s, m)
+                    new_r_value = evaluate(compile_rvalue(stmt.right.var, s, m), s, m)
                     if str(stmt.right.var.cond) in opts:
                         new_cond = new_r_value[3:].split(",")[0][:-1]
 
@@ -320,7 +322,7 @@ class DepthFirst(Search):
                     m.cond_assigns[m.curr_module][f"{stmt.left.var.var.name}[{stmt.left.var.msb}:{stmt.left.var.lsb}]"] = opts
                     # complexity is how many nested conditonals we have on the rhs
                     complexity = count_nested_cond(stmt.right.var.cond, stmt.right.var.true_value, stmt.right.var.false_value, s, m)
-                    new_r_value = evaluate(parse_tokens(tokenize(stmt.right.var, s, m)), s, m)
+                    new_r_value = evaluate(compile_rvalue(stmt.right.var, s, m), s, m)
                     if str(stmt.right.var.cond) in opts:
                         new_cond = new_r_value[3:].split(",")[0][:-1]
                         opts[new_cond] = opts.pop(str(stmt.right.var.cond))
@@ -331,13 +333,13 @@ class DepthFirst(Search):
                     m.cond_assigns[m.curr_module][stmt.left.var.name] = opts
                     # complexity is how many nested conditonals we have on the rhs
                     complexity = count_nested_cond(stmt.right.var.cond, stmt.right.var.true_value, stmt.right.var.false_value, s, m)
-                    new_r_value = evaluate(parse_tokens(tokenize(stmt.right.var, s, m)), s, m)
+                    new_r_value = evaluate(compile_rvalue(stmt.right.var, s, m), s, m)
                     if str(stmt.right.var.cond) in opts:
                         new_cond = new_r_value[3:].split(",")[0][:-1]
                         opts[new_cond] = opts.pop(str(stmt.right.var.cond))
                     s.store[m.curr_module][stmt.left.var.name] = new_r_value
             elif isinstance(stmt.right.var, Pointer):
-                expr_in_brackets = evaluate(parse_tokens(tokenize(stmt.right.var.ptr, s, m)), s, m)
+                expr_in_brackets = evaluate(compile_rvalue(stmt.right.var.ptr, s, m), s, m)
                 if not expr_in_brackets is None:
                     s.store[m.curr_module][stmt.left.var.name] = f"{s.store[m.curr_module][stmt.right.var.var.name]}[ {expr_in_brackets} ]"
                 else:
@@ -345,7 +347,7 @@ class DepthFirst(Search):
                 m.dependencies[m.curr_module][stmt.left.var.name] = stmt.right.var.var.name
                 m.updates[stmt.left.var.name] = 0
             else:
-                new_r_value = evaluate(parse_tokens(tokenize(stmt.right.var, s, m)), s, m)
+                new_r_value = evaluate(compile_rvalue(stmt.right.var, s, m), s, m)
                 if new_r_value != None:
                     s.store[m.curr_module][stmt.left.var.name] = new_r_value
                 else:
@@ -417,7 +419,7 @@ class DepthFirst(Search):
                         elif isinstance(item, IntConst):
                             s.store[m.curr_module][stmt.left.var.name][item.value] = item.value
                         elif isinstance(item, Repeat):
-                            new_r_value = evaluate(parse_tokens(tokenize(stmt.right.var, s, m)), s, m)
+                            new_r_value = evaluate(compile_rvalue(stmt.right.var, s, m), s, m)
                             s.store[m.curr_module][stmt.left.var.name][item.value] = new_r_value
                         else:
                             s.store[m.curr_module][stmt.left.var.name][item.name] = s.store[m.curr_module][item.name]
@@ -435,7 +437,7 @@ class DepthFirst(Search):
                 else:
                     s.store[m.curr_module][stmt.left.var.name] = f"{s.store[m.curr_module][stmt.right.var.var.name]}[{stmt.right.var.msb}:{stmt.right.var.lsb}]"
             elif isinstance(stmt.right.var, Pointer):
-                expr_in_brackets = evaluate(parse_tokens(tokenize(stmt.right.var.ptr, s, m)), s, m)
+                expr_in_brackets = evaluate(compile_rvalue(stmt.right.var.ptr, s, m), s, m)
                 if isinstance(stmt.left.var, Pointer):
                     if not expr_in_brackets is None:
                         s.store[m.curr_module][stmt.left.var.var.name] = f"{s.store[m.curr_module][stmt.right.var.var.name]}[ {expr_in_brackets} ]"
@@ -447,7 +449,7 @@ class DepthFirst(Search):
                     else: 
                          s.store[m.curr_module][stmt.left.var.name] = f"{s.store[m.curr_module][stmt.right.var.var.name]}[{stmt.right.var.ptr.value}]"
             else:
-                new_r_value = evaluate(parse_tokens(tokenize(stmt.right.var, s, m)), s, m)
+                new_r_value = evaluate(compile_rvalue(stmt.right.var, s, m), s, m)
                 if new_r_value != None:
                     if new_r_value.split(" ")[0].isdigit():
                         int_r_value = str_to_int(new_r_value, s, m, reg_width)
@@ -494,7 +496,7 @@ class DepthFirst(Search):
                     m.dependencies[m.curr_module][stmt.left.var.name] = stmt.right.var.var.name
                     m.updates[stmt.left.var.name] = 0
             else:
-                new_r_value = evaluate(parse_tokens(tokenize(stmt.right.var, s, m)), s, m)
+                new_r_value = evaluate(compile_rvalue(stmt.right.var, s, m), s, m)
                 if  new_r_value != None:
                     s.store[m.curr_module][stmt.left.var.name] = new_r_value
                 else:
@@ -515,6 +517,8 @@ class DepthFirst(Search):
             
         elif isinstance(stmt, Initial):
             self.visit_stmt(m, s, stmt.statement, modules, direction)
+        elif isinstance(stmt, MergedIfStatement):
+            self.visit_merged_if(m, s, stmt, modules)
         elif isinstance(stmt, IfStatement):
             m.curr_level += 1
             self.cond = True
@@ -580,11 +584,11 @@ class DepthFirst(Search):
                 # m.curr_level == (32 - bit_index) this is always true
                 #if nested_ifs == 0 and m.curr_level < 2 and self.seen_all_cases(m, bit_index, nested_ifs):
                 s.store[m.curr_module][str(stmt.pre.left.var.name)] = stmt.pre.right.var.value
-                while str_to_bool(evaluate(parse_tokens(tokenize(stmt.cond, s, m)), s, m), s, m):
+                while str_to_bool(evaluate(compile_rvalue(stmt.cond, s, m), s, m), s, m):
                     print("bey")
                     self.visit_stmt(m, s, stmt.statement,  modules)
-                    r = evaluate(parse_tokens(tokenize(stmt.post.right.var, s, m)), s, m)
-                    s.store[m.curr_module][stmt.pre.left.var.name] = str_to_int(evaluate(parse_tokens(tokenize(stmt.post.right.var, s, m)), s, m), s, m)
+                    r = evaluate(compile_rvalue(stmt.post.right.var, s, m), s, m)
+                    s.store[m.curr_module][stmt.pre.left.var.name] = str_to_int(evaluate(compile_rvalue(stmt.post.right.var, s, m), s, m), s, m)
             else:
                 m.count_conditionals_2(m, stmt.statement)
                 self.branch = False
@@ -598,10 +602,10 @@ class DepthFirst(Search):
                 self.visit_expr(m, s, stmt.cond)
                 solver_start = time.process_time()
                 m.solver_time += solver_end - solver_start
-                while str_to_bool(evaluate(parse_tokens(tokenize(stmt.cond, s, m)), s, m), s, m):
+                while str_to_bool(evaluate(compile_rvalue(stmt.cond, s, m), s, m), s, m):
                     self.visit_stmt(m, s, stmt.statement,  modules)
                     print("hi")
-                    s.store[m.curr_module][stmt.pre.left.var.name] = str_to_int(evaluate(parse_tokens(tokenize(stmt.post.right.var, s, m)), s, m), s, m)
+                    s.store[m.curr_module][stmt.pre.left.var.name] = str_to_int(evaluate(compile_rvalue(stmt.post.right.var, s, m), s, m), s, m)
 
                 if (m.abandon and m.debug):
                     print("Abandoning this path!")
@@ -703,6 +707,67 @@ class DepthFirst(Search):
             for case in stmt.caselist:
                 self.visit_stmt(m, s, case, modules, direction)
 
+    def take_branch(self, m: ExecutionManager, s: SymbolicState, literal) -> bool:
+        """Add a branch literal to the path condition, abandoning the path if it becomes UNSAT.
+        A literal already asserted on this path can't make it UNSAT, and one completing a
+        conflict learned before can't be SAT, so the solver is skipped for both."""
+        s.pc.push()
+        if s.pc.taken is not None:
+            s.pc.taken.append(literal)
+        if s.pc.implies(literal):
+            return True
+        if s.pc.blocked(literal):
+            # a conflict learned on an earlier path, no need to ask the solver
+            s.pc.pop()
+            m.abandon = True
+            m.ignore = True
+            return False
+        s.pc.add_literal(literal)
+        if not s.pc.feasible():
+            decisions = s.pc.learn_conflict()
+            if m.debug and decisions is not None:
+                print(f"Blocked conflicting decisions {decisions}")
+            s.pc.pop()
+            #print("Abandoning infeasible path")
+            m.abandon = True
+            m.ignore = True
+            return False
+        return True
+
+    def merge_condition(self, m: ExecutionManager, s: SymbolicState, cond) -> str:
+        """The symbolic value of a branch condition, as it goes into an ite expression."""
+        if isinstance(cond, Identifier):
+            return s.store[m.curr_module][cond.name]
+        return evaluate(compile_rvalue(cond, s, m), s, m)
+
+    def visit_merged_if(self, m: ExecutionManager, s: SymbolicState, stmt: MergedIfStatement, modules: Optional[dict]) -> None:
+        """Execute both arms of a merged branch on copies of the store and join them: signals the
+        arms disagree on become If(cond, true value, false value). The arms don't branch, so
+        the path condition is left as it is (the disjunction of cond and its negation)."""
+        cond = self.merge_condition(m, s, stmt.cond)
+        before = s.store[m.curr_module]
+        s.store[m.curr_module] = before.copy()
+        for item in stmt.true_statements:
+            self.visit_stmt(m, s, item, modules, None)
+        # a nested merged branch replaces the store, so read it back after each arm
+        true_store = s.store[m.curr_module]
+        s.store[m.curr_module] = before.copy()
+        for item in stmt.false_statements:
+            self.visit_stmt(m, s, item, modules, None)
+        false_store = s.store[m.curr_module]
+        joined = false_store.copy()
+        for signal in set(true_store) | set(false_store):
+            true_value = true_store.get(signal, before.get(signal))
+            false_value = false_store.get(signal, before.get(signal))
+            if false_value is None:
+                # only written on the true side
+                joined[signal] = true_value
+            elif true_value is None:
+                joined[signal] = false_value
+            elif not true_value is false_value and not true_value == false_value:
+                joined[signal] = f"If({cond}, {true_value}, {false_value})"
+        s.store[m.curr_module] = joined
+
     def visit_expr(self, m: ExecutionManager, s: SymbolicState, expr: Value) -> None:
         """Traverse the expressions in a hardware design."""
         if isinstance(expr, Reg):
@@ -714,11 +779,11 @@ class DepthFirst(Search):
                 m.reg_decls.add(expr.name)
                 if not expr.width is None: 
                     if isinstance(expr.width.msb, Operator):
-                        val = str_to_int(evaluate(parse_tokens(tokenize(expr.width.msb, s, m)), s, m), s, m)
+                        val = str_to_int(evaluate(compile_rvalue(expr.width.msb, s, m), s, m), s, m)
                         if not val is None:
                             m.reg_widths[expr.name] = 2 ** (val + 1)
                         else:
-                            val = simpl_str_exp(evaluate(parse_tokens(tokenize(expr.width.msb, s, m)), s, m), s, m)
+                            val = simpl_str_exp(evaluate(compile_rvalue(expr.width.msb, s, m), s, m), s, m)
                             m.reg_widths[expr.name] = val
                 else:
                     m.reg_widths[expr.name] = 4294967296
@@ -733,39 +798,27 @@ class DepthFirst(Search):
             # assume left is identifier
             #parse_expr_to_Z3(expr, s, m)
             if isinstance(expr.left, Partselect):                      
-                x = BitVec(s.store[m.curr_module][expr.left.var.name], 32)
+                x = to_bitvec(s.store[m.curr_module][expr.left.var.name], 32)
             elif (s.store[m.curr_module][expr.left.name]).isdigit():
-                int_val = IntVal(int(s.store[m.curr_module][expr.left.name]))
-                x = Int2BV(int_val, 32)
+                x = bv_const(int(s.store[m.curr_module][expr.left.name]), 32)
             elif (s.store[m.curr_module][expr.left.name]).split(" ")[0].isdigit():
-                x = Int2BV(IntVal(str_to_int(s.store[m.curr_module][expr.left.name], s, m)), 32)
+                x = bv_const(str_to_int(s.store[m.curr_module][expr.left.name], s, m), 32)
             else: 
-                x = BitVec(s.store[m.curr_module][expr.left.name], 32)
+                x = to_bitvec(s.store[m.curr_module][expr.left.name], 32)
             
             if isinstance(expr.right, IntConst):
                 if "'h" in str(expr.right.value) or "'b" in str(expr.right.value) or "'d" in str(expr.right.value):
-                    int_val = IntVal(int(str(expr.right.value.split("'")[1][1:])))
+                    y = bv_const(int(str(expr.right.value.split("'")[1][1:])), 32)
                 else:
-                    int_val = IntVal(expr.right.value)
-                y = Int2BV(int_val, 32)
+                    y = bv_const(expr.right.value, 32)
             else:
-                y = BitVec(expr.right.name, 32)
+                y = to_bitvec(expr.right.name, 32)
             if self.branch:
-                s.pc.push()
-                s.pc.add(x==y)
-                if not solve_pc(s.pc):
-                    s.pc.pop()
-                    m.abandon = True
-                    m.ignore  = True
-                    return
-            else: 
-                s.pc.push()
-                s.pc.add(x != y)
-                if not solve_pc(s.pc):
-                    s.pc.pop()
-                    m.abandon = True
-                    m.ignore = True
-                    return
+                literal = x == y
+            else:
+                literal = x != y
+            if not self.take_branch(m, s, literal):
+                return
                
         elif isinstance(expr, Identifier):
             # change this to one since inst is supposed to just be 1 bit width
@@ -775,44 +828,38 @@ class DepthFirst(Search):
                 symbol = s.store[m.curr_module][expr.name].split("'")[1][1:]
                 s.store[m.curr_module][expr.name] = symbol
                 if not symbol.isdigit():
-                    x = BitVec(s.store[m.curr_module][expr.name], 1)
+                    x = to_bitvec(s.store[m.curr_module][expr.name], 1)
                 else:
-                    x = Int2BV(IntVal(int(symbol)), 1)
+                    x = bv_const(int(symbol), 1)
             elif isinstance(symbol, dict):
                 bit_vec_list = parse_concat_to_Z3(symbol, s, m)
                 #TODO: get the right widths
                 x = BitVec(Concat(bit_vec_list), 1)
             else:
-                x = BitVec(s.store[m.curr_module][expr.name], 1)
-            y = BitVec(1, 1)
-            one = IntVal(1)
-            zero = IntVal(0)
-            one_bv = Int2BV(one, 1)
-            zero_bv = Int2BV(zero, 1)
+                x = to_bitvec(s.store[m.curr_module][expr.name], 1)
+            one_bv = bv_const(1, 1)
             if self.branch:
-                s.pc.push()
-                s.pc.add(x==one_bv)
-                if not solve_pc(s.pc):
-                    s.pc.pop()
-                    #print("Abandoning infeasible path")
-                    m.abandon = True
-                    m.ignore = True
-                    return
-            else: 
-                s.pc.push()
-                s.pc.add(x != one_bv)
-                if not solve_pc(s.pc):
-                    s.pc.pop()
-                    #print("Abandoning infeasible path")
-                    m.abandon = True
-                    m.ignore = True
-                    time.process_time()
-                    return
+                literal = x == one_bv
+            else:
+                literal = x != one_bv
+            if not self.take_branch(m, s, literal):
+                return
 
         # Handling Assertions
         elif isinstance(expr, NotEql):
-            print("assertion")
-            parse_expr_to_Z3(expr, s, m)
+            # the literal follows the direction of the path like the other conditions, so the
+            # arm of an assertion is only reached when the asserted value can differ
+            x = parse_expr_to_Z3(expr.left, s, m)
+            y = parse_expr_to_Z3(expr.right, s, m)
+            if not (isinstance(x, BitVecRef) and isinstance(y, BitVecRef)):
+                parse_expr_to_Z3(expr, s, m)
+                return
+            if self.branch:
+                literal = x != y
+            else:
+                literal = x == y
+            if not self.take_branch(m, s, literal):
+                return
             # x = BitVec(expr.left.name, 32)
             # y = BitVec(int(expr.right.value), 32)
             # if self.branch:
@@ -837,7 +884,7 @@ class DepthFirst(Search):
                     value = (int(cond.value.split("'")[1][1:], 16))
                 else:   
                     value = int(cond.value)
-                y = Int2BV(IntVal(value), width)
+                y = bv_const(value, width)
             else:
                 value = s.store[m.curr_module][cond]
 
@@ -850,51 +897,25 @@ class DepthFirst(Search):
                 else:
                     raise Exception
             else:
-                x = BitVec(s.store[m.curr_module][str(m.curr_case)], width)
+                x = to_bitvec(s.store[m.curr_module][str(m.curr_case)], width)
 
             if self.branch:
-                s.pc.push()
-                s.pc.add(x==y)
-                if not solve_pc(s.pc):
-                    s.pc.pop()
-                    #print("Abandoning infeasible path")
-                    m.abandon = True
-                    m.ignore = True
-                    return
-            else: 
-                s.pc.push()
-                s.pc.add(x != y)
-                if not solve_pc(s.pc):
-                    s.pc.pop()
-                    #print("Abandoning infeasible path")
-                    m.abandon = True
-                    m.ignore = True
-                    return
+                literal = x == y
+            else:
+                literal = x != y
+            if not self.take_branch(m, s, literal):
+                return
         elif isinstance(expr, Operator):
             #TODO Fix?
-            new_val = simpl_str_exp(evaluate(parse_tokens(tokenize(expr, s, m)),s,m), s, m)
-            x = BitVec(new_val, 1)
-            one = IntVal(1)
-            one_bv = Int2BV(one, 1)
+            new_val = simpl_str_exp(evaluate(compile_rvalue(expr, s, m),s,m), s, m)
+            x = to_bitvec(new_val, 1)
+            one_bv = bv_const(1, 1)
             if self.branch:
-                s.pc.push()
-                s.pc.add(x==one_bv)
-                if not solve_pc(s.pc):
-                    s.pc.pop()
-                    #print("Abandoning infeasible path")
-                    m.abandon = True
-                    m.ignore = True
-                    return
-            else: 
-                s.pc.push()
-                s.pc.add(x != one_bv)
-                if not solve_pc(s.pc):
-                    s.pc.pop()
-                    #print("Abandoning infeasible path")
-                    m.abandon = True
-                    m.ignore = True
-                    time.process_time()
-                    return
+                literal = x == one_bv
+            else:
+                literal = x != one_bv
+            if not self.take_branch(m, s, literal):
+                return
         elif isinstance(expr, Decl):
             #print("here")
             ...
@@ -0,0 +1,153 @@
+"""Shared helpers for the engine tests. The designs are preprocessed here instead of with
+pyverilog's preprocess, which needs iverilog, and every run happens in a fresh process since
+the engine and the search strategy keep state at class level."""
+
+import os
+import re
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DESIGNS = os.path.join(ROOT, "designs", "test-designs")
+sys.path.insert(0, ROOT)
+
+DEFINE_RE = re.compile(r"`define\s+(\w+)(?:\(([^)]*)\))?\s*(.*)")
+SKIPPED_DIRECTIVES = ("`timescale", "`default_nettype", "`include", "`ifdef", "`ifndef", "`else", "`endif")
+
+
+def macro_arguments(text: str, start: int):
+    """The comma separated arguments of a macro call whose "(" is at start, and the index after ")"."""
+    depth = 0
+    args = []
+    current = ""
+    for index in range(start, len(text)):
+        char = text[index]
+        if char == "(":
+            depth += 1
+            if depth == 1:
+                continue
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                args.append(current.strip())
+                return args, index + 1
+        elif char == "," and depth == 1:
+            args.append(current.strip())
+            current = ""
+            continue
+        current += char
+    raise ValueError("unterminated macro call")
+
+
+def preprocess(text: str) -> str:
+    """Expand `define macros (with or without arguments) and drop the directives the parser doesn't take."""
+    macros = {}
+    lines = text.split("\n")
+    out = []
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        stripped = line.strip()
+        if stripped.startswith("`define"):
+            while line.rstrip().endswith("\\"):
+                index += 1
+                line = line.rstrip()[:-1] + " " + lines[index]
+            match = DEFINE_RE.match(line.strip())
+            params = [p.strip() for p in match.group(2).split(",")] if match.group(2) is not None else None
+            macros[match.group(1)] = (params, match.group(3))
+            index += 1
+            continue
+        if stripped.startswith(SKIPPED_DIRECTIVES):
+            index += 1
+            continue
+        out.append(line)
+        index += 1
+    text = "\n".join(out)
+    for name, (params, body) in macros.items():
+        pattern = re.compile(r"`" + name + r"\b\s*")
+        while True:
+            match = pattern.search(text)
+            if match is None:
+                break
+            if params is None:
+                text = text[:match.start()] + body + text[match.end():]
+                continue
+            args, end = macro_arguments(text, match.end())
+            expansion = body
+            for param, arg in zip(params, args):
+                expansion = re.sub(r"\b" + re.escape(param) + r"\b", lambda _: arg, expansion)
+            text = text[:match.start()] + expansion + text[end:]
+    return text
+
+
+RUNNER = r'''
+import io, sys, json, contextlib
+sys.path.insert(0, sys.argv[1])
+sys.setrecursionlimit(100000)
+from pyverilog.vparser.parser import VerilogParser
+from engine.execution_engine import ExecutionEngine
+request = json.loads(sys.stdin.read())
+with contextlib.redirect_stdout(io.StringIO()) as output:
+    ast = VerilogParser(outputdir=request["outputdir"], debug=False).parse(request["text"])
+    description = ast.children()[0]
+    modules = description.definitions
+    top = next((d for d in modules if d.name == request["top"]), modules[0])
+    engine = ExecutionEngine()
+    for name, value in request["options"].items():
+        setattr(engine, name, value)
+    # the final store of every path, with its symbols renamed in order of appearance
+    states = {}
+    if request["record_states"]:
+        from engine.module_summary import AlphaRenaming
+        check_state = engine.check_state
+        def recording(manager, state):
+            if engine.done:
+                store = "\n".join(f"{module}.{signal} = {value}" for module, signals in state.store.items()
+                                  for signal, value in signals.items())
+                states[engine.path_index] = [manager.ignore or manager.abandon, AlphaRenaming().rename(store)]
+            check_state(manager, state)
+        engine.check_state = recording
+    engine.execute(top, modules, None, None, request["cycles"])
+print(json.dumps({"violations": [[i, None if c is None else {k: str(v) for k, v in c.items()}]
+                                 for i, c in engine.violations],
+                  "stats": getattr(engine, "stats", {}), "states": states, "output": output.getvalue()}))
+'''
+
+
+def run_design(source: str, cycles: int, top: str = None, record_states: bool = False, **options) -> dict:
+    """Symbolically execute a design (a file under designs/test-designs or Verilog text) in a
+    fresh process. Returns its violations as [path index, counterexample], stats and output,
+    and with record_states the final store of each path by path index (a string key)."""
+    path = os.path.join(DESIGNS, source)
+    if os.path.isfile(path):
+        with open(path) as f:
+            source = f.read()
+    outputdir = os.path.join(ROOT, ".pytest_cache", "ply")
+    os.makedirs(outputdir, exist_ok=True)
+    request = {"text": preprocess(source), "cycles": cycles, "top": top, "options": options, "outputdir": outputdir,
+               "record_states": record_states}
+    done = subprocess.run([sys.executable, "-c", RUNNER, ROOT], input=json.dumps(request), capture_output=True,
+                          text=True, cwd=ROOT, timeout=600)
+    if done.returncode != 0:
+        raise RuntimeError(done.stderr[-4000:])
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def parse_modules(source: str) -> list:
+    """The module definitions of a design (a file under designs/test-designs or Verilog text),
+    parsed in this process."""
+    from pyverilog.vparser.parser import VerilogParser
+    path = os.path.join(DESIGNS, source)
+    if os.path.isfile(path):
+        with open(path) as f:
+            source = f.read()
+    outputdir = os.path.join(ROOT, ".pytest_cache", "ply")
+    os.makedirs(outputdir, exist_ok=True)
+    return VerilogParser(outputdir=outputdir, debug=False).parse(preprocess(source)).children()[0].definitions
+
+
+def verdict(result: dict):
+    """Whether a run found a violation, and the index of the first path it was found on."""
+    violations = result["violations"]
+    return (bool(violations), violations[0][0] if violations else None)
@@ -0,0 +1,53 @@
+"""On-disk cache of parsed designs (helpers/ast_cache.py). pyverilog's parse needs iverilog to
+preprocess, so it is replaced by a stand-in that counts its calls."""
+
+import pytest
+import helpers.ast_cache as ast_cache
+from helpers.ast_cache import cache_key, cached_parse
+
+
+@pytest.fixture
+def design(tmp_path):
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "inc" / "defs.vh").write_text("`define WIDTH 4\n")
+    top = tmp_path / "top.v"
+    top.write_text('`include "defs.vh"\nmodule top(); endmodule\n')
+    return tmp_path, str(top), [str(tmp_path / "inc")]
+
+
+def test_key_covers_sources_includes_and_defines(design):
+    tmp_path, top, includes = design
+    key = cache_key([top], includes, [])
+    assert cache_key([top], includes, []) == key
+    assert cache_key([top], includes, ["SYNTHESIS"]) != key
+    (tmp_path / "inc" / "defs.vh").write_text("`define WIDTH 8\n")
+    assert cache_key([top], includes, []) != key
+    # an include that can't be found yet still counts by name
+    assert cache_key([top], [], []) != cache_key([top], includes, [])
+
+
+def test_parsed_designs_are_reused_until_a_source_changes(design, monkeypatch):
+    tmp_path, top, includes = design
+    calls = []
+
+    def parse(filelist, preprocess_include, preprocess_define):
+        calls.append(list(filelist))
+        return ("ast", len(calls)), {}
+
+    monkeypatch.setattr(ast_cache, "parse", parse)
+    cache_dir = str(tmp_path / "cache")
+    assert cached_parse([top], includes, [], cache_dir) == (("ast", 1), {})
+    assert cached_parse([top], includes, [], cache_dir) == (("ast", 1), {})
+    assert len(calls) == 1
+    (tmp_path / "top.v").write_text('`include "defs.vh"\nmodule top(input a); endmodule\n')
+    assert cached_parse([top], includes, [], cache_dir) == (("ast", 2), {})
+    assert cached_parse([top], includes, [], None) == (("ast", 3), {})
+
+
+def test_unreadable_entries_are_parsed_again(design, monkeypatch):
+    tmp_path, top, includes = design
+    monkeypatch.setattr(ast_cache, "parse", lambda *args, **kwargs: ("ast", {}))
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    (cache_dir / (cache_key([top], includes, []) + ".pickle")).write_bytes(b"not a pickle")
+    assert cached_parse([top], includes, [], str(cache_dir)) == ("ast", {})
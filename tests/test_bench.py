@@ -0,0 +1,44 @@
+"""The benchmark matrix (bench.py) and its comparison against a baseline."""
+
+import os
+from conftest import ROOT
+from bench import MATRIX, compare
+
+
+def result(**metrics) -> dict:
+    values = {"status": "ok", "wall_time": 2.0, "process_time": 2.0, "solver_time": 1.0, "cfg_time": 0.1,
+              "peak_rss_kb": 1000, "paths_explored": 10, "paths_pruned": 0, "violations": 0}
+    values.update(metrics)
+    return values
+
+
+def test_matrix_designs_are_bundled():
+    names = [entry[0] for entry in MATRIX]
+    assert len(names) == len(set(names))
+    for _, files, _, num_cycles in MATRIX:
+        assert num_cycles > 0
+        for path in files:
+            assert os.path.isfile(os.path.join(ROOT, path)), path
+
+
+def test_slowdowns_beyond_the_tolerance_are_regressions():
+    baseline = {"a": result()}
+    assert compare({"a": result(wall_time=2.3)}, baseline, 0.2) == []
+    assert compare({"a": result(wall_time=3.0)}, baseline, 0.2) == ["a: wall_time 2.00 -> 3.00"]
+
+
+def test_short_runs_are_too_noisy_to_compare():
+    assert compare({"a": result(cfg_time=0.4)}, {"a": result()}, 0.2) == []
+
+
+def test_changed_results_and_failures_are_regressions():
+    baseline = {"a": result(), "b": result()}
+    regressions = compare({"a": result(violations=1), "b": {"status": "timeout"}}, baseline, 0.2)
+    assert len(regressions) == 2
+    assert regressions[1] == "b: timeout (was ok)"
+
+
+def test_metrics_missing_from_the_baseline_are_skipped():
+    old = result()
+    del old["peak_rss_kb"]
+    assert compare({"a": result(peak_rss_kb=10 ** 6)}, {"a": old}, 0.2) == []
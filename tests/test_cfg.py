@@ -0,0 +1,208 @@
+"""CFGs built once per module definition (CFGCache), and the verdicts that depend on them."""
+
+import os
+import pickle
+import time
+import pytest
+from conftest import run_design, verdict, parse_modules
+from engine.cfg import CFG, CFGCache, FrozenCFG, build_block, module_blocks
+
+# two instances of one child module
+INSTANCES = """
+module top(clock, a, b);
+    input clock;
+    input a;
+    input b;
+    wire x;
+    wire y;
+    child first(.clock(clock), .a(a), .out(x));
+    child second(.clock(clock), .a(b), .out(y));
+endmodule
+
+module child(clock, a, out);
+    input clock;
+    input a;
+    output reg out;
+    always @(posedge clock) begin
+        if (a) out <= 1; else out <= 0;
+    end
+endmodule
+"""
+
+
+def test_cfgs_are_built_once_per_module_definition():
+    child = parse_modules(INSTANCES)[1]
+    cache = CFGCache()
+    cfgs = cache.module_cfgs(child.items, child.name, False)
+    assert cache.module_cfgs(child.items, child.name, False) is cfgs
+    assert [cfg.cfg_id for cfg in cfgs] == list(range(len(cfgs)))
+    assert all(isinstance(cfg, FrozenCFG) and cfg.module_name == "child" for cfg in cfgs)
+    with pytest.raises(AttributeError):
+        cfgs[0].cfg_id = 1
+
+
+def test_cfgs_are_reused_from_disk(tmp_path):
+    module = parse_modules("test.v")[0]
+    blocks = module_blocks(module.items, True)[0]
+    built = CFGCache(str(tmp_path)).block_cfg(blocks[0])
+    assert len(os.listdir(tmp_path)) == 1
+    # another run, with another AST of the same design
+    blocks = module_blocks(parse_modules("test.v")[0].items, True)[0]
+    loaded = CFGCache(str(tmp_path)).load(blocks[0])
+    assert loaded is not None
+    assert list(loaded.succ_targets) == list(built.succ_targets)
+    assert [type(stmt) for stmt in loaded.statements] == [type(stmt) for stmt in built.statements]
+
+
+def test_instances_share_their_module_cfgs():
+    for cycles in (1, 2):
+        result = run_design(INSTANCES, cycles)
+        assert verdict(result) == (False, None)
+        assert result["stats"]["paths_explored"] == 4 ** cycles
+
+
+@pytest.mark.parametrize("cycles", [1, 2])
+def test_mini_daio_assertion_holds(cycles):
+    # parity is reset to 0 by the first initial block, so `assert(parity, 0) in the second can't fail
+    result = run_design("mini_daio.v", cycles)
+    assert verdict(result) == (False, None)
+
+
+def test_case_inequality_assertion_fails_when_it_can():
+    design = """
+    module top(clock, a);
+        input clock;
+        input a;
+        reg r;
+        always @(posedge clock) begin
+            r = a;
+        end
+        initial begin
+            if (r !== 0) begin
+                $display("ASSERTION FAILED");
+                $finish;
+            end
+        end
+    endmodule
+    """
+    result = run_design(design, 1)
+    assert verdict(result)[0]
+
+
+def graph(compact) -> tuple:
+    return (list(compact.block_bounds), list(compact.succ_offsets), list(compact.succ_targets),
+            [type(stmt) for stmt in compact.statements])
+
+
+def test_cfg_objects_dont_share_state():
+    modules = parse_modules("mini_daio.v")
+    blocks = [block for module in modules for block in module_blocks(module.items, True)[0]]
+    alone = [graph(build_block(block)) for block in blocks]
+    # building the CFGs again, in reverse, gives the same result
+    assert [graph(build_block(block)) for block in reversed(blocks)] == alone[::-1]
+    first, second = CFG(), CFG()
+    first.get_always(None, None, modules[0].items)
+    assert second.always_blocks == [] and second.decls == [] and second.comb == []
+
+
+def test_prebuilt_cfgs_match_the_ones_built_on_demand():
+    modules = parse_modules("mini_daio.v")
+    blocks = [block for module in modules for block in module_blocks(module.items, True)[0]]
+    assert len(blocks) >= 2
+    on_demand = [graph(CFGCache().block_cfg(block)) for block in blocks]
+    cache = CFGCache()
+    cache.prebuild(modules, 2)
+    assert all(id(block) in cache.blocks for block in blocks)
+    assert [graph(cache.block_cfg(block)) for block in blocks] == on_demand
+
+
+def sequential_branches(n: int) -> str:
+    body = "\n".join(f"        if (a[{i}]) x <= {i}; else x <= {i + 1};" for i in range(n))
+    return f"""
+module top(clock, a);
+    input clock;
+    input [{n}:0] a;
+    reg [9:0] x;
+    always @(posedge clock) begin
+{body}
+    end
+endmodule
+"""
+
+
+def test_blocks_partition_the_statements():
+    block = module_blocks(parse_modules(sequential_branches(5))[0].items, True)[0][0]
+    compact = build_block(block)
+    assert compact.num_blocks == 15
+    covered = []
+    for block_idx in range(compact.num_blocks):
+        start, stop = compact.block_bounds[2 * block_idx], compact.block_bounds[2 * block_idx + 1]
+        covered += range(start, stop)
+    assert covered == list(range(len(compact.statements)))
+    for path in compact.paths:
+        assert path[0] == -1 and path[-1] == -2
+
+
+def test_cfg_construction_scales_linearly():
+    # 1200 basic blocks, a quadratic construction would take far longer
+    block = module_blocks(parse_modules(sequential_branches(400))[0].items, True)[0][0]
+    start = time.perf_counter()
+    compact = build_block(block)
+    assert time.perf_counter() - start < 2
+    assert compact.num_blocks == 1200
+
+
+def built_cfgs(source) -> list:
+    """The CFG (and so its CompactCFG) of every always/initial block in a design."""
+    cfgs = []
+    for module in parse_modules(source):
+        for block in module_blocks(module.items, True)[0]:
+            cfg = CFG()
+            cfg.basic_blocks(None, None, block)
+            cfg.partition()
+            cfg.build_cfg(None, None)
+            cfgs.append(cfg)
+    return cfgs
+
+
+@pytest.mark.parametrize("source", ["mini_daio.v", "test.v", sequential_branches(3)])
+def test_compact_cfg_matches_the_basic_blocks_and_directions(source):
+    for cfg in built_cfgs(source):
+        compact = cfg.compact
+        for block_idx, basic_block in enumerate(cfg.basic_block_list):
+            assert list(compact.basic_block(block_idx)) == basic_block
+        for path in compact.paths:
+            assert compact.compute_direction(path) == cfg.compute_direction(path)
+        with pytest.raises(KeyError):
+            compact.direction(-2, -1)
+
+
+def test_compact_cfg_pickles_to_the_same_graph():
+    for cfg in built_cfgs("mini_daio.v"):
+        copy = pickle.loads(pickle.dumps(cfg.compact))
+        assert graph(copy) == graph(cfg.compact)
+        assert list(copy.edge_directions) == list(cfg.compact.edge_directions)
+        assert list(copy.paths) == list(cfg.compact.paths)
+
+
+def test_descriptors_follow_their_paths():
+    module = parse_modules("mini_daio.v")[0]
+    for cfg in CFGCache().module_cfgs(module.items, module.name, True):
+        for path_idx, path in enumerate(cfg.paths):
+            descriptor = cfg.descriptor(path_idx)
+            assert descriptor.cfg_id == cfg.cfg_id and descriptor.path == path
+            real = [block_idx for block_idx in path if block_idx >= 0]
+            assert [block[:2] for block in descriptor.blocks] == list(zip(range(1, len(real) + 1), real))
+            assert [block[2] for block in descriptor.blocks] == [cfg.basic_block(idx) for idx in real]
+            assert [block[3] for block in descriptor.blocks] == cfg.graph.compute_direction(path)
+            assert cfg.descriptor(path_idx) is descriptor
+
+
+def test_descriptor_table_is_bounded(monkeypatch):
+    monkeypatch.setattr("engine.cfg.DESCRIPTOR_CACHE_SIZE", 2)
+    module = parse_modules(sequential_branches(3))[0]
+    cfg = CFGCache().module_cfgs(module.items, module.name, True)[0]
+    assert len(cfg.paths) > 2
+    for path_idx in range(len(cfg.paths)):
+        cfg.descriptor(path_idx)
+        assert len(cfg.descriptors) <= 2
@@ -0,0 +1,74 @@
+"""Cone of influence slicing (ConeOfInfluence) and the verdicts of sliced runs."""
+
+import pytest
+from conftest import run_design, verdict, parse_modules
+from pyverilog.vparser.ast import Always, IfStatement
+from engine.coi import ConeOfInfluence
+
+# x is asserted on, y and z never reach the assertion
+UNRELATED = """
+module top(clock, a, b);
+    input clock;
+    input a;
+    input b;
+    reg x;
+    reg y;
+    reg z;
+    always @(posedge clock) begin
+        if (a) x <= 1; else x <= 0;
+        if (b) y <= 1; else y <= 0;
+    end
+    always @(posedge clock) begin
+        if (b) z <= 1; else z <= 0;
+    end
+    always @(posedge clock) begin
+        if (x == 1) begin
+            $display("ASSERTION FAILED");
+            $finish;
+        end
+    end
+endmodule
+"""
+
+
+def test_the_cone_holds_what_the_assertion_reads():
+    cone = ConeOfInfluence(parse_modules(UNRELATED))
+    assert cone.enabled
+    assert {("top", "x"), ("top", "a")} <= cone.cone
+    assert not {("top", "y"), ("top", "z"), ("top", "b")} & cone.cone
+    # b is still read by a branch condition
+    assert ("top", "b") in cone.observed
+
+
+def test_writes_outside_the_cone_are_sliced_away():
+    module = parse_modules(UNRELATED)[0]
+    cone = ConeOfInfluence([module])
+    blocks = [item for item in module.items if isinstance(item, Always)]
+    sliced = cone.slice_blocks(module.name, blocks)
+    assert len(sliced) == 2 and sliced[1] is blocks[2]
+    branches = sliced[0].statement.statements
+    assert len(branches) == 1 and isinstance(branches[0], IfStatement)
+    assert branches[0].true_statement.left.var.name == "x"
+    # sliced into the same node every time
+    assert cone.slice_blocks(module.name, blocks) == sliced
+
+
+def test_designs_without_assertions_are_left_alone():
+    module = parse_modules(UNRELATED.replace("$display(\"ASSERTION FAILED\");", "").replace("$finish;", ""))[0]
+    cone = ConeOfInfluence([module])
+    blocks = [item for item in module.items if isinstance(item, Always)]
+    assert not cone.enabled
+    assert cone.slice_blocks(module.name, blocks) is blocks
+
+
+def test_slicing_drops_paths_but_not_the_violation():
+    sliced = run_design(UNRELATED, 2, coi=True)
+    full = run_design(UNRELATED, 2)
+    assert verdict(sliced)[0] and verdict(full)[0]
+    assert sliced["stats"]["paths_explored"] < full["stats"]["paths_explored"]
+
+
+@pytest.mark.parametrize("design", ["mini_daio.v", "updowncounter.v", "test.v", "demo2.v", "test_3.v"])
+@pytest.mark.parametrize("cycles", [1, 2])
+def test_sliced_and_full_runs_agree(design, cycles):
+    assert verdict(run_design(design, cycles, coi=True))[0] == verdict(run_design(design, cycles))[0]
@@ -0,0 +1,77 @@
+"""Hash-consed store expressions (Expr, ModuleStore)."""
+
+import copy
+import pickle
+from engine.expr import Expr, ModuleStore, intern_expr, to_bitvec, bv_const
+
+SYMBOL = "XpLq0aVn6kR2cW9z"
+
+
+def test_equal_text_is_one_node():
+    first = intern_expr(f"{SYMBOL} + 1")
+    assert type(first) is Expr
+    assert intern_expr("".join([SYMBOL, " + 1"])) is first
+    assert copy.copy(first) is first and copy.deepcopy(first) is first
+    assert pickle.loads(pickle.dumps(first)) is first
+
+
+def test_non_strings_pass_through():
+    concat = {"a": "1"}
+    assert intern_expr(3) == 3
+    assert intern_expr(concat) is concat
+
+
+def test_derived_facts():
+    assert intern_expr("12").kind == "const"
+    assert intern_expr(SYMBOL).kind == "symbol"
+    assert intern_expr(f"If({SYMBOL}, 1, 0)").kind == "ite"
+    select = intern_expr(f"{SYMBOL}[3]")
+    assert select.kind == "select"
+    assert select.base is intern_expr(SYMBOL)
+    assert intern_expr(f"{SYMBOL} & 1").kind == "op"
+    assert intern_expr(f"{SYMBOL} + Tb4mNs8eJd1yHf7u").symbols == {SYMBOL, "Tb4mNs8eJd1yHf7u"}
+
+
+def test_z3_terms_are_built_once_per_width():
+    expr = intern_expr(SYMBOL)
+    assert expr.bitvec(8) is expr.bitvec(8)
+    assert expr.bitvec(8).size() == 8 and expr.bitvec(16).size() == 16
+    assert to_bitvec(expr, 8) is expr.bitvec(8)
+    assert to_bitvec("plain", 4) is to_bitvec("plain", 4)
+    assert bv_const(5, 8) is bv_const(5, 8)
+
+
+def test_module_store_interns_its_values():
+    store = ModuleStore()
+    store["a"] = f"{SYMBOL} + 1"
+    store.setdefault("b", SYMBOL)
+    store.update(c="0")
+    for value in store.values():
+        assert type(value) is Expr
+    snapshot = store.copy()
+    assert type(snapshot) is ModuleStore and snapshot == store
+    snapshot["a"] = "1"
+    assert store["a"] == f"{SYMBOL} + 1"
+    assert store["a"] is intern_expr(f"{SYMBOL} + 1")
+
+
+def test_nodes_decompose_into_shared_subterms():
+    other = "Tb4mNs8eJd1yHf7u"
+    sum_ = intern_expr(f"{SYMBOL} + 1")
+    chain = intern_expr(f"{SYMBOL} + 1 + {other}")
+    assert (chain.op, chain.children) == ("+", (sum_, other))
+    assert chain.children[0] is sum_ and chain.children[1] is intern_expr(other)
+    ite = intern_expr(f"If({SYMBOL} + 1, {other}[3], (& {SYMBOL} 1))")
+    cond, true, false = ite.children
+    assert ite.op == "If" and cond is sum_
+    assert (true.kind, true.op, true.base) == ("select", "[]", intern_expr(other))
+    assert (false.op, false.children) == ("&", (intern_expr(SYMBOL), intern_expr("1")))
+    assert ite.symbols == {SYMBOL, other}
+    assert intern_expr(f"~ {SYMBOL}").children == (intern_expr(SYMBOL),)
+    # leaves, and text that doesn't decompose, have no children
+    assert intern_expr(SYMBOL).children == () and intern_expr("12").op is None
+    assert intern_expr(f"If({SYMBOL}), 1, 0)").children == ()
+
+
+def test_symbols_are_whole_names():
+    assert intern_expr(f"{SYMBOL}0 + 1").symbols == frozenset()
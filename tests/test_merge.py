@@ -0,0 +1,80 @@
+"""Branch merging (BranchMerger, DepthFirst.visit_merged_if) and the verdicts of merged runs."""
+
+import pytest
+from conftest import run_design, verdict, parse_modules
+from pyverilog.vparser.ast import Always
+from engine.coi import ConeOfInfluence
+from engine.merge import BranchMerger, MergedIfStatement
+from engine.execution_manager import ExecutionManager
+from engine.symbolic_state import SymbolicState
+from engine.expr import ModuleStore
+from strategies.dfs import DepthFirst
+
+NESTED = """
+module top(clock, a, b);
+    input clock;
+    input a;
+    input b;
+    reg [1:0] x;
+    always @(posedge clock) begin
+        if (a) x <= 0; else if (b) x <= 1; else x <= 2;
+    end
+endmodule
+"""
+
+# the same branch, but x is read by an assertion
+ASSERTED = NESTED.replace("endmodule", """
+    always @(posedge clock) begin
+        if (x == 2) begin
+            $display("ASSERTION FAILED");
+            $finish;
+        end
+    end
+endmodule""")
+
+
+def merged_branch(modules):
+    module = modules[0]
+    always = [item for item in module.items if isinstance(item, Always)][0]
+    merger = BranchMerger(ConeOfInfluence(modules).observed)
+    statement = merger.merge_blocks(module.name, [always])[0].statement
+    return statement.statements[0]
+
+
+def test_nested_branches_are_joined_into_nested_ites():
+    stmt = merged_branch(parse_modules(NESTED))
+    assert isinstance(stmt, MergedIfStatement)
+    m = ExecutionManager()
+    m.curr_module = "top"
+    s = SymbolicState()
+    s.store = {"top": ModuleStore({"clock": "C", "a": "A", "b": "B", "x": "X"})}
+    DepthFirst().visit_merged_if(m, s, stmt, None)
+    assert s.store["top"]["x"] == "If(A, 0, If(B, 1, 2))"
+
+
+def test_comparison_conditions_are_kept_whole():
+    source = NESTED.replace("if (a) x <= 0; else if (b) x <= 1; else x <= 2;", "if (a == 2) x <= 0; else x <= 1;")
+    stmt = merged_branch(parse_modules(source.replace("input a;", "input [1:0] a;")))
+    assert isinstance(stmt, MergedIfStatement)
+    m = ExecutionManager()
+    m.curr_module = "top"
+    s = SymbolicState()
+    s.store = {"top": ModuleStore({"clock": "C", "a": "A", "b": "B", "x": "X"})}
+    DepthFirst().visit_merged_if(m, s, stmt, None)
+    assert s.store["top"]["x"] == "If(A == 2, 0, 1)"
+
+
+def test_signals_read_by_assertions_are_not_merged():
+    stmt = merged_branch(parse_modules(ASSERTED))
+    assert not isinstance(stmt, MergedIfStatement)
+
+
+@pytest.mark.parametrize("design", ["mini_daio.v", "updowncounter.v", "test.v", "demo2.v", "test_3.v"])
+@pytest.mark.parametrize("cycles", [1, 2])
+def test_merged_and_forked_runs_agree(design, cycles):
+    assert verdict(run_design(design, cycles, merge=True))[0] == verdict(run_design(design, cycles))[0]
+
+
+def test_merged_run_still_finds_violation_on_merged_signal():
+    assert verdict(run_design(ASSERTED, 2, merge=True))[0]
+    assert verdict(run_design(ASSERTED, 2))[0]
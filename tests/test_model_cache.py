@@ -0,0 +1,52 @@
+"""Model cache (ModelCache): answering feasibility checks from earlier models and unsat sets."""
+
+from conftest import run_design, verdict
+from z3 import Solver, Int, sat
+from engine.model_cache import ModelCache
+from engine.execution_engine import ExecutionEngine
+
+
+def model_of(*assertions):
+    solver = Solver()
+    solver.add(*assertions)
+    assert solver.check() == sat
+    return solver.model()
+
+
+def test_a_model_answers_the_queries_it_satisfies():
+    x, y = Int("x"), Int("y")
+    cache = ModelCache(4)
+    cache.remember_model(model_of(x == 3, y == 1))
+    assert cache.lookup([x > 2, y < 2])
+    assert cache.lookup([x > 3]) is None
+    assert (cache.sat_hits, cache.misses) == (1, 1)
+
+
+def test_supersets_of_unsat_sets_are_unsat():
+    x, y = Int("x"), Int("y")
+    low, high, other = x < 1, x > 1, y == 0
+    cache = ModelCache(4)
+    cache.remember_unsat([low, high])
+    assert cache.lookup([other, high, low]) is False
+    assert cache.lookup([other, high]) is None
+    assert cache.unsat_hits == 1
+
+
+def test_only_the_most_recent_models_are_kept():
+    x = Int("x")
+    cache = ModelCache(2)
+    for value in range(3):
+        cache.remember_model(model_of(x == value))
+    assert cache.lookup([x == 0]) is None
+    assert cache.lookup([x == 1])
+    assert cache.lookup([x == 2])
+
+
+def test_the_cache_is_opt_in():
+    assert ExecutionEngine.model_cache_size == 0
+
+
+def test_runs_with_models_agree_with_runs_without():
+    for design in ("mini_daio.v", "updowncounter.v"):
+        with_models = run_design(design, 2, model_cache_size=32)
+        assert verdict(with_models) == verdict(run_design(design, 2))
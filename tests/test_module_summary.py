@@ -0,0 +1,163 @@
+"""Summaries of the CFG paths of child module instances (StepEffect, SummaryCache) and the
+verdicts of runs that apply them."""
+
+import pytest
+from z3 import BitVec, Not
+from conftest import run_design, verdict
+from engine.execution_manager import ExecutionManager
+from engine.symbolic_state import SymbolicState
+from engine.module_summary import (AlphaRenaming, ModuleSummary, StepEffect, StepSnapshot, SummaryCache, Templates,
+                                   changes, instantiate, SELF, SYMBOL_TOKEN_RE)
+
+A, B, C = "Aaaaaaaaaaaaaaa1", "Bbbbbbbbbbbbbbb2", "Ccccccccccccccc3"
+X, Y = "Xxxxxxxxxxxxxxx4", "Yyyyyyyyyyyyyyy5"
+FRESH = "Fffffffffffffff6"
+
+# the child's CFG path runs again after each path of top's always block, from the same state
+INSTANCES = """
+module top(clock, a, b);
+    input clock;
+    input a;
+    input b;
+    reg mode;
+    wire x;
+    child first(.clock(clock), .a(a), .out(x));
+    always @(posedge clock) begin
+        if (b) mode <= 1; else mode <= 0;
+    end
+endmodule
+
+module child(clock, a, out);
+    input clock;
+    input a;
+    output reg out;
+    always @(posedge clock) begin
+        if (a) out <= 1; else out <= 0;
+    end
+endmodule
+"""
+
+
+def test_symbols_are_renamed_in_order_of_appearance():
+    renaming = AlphaRenaming()
+    assert renaming.rename(f"({B} + {A}) & {B}") == "(%i0% + %i1%) & %i0%"
+    assert renaming.symbols == [B, A]
+    # longer names aren't symbols
+    assert renaming.rename(f"{A}0") == f"{A}0"
+
+
+def test_templates_tell_inputs_from_fresh_symbols():
+    renaming = AlphaRenaming()
+    renaming.canonical(f"{A} + {B}")
+    templates = Templates(renaming, {A, B, C})
+    assert templates.template(f"If({A}, {FRESH}, {B})") == "If(%i0%, %f0%, %i1%)"
+    assert not templates.unsound
+    assert instantiate("If(%i0%, %f0%, %i1%)", [X, Y], [C]) == f"If({X}, {C}, {Y})"
+    # a symbol that was around but isn't in the key was read from outside it
+    templates.template(C)
+    assert templates.unsound
+
+
+def test_changes_are_nested_writes():
+    before = {"child_1": {"out": A}, "top": {"x": B}}
+    after = {"child_1": {"out": B, "new": C}, "top": {"x": B}}
+    assert changes(before, after, 2) == [(("child_1", "out"), B), (("child_1", "new"), C)]
+    assert changes(after, before, 2) is None
+
+
+def step_state(a: str, out: str):
+    m = ExecutionManager()
+    m.curr_module = "child_1"
+    m.cond_assigns = {"child_1": {}}
+    m.dependencies = {"child_1": {}}
+    s = SymbolicState()
+    s.store = {"top": {"x": out}, "child_1": {"a": a, "out": out}}
+    return m, s
+
+
+def test_a_step_replays_over_other_inputs():
+    m, s = step_state(A, B)
+    key, renaming = SummaryCache().key("child", (1, 0, ()), m, s, "child_1")
+    before = StepSnapshot(m, s)
+    literal = BitVec(A, 32) == 1
+    s.pc.push()
+    s.pc.add_literal(literal)
+    s.store["child_1"]["out"] = f"If({A}, {FRESH}, {B})"
+    m.cond_assigns["child_1"]["out"] = A
+    templates = Templates(renaming, {A, B})
+    effect = StepEffect.record(before, m, s, "child_1", [literal], templates)
+    assert effect.writes == (("out", "If(%i0%, %f0%, %i1%)"),)
+    assert effect.dict_writes == (("cond_assigns", (SELF, "out"), "%i0%"),)
+
+    m, s = step_state(X, Y)
+    other, renaming = SummaryCache().key("child", (1, 0, ()), m, s, "child_1")
+    assert other == key and renaming.symbols == [X, Y]
+    taken = []
+    def take_branch(m, s, literal):
+        taken.append(literal)
+        return True
+    assert effect.apply(m, s, "child_1", renaming.symbols, [C], take_branch)
+    assert s.store["child_1"]["out"] == f"If({X}, {C}, {Y})"
+    assert m.cond_assigns["child_1"]["out"] == X
+    assert [str(literal) for literal in taken] == [f"{X} == 1"]
+
+
+def test_a_failed_branch_stops_the_replay():
+    m, s = step_state(A, B)
+    _, renaming = SummaryCache().key("child", (1, 0, ()), m, s, "child_1")
+    before = StepSnapshot(m, s)
+    literal = Not(BitVec(A, 32) == 1)
+    s.store["child_1"]["out"] = C
+    effect = StepEffect.record(before, m, s, "child_1", [literal], Templates(renaming, {A, B}))
+    m, s = step_state(X, Y)
+    assert not effect.apply(m, s, "child_1", [X, Y], [], lambda m, s, literal: False)
+    assert s.store["child_1"]["out"] == Y
+
+
+def test_writes_to_other_stores_are_not_summarized():
+    m, s = step_state(A, B)
+    _, renaming = SummaryCache().key("child", (1, 0, ()), m, s, "child_1")
+    before = StepSnapshot(m, s)
+    s.store["top"]["x"] = C
+    assert StepEffect.record(before, m, s, "child_1", [], Templates(renaming, {A, B})) is None
+
+
+def test_keys_are_equal_up_to_renaming():
+    cache = SummaryCache()
+    key, renaming = cache.key("child", (1, 0, ()), *step_state(A, B), "child_1")
+    assert renaming.symbols == [A, B]
+    # a and out bound to the same symbol is another input state
+    other, _ = cache.key("child", (1, 0, ()), *step_state(X, X), "child_1")
+    assert other != key
+    # and so is another instance of the module reading another parent
+    elsewhere, _ = cache.key("child", (2, 0, ()), *step_state(X, Y), "child_1")
+    assert elsewhere != key
+
+
+def test_least_recently_used_summaries_are_evicted():
+    cache = SummaryCache(2)
+    for key in ("first", "second"):
+        cache.put(key, ModuleSummary((), 0))
+    assert cache.get("first") is not None
+    cache.put("third", ModuleSummary((), 0))
+    assert cache.get("second") is None and cache.get("first") is not None
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 1, 1)
+
+
+def test_fresh_symbols_are_new():
+    fresh = ModuleSummary((), 2).fresh_symbols()
+    assert len(set(fresh)) == 2 and all(SYMBOL_TOKEN_RE.fullmatch(symbol) for symbol in fresh)
+
+
+def test_summaries_are_off_by_default():
+    result = run_design(INSTANCES, 2)
+    assert not "summary_hits" in result["stats"]
+
+
+@pytest.mark.parametrize("design, cycles", [(INSTANCES, 2), (INSTANCES, 3)])
+def test_runs_with_summaries_agree_with_runs_without(design, cycles):
+    summarized = run_design(design, cycles, record_states=True, summary_cache_size=1024)
+    executed = run_design(design, cycles, record_states=True)
+    assert summarized["stats"]["summary_hits"] > 0
+    assert verdict(summarized) == verdict(executed)
+    assert summarized["states"] == executed["states"]
@@ -0,0 +1,34 @@
+"""Exploring the path space in worker processes (--jobs) reports what a serial run reports."""
+
+import pytest
+from conftest import run_design, verdict
+
+# violations on most paths, found by every worker
+MANY_VIOLATIONS = """
+    module top(clock, a, b);
+        input clock;
+        input a;
+        input b;
+        reg r;
+        always @(posedge clock) begin
+            if (a) begin
+                r <= 1;
+            end else begin
+                if (b) begin
+                    r <= 0;
+                end else begin
+                    $display("ASSERTION FAILED");
+                    $finish;
+                end
+            end
+        end
+    endmodule
+"""
+
+
+@pytest.mark.parametrize("design, cycles", [("updowncounter.v", 3), ("test.v", 2), (MANY_VIOLATIONS, 2)])
+def test_parallel_run_reports_the_first_violation(design, cycles):
+    serial = run_design(design, cycles)
+    parallel = run_design(design, cycles, jobs=2)
+    assert verdict(parallel) == verdict(serial)
+    assert len(parallel["violations"]) == len(serial["violations"])
@@ -0,0 +1,79 @@
+"""Path counting and unranking over a CFG (PathOracle), against listing every path."""
+
+import random
+import pickle
+import networkx as nx
+import pytest
+from engine.path_oracle import PathOracle, path_count, START, END
+
+
+def oracle(num_blocks: int, edges) -> PathOracle:
+    """A PathOracle over the given edges, successors in the order given."""
+    successors = {}
+    for start, end in edges:
+        successors.setdefault(start, []).append(end)
+    offsets, targets = [0], []
+    for slot in range(num_blocks + 2):
+        node = slot if slot < num_blocks else num_blocks - 1 - slot
+        targets += successors.get(node, [])
+        offsets.append(len(targets))
+    return PathOracle(offsets, targets, num_blocks)
+
+
+def random_dag(rng: random.Random, num_blocks: int) -> list:
+    """Edges of a DAG over blocks 0..n-1 in topological order, from the start and to the end."""
+    edges = [(START, 0)]
+    for node in range(num_blocks):
+        later = list(range(node + 1, num_blocks)) + [END]
+        edges += [(node, succ) for succ in rng.sample(later, min(len(later), rng.randint(1, 3)))]
+    return edges
+
+
+def all_paths(edges) -> list:
+    graph = nx.DiGraph()
+    graph.add_edges_from(edges)
+    return [tuple(path) for path in nx.all_simple_paths(graph, START, END)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_unranking_matches_brute_force(seed):
+    rng = random.Random(seed)
+    num_blocks = rng.randint(1, 12)
+    edges = random_dag(rng, num_blocks)
+    paths = oracle(num_blocks, edges)
+    expected = all_paths(edges)
+    assert len(paths) == path_count(paths) == len(expected)
+    assert sorted(paths) == sorted(expected)
+    assert [paths[index] for index in range(len(paths))] == list(paths)
+    assert paths[-1] == list(paths)[-1]
+
+
+def test_the_order_follows_the_successors():
+    paths = oracle(3, [(START, 0), (0, 1), (0, 2), (1, END), (2, END)])
+    assert list(paths) == [(START, 0, 1, END), (START, 0, 2, END)]
+    with pytest.raises(IndexError):
+        paths[2]
+
+
+def test_many_paths_are_counted_without_listing_them():
+    # 2 ** 60 paths through 60 diamonds
+    edges = [(START, 0)]
+    for diamond in range(60):
+        top = 3 * diamond
+        edges += [(top, top + 1), (top, top + 2), (top + 1, top + 3), (top + 2, top + 3)]
+    edges.append((180, END))
+    paths = oracle(181, edges)
+    assert len(paths) == 2 ** 60
+    last = paths[2 ** 60 - 1]
+    assert all(node % 3 != 1 for node in last if node > 0)
+
+
+def test_cycles_fall_back_to_simple_paths():
+    edges = [(START, 0), (0, 1), (1, 0), (1, END)]
+    paths = oracle(2, edges)
+    assert list(paths) == all_paths(edges)
+
+
+def test_pickling_keeps_the_paths():
+    paths = oracle(3, [(START, 0), (0, 1), (0, 2), (1, END), (2, END)])
+    assert list(pickle.loads(pickle.dumps(paths))) == list(paths)
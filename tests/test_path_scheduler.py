@@ -0,0 +1,55 @@
+"""Lazy enumeration of the path space (PathScheduler)."""
+
+import itertools
+from engine.path_scheduler import PathScheduler
+
+# module -> cfg -> its paths, any sequences will do
+MAPPED_PATHS = {"top": {0: ["a", "b", "c"], 1: ["d", "e"]}, "child": {0: ["f", "g"]}}
+
+
+def test_paths_come_in_product_order():
+    scheduler = PathScheduler(MAPPED_PATHS, 2)
+    per_cycle = [MAPPED_PATHS["top"][0], MAPPED_PATHS["top"][1]] * 2 + [MAPPED_PATHS["child"][0]] * 2
+    expected = list(itertools.product(*per_cycle))
+    assert len(scheduler) == len(expected) == 144
+    for (index, path), combination in itertools.zip_longest(scheduler.iterate(), expected):
+        assert path == {"top": (combination[0:2], combination[2:4]), "child": (combination[4:5], combination[5:6])}
+        assert scheduler.path_at(index) == path
+
+
+def test_ranking_inverts_unranking():
+    scheduler = PathScheduler(MAPPED_PATHS, 3)
+    for index in range(scheduler.total):
+        assert scheduler.index_of(scheduler.digits_at(index)) == index
+
+
+def test_ranges_and_resuming():
+    scheduler = PathScheduler(MAPPED_PATHS, 2)
+    assert [index for index, _ in scheduler.iterate_digits(10, 15)] == list(range(10, 15))
+    assert list(scheduler.iterate_digits(20, 20)) == []
+    seen = []
+    for index, digits in scheduler.iterate_digits():
+        seen.append(index)
+        if index == 3:
+            # skip the rest of the subtree sharing the first two digits
+            scheduler.resume_at = scheduler.subtree_end(digits, 2)
+    assert seen[:5] == [0, 1, 2, 3, 24]
+
+
+def test_partition_covers_the_paths_in_prefix_aligned_ranges():
+    scheduler = PathScheduler(MAPPED_PATHS, 2)
+    ranges = scheduler.partition(8)
+    assert len(ranges) >= 8
+    assert ranges[0][0] == 0 and ranges[-1][1] == scheduler.total
+    for (_, stop), (start, _) in zip(ranges, ranges[1:]):
+        assert stop == start
+    for start, stop in ranges:
+        first, last = scheduler.digits_at(start), scheduler.digits_at(stop - 1)
+        assert first[:2] == last[:2]
+
+
+def test_prefix_lengths():
+    scheduler = PathScheduler(MAPPED_PATHS, 2)
+    assert scheduler.prefix_length("top", 0) == 2
+    assert scheduler.prefix_length("top", 1) == 4
+    assert scheduler.prefix_length("child", 1) == 6
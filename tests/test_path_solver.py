@@ -0,0 +1,182 @@
+"""The path condition solver (PathSolver)."""
+
+import pytest
+from conftest import run_design, verdict
+from z3 import BitVecs, Int, And, UGT, ULT
+from engine.path_solver import PathSolver
+from engine.expr import intern_expr, bv_const
+
+
+def test_asserted_literals_are_known_until_their_scope_is_popped():
+    solver = PathSolver()
+    x = intern_expr("XpLq0aVn6kR2cW9z").bitvec(4)
+    # the same term from the caches is the same literal
+    literal, again = x == bv_const(1, 4), intern_expr("XpLq0aVn6kR2cW9z").bitvec(4) == bv_const(1, 4)
+    solver.push()
+    assert not solver.implies(literal)
+    solver.add_literal(literal)
+    solver.push()
+    assert solver.implies(again)
+    assert solver.hits == 1
+    solver.pop(2)
+    assert not solver.implies(literal)
+    assert len(solver.assertions()) == 0
+
+
+def hard_literal():
+    """Factoring a 64 bit number, which z3 can't do within a millisecond."""
+    x, y = BitVecs("x y", 64)
+    return And(x * y == 0xFFFFFFFB00000019, UGT(x, 1), UGT(y, 1), ULT(x, 2 ** 32), ULT(y, 2 ** 32))
+
+
+@pytest.mark.parametrize("policy, feasible, deferred", [("sat", True, False), ("unsat", False, False),
+                                                        ("retry", False, True)])
+def test_unknown_policies(policy, feasible, deferred):
+    solver = PathSolver()
+    solver.timeout = 1
+    solver.unknown_policy = policy
+    solver.push()
+    solver.add_literal(hard_literal())
+    assert solver.feasible() == feasible
+    assert solver.unknowns == 1
+    assert solver.deferred == deferred
+
+
+def test_unknown_taken_as_sat_is_not_a_satisfiable_prefix():
+    solver = PathSolver()
+    solver.timeout = 1
+    solver.push()
+    solver.add_literal(hard_literal())
+    assert solver.feasible()
+    assert solver.sat_prefix == 0
+    # so the next check can't be sliced down to the new, independent literal
+    solver.push()
+    solver.add_literal(Int("z") > 0)
+    solver.feasible()
+    assert solver.sliced_checks == 0
+
+
+def take(solver: PathSolver, decision, literal) -> bool:
+    """Take a branch the way DepthFirst.take_branch does, learning a conflict if it's infeasible."""
+    solver.decision = decision
+    solver.push()
+    if solver.blocked(literal):
+        solver.pop()
+        return False
+    solver.add_literal(literal)
+    if not solver.feasible():
+        solver.learn_conflict()
+        solver.pop()
+        return False
+    return True
+
+
+def test_conflicts_are_learned_over_the_decisions_in_the_core():
+    solver = PathSolver()
+    x, y = Int("x"), Int("y")
+    assert take(solver, "first", x > 5)
+    assert take(solver, "second", y == 1)
+    assert not take(solver, "third", x < 3)
+    assert len(solver.cube_literals) == 1
+    literals, decisions = solver.cube_literals[0]
+    assert sorted(decisions) == ["first", "third"]
+    assert solver.conflict_hits == 0
+    # another path with the same decisions in between is blocked without the solver
+    solver.pop()
+    assert take(solver, "second", y == 2)
+    assert solver.blocked(x < 3)
+    assert solver.conflict_hits == 1
+    # but not one without the first decision
+    solver.pop(2)
+    assert not solver.blocked(x < 3)
+
+
+def test_no_conflict_is_learned_from_constraints_other_than_branches():
+    solver = PathSolver()
+    x = Int("x")
+    solver.push()
+    solver.add(x > 5)
+    solver.push()
+    solver.add_literal(x < 3)
+    assert not solver.feasible()
+    assert solver.learn_conflict() is None
+    assert solver.cubes == {}
+
+
+def test_learned_conflicts_prune_the_same_paths_as_the_solver():
+    shared = run_design("test.v", 2, record_states=True)
+    assert shared["stats"]["conflict_hits"] > 0
+    for index, (ignored, _) in shared["states"].items():
+        fresh = run_design("test.v", 2, record_states=True, start_path=int(index), stop_path=int(index) + 1)
+        assert fresh["states"][index][0] == ignored
+
+
+def test_independent_groups_follow_shared_symbols():
+    solver = PathSolver()
+    x, y, z, w = Int("x"), Int("y"), Int("z"), Int("w")
+    solver.add(x > 0, z > 0, y == x, w > z, y < 10)
+    assert solver.independent_group(4) == [0, 2, 4]
+    assert solver.independent_group(3) == [1, 3]
+    solver.push()
+    solver.add(y == z)
+    assert solver.independent_group(5) == list(range(6))
+    solver.pop()
+    assert solver.independent_group(4) == [0, 2, 4]
+
+
+def test_sliced_checks_agree_with_whole_checks():
+    x, y, z = Int("x"), Int("y"), Int("z")
+    solver = PathSolver()
+    answers = []
+    for literal in (x > 0, z > 1, y == x, y < 0):
+        solver.push()
+        solver.add_literal(literal)
+        answers.append(solver.feasible())
+    assert answers == [True, True, True, False]
+    # z > 1, and y == x and y < 0 were checked without the constraints they don't share symbols with
+    assert solver.sliced_checks == 3
+    solver.pop()
+    assert solver.sat_prefix == 3
+    solver.pop()
+    solver.push()
+    solver.add_literal(z < 0)
+    assert not solver.feasible()
+    assert solver.sliced_checks == 4
+
+
+def explore(solver: PathSolver, paths) -> list:
+    """Take the branches of each path in turn, the feasibility of every branch and the cubes learned."""
+    answers = []
+    for path in paths:
+        depth = 0
+        for decision, literal in enumerate(path):
+            if not take(solver, decision, literal):
+                answers.append((decision, False))
+                break
+            depth += 1
+            answers.append((decision, True))
+        solver.pop(depth)
+    return answers, [sorted(decisions) for _, decisions in solver.cube_literals]
+
+
+def test_assumptions_give_the_answers_of_push_and_pop():
+    x, y, z = BitVecs("x y z", 8)
+    paths = [[x > 5, y == x, UGT(z, y), y < 3], [x > 5, y == x, y < 3], [x < 2, y == 1, z == y],
+             [x > 5, z == 0, y == x, y < 3], [x < 2, z == 3, z == 4]]
+    scoped = PathSolver()
+    incremental = PathSolver()
+    incremental.use_assumptions()
+    assert explore(incremental, paths) == explore(scoped, paths)
+    # the constraints stay in the incremental solver, guarded by their selectors
+    assert len(incremental.assertions()) == 0
+    assert len(incremental.incremental.assertions()) == len(incremental.selectors) > 0
+
+
+@pytest.mark.parametrize("design, cycles", [("mini_daio.v", 2), ("updowncounter.v", 3), ("test.v", 2),
+                                            ("demo2.v", 3)])
+def test_runs_with_assumptions_agree_with_runs_without(design, cycles):
+    incremental = run_design(design, cycles, record_states=True, assumptions=True)
+    scoped = run_design(design, cycles, record_states=True)
+    assert verdict(incremental) == verdict(scoped)
+    assert incremental["states"] == scoped["states"]
+    assert incremental["stats"]["paths_pruned"] == scoped["stats"]["paths_pruned"]
@@ -0,0 +1,49 @@
+"""Prefix sharing (PathTrie): a path executed from a restored prefix ends in the same state as
+the path executed on its own."""
+
+import pytest
+from conftest import run_design
+from engine.path_trie import PathTrie
+from engine.path_solver import PathSolver
+from engine.execution_manager import ExecutionManager
+from engine.symbolic_state import SymbolicState
+
+
+def test_restore_rolls_back_the_manager_bookkeeping():
+    m = ExecutionManager()
+    s = SymbolicState()
+    s.pc = PathSolver()
+    s.store = {"top": {"x": "A"}}
+    m.updates, m.instances_seen, m.instances_loc = {"x": 0}, {"child": 0}, {"child": ""}
+    m.dependencies, m.intermodule_dependencies, m.cond_assigns = {"top": {}}, {"top": {}}, {"top": {}}
+    m.reg_writes = set()
+    trie = PathTrie()
+    trie.checkpoint(m, s, None)
+
+    s.store["top"]["x"] = "B"
+    m.updates["x"] = (1, "A")
+    m.dependencies["top"]["y"] = "x"
+    m.intermodule_dependencies["top"]["out"] = ("child_0", "out")
+    m.cond_assigns["top"]["y"] = {"c": "x", "default": "0"}
+    m.instances_seen["child"] = 1
+    m.instances_loc["child_0"] = "top"
+    trie.checkpoint(m, s, ("top", 0, "comb"))
+    m.cond_assigns["top"]["y"]["c"] = "z"
+
+    assert trie.restore(m, s, [("top", 0, "comb")]) == 1
+    assert m.cond_assigns["top"]["y"] == {"c": "x", "default": "0"}
+    assert trie.restore(m, s, [("top", 0, 0, 0, 0, 1)]) == 0
+    assert s.store == {"top": {"x": "A"}}
+    assert m.updates == {"x": 0}
+    assert m.dependencies == {"top": {}} and m.intermodule_dependencies == {"top": {}}
+    assert m.cond_assigns == {"top": {}}
+    assert m.instances_seen == {"child": 0} and m.instances_loc == {"child": ""}
+
+
+@pytest.mark.parametrize("design, cycles", [("test.v", 2), ("demo2.v", 2), ("test_3.v", 2), ("mini_daio.v", 1)])
+def test_shared_prefixes_match_fresh_execution(design, cycles):
+    shared = run_design(design, cycles, record_states=True)
+    assert shared["stats"]["steps_reused"] > 0
+    for index, state in shared["states"].items():
+        fresh = run_design(design, cycles, record_states=True, start_path=int(index), stop_path=int(index) + 1)
+        assert fresh["states"] == {index: state}
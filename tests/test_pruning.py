@@ -0,0 +1,30 @@
+"""Aborting a path at its first infeasible branch and skipping every path sharing that prefix."""
+
+import pytest
+from conftest import run_design
+
+
+@pytest.mark.parametrize("design, cycles, total", [("test.v", 2, 25), ("demo2.v", 2, 4)])
+def test_skipped_subtrees_are_the_paths_pruned_one_by_one(design, cycles, total):
+    result = run_design(design, cycles, record_states=True)
+    stats = result["stats"]
+    assert stats["paths_explored"] == total
+    pruned = []
+    for index in range(total):
+        fresh = run_design(design, cycles, start_path=index, stop_path=index + 1)
+        assert fresh["stats"]["paths_explored"] == 1
+        if fresh["stats"]["paths_pruned"]:
+            pruned.append(index)
+        elif str(index) in result["states"]:
+            assert not result["states"][str(index)][0]
+        else:
+            pytest.fail(f"path {index} is feasible but was skipped")
+    assert stats["paths_pruned"] == len(pruned)
+    # every skipped path is one of the pruned ones
+    assert set(range(total)) - set(map(int, result["states"])) <= set(pruned)
+
+
+def test_whole_subtrees_are_skipped():
+    stats = run_design("test.v", 2)["stats"]
+    assert 0 < stats["prefixes_pruned"] < stats["paths_pruned"]
+
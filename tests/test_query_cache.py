@@ -0,0 +1,74 @@
+"""Feasibility query cache (QueryCache): canonical keys and cached answers."""
+
+from conftest import run_design, verdict
+from z3 import Solver, BitVec, BitVecVal, Int, sat
+from engine.query_cache import QueryCache
+from engine.execution_engine import ExecutionEngine
+
+
+def query(first: str, second: str, width: int = 8, bound: int = 3) -> Solver:
+    solver = Solver()
+    a, b = BitVec(first, width), BitVec(second, width)
+    solver.add(a + b == bound, a > 1, b != BitVecVal(0, width))
+    return solver
+
+
+def test_alpha_equivalent_queries_share_a_key():
+    cache = QueryCache(16)
+    assert cache.key(query("XpLq0aVn6kR2cW9z", "Tb4mNs8eJd1yHf7u")) == cache.key(query("a", "b"))
+
+
+def test_keys_tell_apart_sorts_sharing_and_literals():
+    cache = QueryCache(16)
+    assert cache.key(query("a", "b")) != cache.key(query("a", "b", width=16))
+    assert cache.key(query("a", "b")) != cache.key(query("a", "b", bound=4))
+    same, different = Solver(), Solver()
+    same.add(Int("a") == Int("a"))
+    different.add(Int("a") == Int("b"))
+    assert cache.key(same) != cache.key(different)
+
+
+def test_names_that_look_like_symbols_are_only_renamed_as_constants():
+    # a 16 character name is a constant like any other, its value is part of the key
+    cache = QueryCache(16)
+    first, second = Solver(), Solver()
+    first.add(Int("aaaaaaaaaaaaaaaa") == 5)
+    second.add(Int("aaaaaaaaaaaaaaaa") == 6)
+    assert cache.key(first) != cache.key(second)
+
+
+def test_hits_return_the_solved_answers():
+    cache = QueryCache(16)
+    unsatisfiable = Solver()
+    x = Int("x")
+    unsatisfiable.add(x > 1, x < 1)
+    assert cache.check(query("a", "b")) == (query("a", "b").check() == sat)
+    assert not cache.check(unsatisfiable)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert cache.check(query("c", "d"))
+    renamed = Solver()
+    y = Int("y")
+    renamed.add(y > 1, y < 1)
+    assert not cache.check(renamed)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_answers_persist_in_the_database(tmp_path):
+    path = str(tmp_path / "queries.sqlite")
+    cache = QueryCache(16, path)
+    cache.check(query("a", "b"))
+    cache.close()
+    cache = QueryCache(16, path)
+    assert cache.check(query("c", "d"))
+    assert cache.hits == 1
+
+
+def test_the_cache_is_opt_in():
+    assert ExecutionEngine.query_cache_size == 0
+    assert ExecutionEngine.query_cache is None
+
+
+def test_cached_runs_agree_with_uncached_ones():
+    for cycles in (1, 2):
+        cached = run_design("test.v", cycles, query_cache_size=1024)
+        assert verdict(cached) == verdict(run_design("test.v", cycles))
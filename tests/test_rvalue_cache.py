@@ -0,0 +1,62 @@
+"""Token trees of rvalues compiled once per AST node (compile_rvalue)."""
+
+from conftest import parse_modules
+from pyverilog.vparser.ast import Always, NonblockingSubstitution
+from helpers.rvalue_parser import compile_rvalue, parse_tokens, tokenize, evaluate
+from engine.execution_manager import ExecutionManager
+from engine.symbolic_state import SymbolicState
+from engine.expr import ModuleStore
+
+DESIGN = """
+module top(clock, a, b, i);
+    input clock;
+    input [3:0] a;
+    input [3:0] b;
+    input [1:0] i;
+    reg [3:0] x;
+    reg [3:0] y;
+    always @(posedge clock) begin
+        x <= a + b;
+        y <= a[i] & b;
+    end
+endmodule
+"""
+
+
+def rvalues():
+    module = parse_modules(DESIGN)[0]
+    always = [item for item in module.items if isinstance(item, Always)][0]
+    return [stmt.right.var for stmt in always.statement.statements if isinstance(stmt, NonblockingSubstitution)]
+
+
+def state():
+    m = ExecutionManager()
+    m.curr_module = "top"
+    s = SymbolicState()
+    s.store = {"top": ModuleStore({"a": "XpLq0aVn6kR2cW9z", "b": "Tb4mNs8eJd1yHf7u", "i": "Qe3rT5yU7iO9pA1s"})}
+    return m, s
+
+
+def test_compiled_trees_match_uncached_compilation():
+    for rvalue in rvalues():
+        m, s = state()
+        uncached = parse_tokens(tokenize(rvalue, s, m))
+        expected = evaluate(uncached, s, m)
+        m, s = state()
+        first = compile_rvalue(rvalue, s, m)
+        assert first == uncached
+        assert getattr(rvalue, "compiled_tokens", None) is not None
+        assert compile_rvalue(rvalue, s, m) is first
+        assert evaluate(first, s, m) == expected
+
+
+def test_pointer_aliases_are_replayed_into_the_store():
+    pointer_rvalue = rvalues()[1]
+    m, s = state()
+    compile_rvalue(pointer_rvalue, s, m)
+    aliases = [key for key in s.store["top"] if "[" in key]
+    assert aliases
+    m, s = state()
+    compile_rvalue(pointer_rvalue, s, m)
+    for alias in aliases:
+        assert s.store["top"][alias] == s.store["top"]["a"]
@@ -0,0 +1,66 @@
+"""State subsumption at cycle boundaries (StateCache) and the verdicts of runs that use it."""
+
+import pytest
+from conftest import run_design, verdict
+from z3 import Solver, Int
+from engine.state_cache import StateCache, store_digest
+
+
+def path_condition(*assertions) -> Solver:
+    solver = Solver()
+    solver.add(*assertions)
+    return solver
+
+
+def test_store_digest_ignores_insertion_order():
+    first = {"top": {"x": "A", "y": "B"}, "child": {"z": "C"}}
+    second = {"child": {"z": "C"}, "top": {"y": "B", "x": "A"}}
+    assert store_digest(first) == store_digest(second)
+    assert store_digest(first) != store_digest({"top": {"x": "B", "y": "A"}, "child": {"z": "C"}})
+
+
+def test_a_weaker_path_condition_subsumes_a_stronger_one():
+    x, y = Int("x"), Int("y")
+    store = {"top": {"x": "A"}}
+    cache = StateCache()
+    assert not cache.subsumed((0, 1), store, path_condition(x > 0), True)
+    assert cache.subsumed((0, 1), store, path_condition(y == 0, x > 0), True)
+    # a stronger condition seen first doesn't cover a weaker one
+    assert not cache.subsumed((0, 2), store, path_condition(y == 0, x > 0), True)
+    assert not cache.subsumed((0, 2), store, path_condition(x > 0), True)
+    # nor does the same state at another position, or another store
+    assert not cache.subsumed((0, 3), store, path_condition(x > 0), True)
+    assert not cache.subsumed((0, 1), {"top": {"x": "B"}}, path_condition(x > 0), True)
+    assert (cache.hits, cache.misses) == (1, 5)
+
+
+def test_misses_are_only_remembered_when_asked():
+    x = Int("x")
+    cache = StateCache()
+    assert not cache.subsumed(0, {}, path_condition(x > 0), False)
+    assert not cache.subsumed(0, {}, path_condition(x > 0), True)
+    assert cache.subsumed(0, {}, path_condition(x > 0), True)
+
+
+def test_the_solver_finds_implied_path_conditions():
+    x = Int("x")
+    for use_solver in (False, True):
+        cache = StateCache(use_solver)
+        cache.subsumed(0, {}, path_condition(x > 0), True)
+        assert cache.subsumed(0, {}, path_condition(x > 5), True) == use_solver
+
+
+@pytest.mark.parametrize("design, cycles", [("mini_daio.v", 2), ("updowncounter.v", 3), ("test.v", 2),
+                                            ("demo2.v", 3), ("test_3.v", 3)])
+@pytest.mark.parametrize("subsume_solver", [False, True])
+def test_runs_with_subsumption_agree_with_runs_without(design, cycles, subsume_solver):
+    subsumed = run_design(design, cycles, subsume=True, subsume_solver=subsume_solver)
+    assert verdict(subsumed) == verdict(run_design(design, cycles))
+
+
+def test_skipped_paths_make_up_the_difference():
+    subsumed = run_design("demo2.v", 3, subsume=True)
+    full = run_design("demo2.v", 3)
+    assert subsumed["stats"]["paths_subsumed"] > 0
+    assert (subsumed["stats"]["paths_explored"] + subsumed["stats"]["paths_subsumed"]
+            == full["stats"]["paths_explored"])